@@ -1,140 +1,233 @@
 from streamlit_option_menu import option_menu
 import streamlit as st
-import pandas as pd
 from numerize.numerize import numerize
 import plotly.express as px
+import plotly.graph_objects as go
 from streamlit_extras.metric_cards import style_metric_cards
+from src.data.incremental import open_dataset
+from src.data.schema import TRANSACTION_SCHEMA
+from src.dashboard.ask import ask_panel
+from src.dashboard.download import export_panel
+from src.dashboard.cube import CUBE_DIMS, build_cube, merge_cubes, rollup, slice_cube, summary
+from src.dashboard.figures import cached_figure, filter_key
+from src.dashboard.hierarchy import TREE_DIMS, build_tree_cube, get_tree, merge_tree_cubes
+from src.logger import perf
+from src.dashboard.table import describe, paginated_table
 
 #set page
 st.set_page_config(page_title="Analytics Dashboard", page_icon="🌎", layout="wide")  
 st.subheader("📈 Analytics Dashboard ")
+# Mọi thứ bên dưới nằm trong một lần chạy lại: bản ghi vẫn được ghi khi có lỗi hoặc st.stop()
+with perf.rerun("Expense"):
+    #sidebar_logo
+    st.sidebar.image("images/logo2.png")
+
+    # load CSS Style
+    with open('style.css')as f:
+        st.markdown(f"<style>{f.read()}</style>", unsafe_allow_html=True)
+
+    #get data from files
+    # Chỉ đọc các dòng mới thêm vào file và cộng dồn chúng vào khối tổng hợp (phong_ban, Commodity, Month, Type)
+    with perf.span("load", kind="load"):
+        dataset = open_dataset("test_file.csv", schema=TRANSACTION_SCHEMA)
+        dataset.register("expense_cube", build_cube, merge_cubes, keys=CUBE_DIMS)
+        dataset.register("commodity_tree", build_tree_cube, merge_tree_cubes, keys=TREE_DIMS)
+        dataset.refresh()
+        df = dataset.frame
+        cube = dataset.aggregate("expense_cube")
+        tree = get_tree(dataset.version, dataset.aggregate("commodity_tree"))
+
+    allowed_phongban = ["HCMCHEM", "HCMPEST", "HCMMICR", "HCMMYCO", "HCMOTH"]
+
+    #switcher for main dashboard
+    st.sidebar.header("Vui Lòng Filter")
+    phongban = st.sidebar.multiselect(
+        "Filter Phòng Ban",
+        options=allowed_phongban,
+        default=allowed_phongban,
+    )
+    commodityy = st.sidebar.multiselect(
+        "Filter Commodity",
+        options=cube["Commodity"].unique().tolist(),
+        default=cube["Commodity"].unique().tolist(),
+    )
+    monthh = st.sidebar.multiselect(
+        "Filter Month",
+        options=cube["Month"].unique().tolist(),
+        default=cube["Month"].unique().tolist(),
+        format_func=lambda month: f"Tháng {month}",
+    )
 
-#sidebar_logo
-st.sidebar.image("images/logo2.png")
-
-# load CSS Style
-with open('style.css')as f:
-    st.markdown(f"<style>{f.read()}</style>", unsafe_allow_html=True)
-
-#get data from files
-df = pd.read_csv("test_file.csv")
-
-allowed_phongban = ["HCMCHEM", "HCMPEST", "HCMMICR", "HCMMYCO", "HCMOTH"]
-
-#switcher for main dashboard
-st.sidebar.header("Vui Lòng Filter")
-phongban = st.sidebar.multiselect(
-    "Filter Phòng Ban",
-    options=allowed_phongban,
-    default=allowed_phongban,
-)
-commodityy = st.sidebar.multiselect(
-    "Filter Commodity",
-    options=df["Commodity"].unique(),
-    default=df["Commodity"].unique(),
-)
-monthh = st.sidebar.multiselect(
-    "Filter Month",
-    options=df["Month"].unique(),
-    default=df["Month"].unique(),
-)
-
-df_selection = df.query(
-    "phong_ban==@phongban & Commodity==@commodityy & Month==@monthh"
-)
-
-#functions for metrics
-def metrics():
-    col1, col2, col3 = st.columns(3)
-    col1.metric(label="Tổng Mặt Hàng", value=df_selection.Item.count(), delta="All Item")
-    col2.metric(label="Tổng Chi Phí", value=f"{df_selection.Total.sum():,.0f}", delta="KPI 1,200,000,000")
-    col3.metric(label="Chi Phí Lớn", value=f"{df_selection.Total.max()-df.Total.min():,.0f}", delta="Total Range")
-    style_metric_cards(background_color="#7a7aff", border_left_color="#f20045", box_shadow="3px")
-
-#pie chart
-def pie():
-    with div1:
-        fig = px.pie(df_selection, values='Total', names='phong_ban', title='% Total by Account')
-        fig.update_layout(legend_title="Phòng_Ban", legend_y=0.9)
-        fig.update_traces(textinfo='percent+label', textposition='inside')
-        st.plotly_chart(fig, use_container_width=True)
-
-#bar chart
-def barchart():
-    with div2:
-        fig = px.bar(df_selection, y='Total', x='phong_ban', text_auto='.2s', title="Chi phí by Phòng")
-        fig.update_traces(textfont_size=18, textangle=0, textposition="outside", cliponaxis=False)
-        st.plotly_chart(fig, use_container_width=True)
-
-def box_plot(df):
-    fig = px.box(df, x='phong_ban', y='Total', color='phong_ban',
-                 title="Phân bố chi phí theo phòng ban",
-                 labels={'Total': 'Chi phí', 'phong_ban': 'Phòng ban'})
-    st.plotly_chart(fig, use_container_width=True)
-
-
-def commodity_piechart():
-    # Đưa biểu đồ xuống dưới cùng và tăng kích thước biểu đồ
-    with st.container():
-        fig = px.pie(df_selection, values='Total', names='Commodity', title="Tỷ lệ Tồn giữa các nhóm Commodity")
-        fig.update_traces(textinfo='percent+label', textposition='inside')
-        fig.update_layout(height=600)  # Tăng chiều cao của biểu đồ
+    # Biểu đồ và thẻ số liệu chỉ đọc từ lát cắt của khối tổng hợp
+    with perf.span("filter", kind="filter"):
+        cube_selection = slice_cube(cube, phong_ban=phongban, Commodity=commodityy, Month=monthh)
+
+    # Biểu đồ được cache theo (phiên bản dữ liệu, tên biểu đồ, bộ lọc): đổi menu không vẽ lại
+    filters = {"phong_ban": phongban, "Commodity": commodityy, "Month": monthh}
+
+    def chart(chart_id, build):
+        return cached_figure(dataset.version, f"expense.{chart_id}", filters, build)
+
+    def select_rows(frame):
+        # Dữ liệu chi tiết chỉ cần cho trang Table, và chỉ tính lại khi bộ lọc đổi
+        return frame["phong_ban"].isin(phongban) & frame["Commodity"].isin(commodityy) & frame["Month"].isin(monthh)
+
+    # Khóa của lát cắt hiện tại cho bảng phân trang và thống kê describe()
+    table_key = (dataset.version, filter_key(**filters))
+
+    #functions for metrics
+    @perf.timed(kind="render")
+    def metrics():
+        selection = summary(cube_selection)
+        col1, col2, col3 = st.columns(3)
+        col1.metric(label="Tổng Mặt Hàng", value=selection["items"], delta="All Item")
+        col2.metric(label="Tổng Chi Phí", value=f"{selection['sum']:,.0f}", delta="KPI 1,200,000,000")
+        col3.metric(label="Chi Phí Lớn", value=f"{selection['max']-cube['min'].min():,.0f}", delta="Total Range")
+        style_metric_cards(background_color="#7a7aff", border_left_color="#f20045", box_shadow="3px")
+
+    #pie chart
+    @perf.timed(kind="render")
+    def pie():
+        def build():
+            fig = px.pie(rollup(cube_selection, 'phong_ban'), values='Total', names='phong_ban', title='% Total by Account')
+            fig.update_layout(legend_title="Phòng_Ban", legend_y=0.9)
+            fig.update_traces(textinfo='percent+label', textposition='inside')
+            return fig
+        with div1:
+            st.plotly_chart(chart("pie", build), use_container_width=True)
+
+    #bar chart
+    @perf.timed(kind="render")
+    def barchart():
+        def build():
+            fig = px.bar(rollup(cube_selection, 'phong_ban'), y='Total', x='phong_ban', text_auto='.2s', title="Chi phí by Phòng")
+            fig.update_traces(textfont_size=18, textangle=0, textposition="outside", cliponaxis=False)
+            return fig
+        with div2:
+            st.plotly_chart(chart("barchart", build), use_container_width=True)
+
+    def box_plot(df):
+        fig = px.box(df, x='phong_ban', y='Total', color='phong_ban',
+                     title="Phân bố chi phí theo phòng ban",
+                     labels={'Total': 'Chi phí', 'phong_ban': 'Phòng ban'})
         st.plotly_chart(fig, use_container_width=True)
 
-#bar chart by Type - thêm hàm này
-def bar_chart_by_type(df):
-    # Nhóm chi phí theo cột "Type"
-    df_grouped = df.groupby('Type').agg({'Total': 'sum'}).reset_index()
-    
-    # Định dạng số VND với dấu phân cách hàng nghìn
-    df_grouped['Total'] = df_grouped['Total'].apply(lambda x: f"{x:,.0f} VND")
-    
-    # Vẽ biểu đồ cột
-    fig = px.bar(df_grouped, 
-                 x='Type', 
-                 y='Total', 
-                 title="Phân Loại Chi Phí",
-                 labels={'Type': 'Nhóm Chi Phí'},
-                 color='Type',  # Màu sắc theo nhóm
-                 text='Total')
-    # Tinh chỉnh biểu đồ
-    fig.update_traces(texttemplate='%{text}', textposition='outside')  # Hiển thị giá trị đã định dạng
-    fig.update_layout(
-        xaxis_title="Nhóm Chi Phí",
-        yaxis_title="Tổng Chi Phí",
-        showlegend=False
-    )
-    
-    # Hiển thị biểu đồ
-    st.plotly_chart(fig, use_container_width=True)
-
-
-#table
-def table():
-    with st.expander("Tabular"):
-        shwdata = st.multiselect('Filter :', df.columns, default=["Created Date", "Month", "Type", "phong_ban", "Commodity", "Item Number", "Item", "Quantity", "Price", "Total"])
-        st.dataframe(df_selection[shwdata], use_container_width=True)
-
-#option menu
-with st.sidebar:
-    selected = option_menu(
-        menu_title="Main Menu",
-        options=["Home", "Table"],
-        icons=["house", "book"],
-        menu_icon="cast",
-        default_index=0,
-        orientation="vertical",
-    )
 
-if selected == "Home":
-    div1, div2, div3 = st.columns(3)
-    pie()
-    barchart()
-    metrics()
-    commodity_piechart()
-    bar_chart_by_type(df_selection)
-
-elif selected == "Table":
-    metrics()
-    table()
-    st.dataframe(df_selection.describe().T, use_container_width=True)
+    @perf.timed(kind="render")
+    def commodity_piechart():
+        # Đưa biểu đồ xuống dưới cùng và tăng kích thước biểu đồ
+        def build():
+            fig = px.pie(rollup(cube_selection, 'Commodity'), values='Total', names='Commodity', title="Tỷ lệ Tồn giữa các nhóm Commodity")
+            fig.update_traces(textinfo='percent+label', textposition='inside')
+            fig.update_layout(height=600)  # Tăng chiều cao của biểu đồ
+            return fig
+        with st.container():
+            st.plotly_chart(chart("commodity_piechart", build), use_container_width=True)
+
+    #drill-down Commodity > level 2 > level 3
+    @perf.timed(kind="render")
+    def commodity_drilldown():
+        # Tổng của mọi nút trong cây cho bộ lọc hiện tại; đi xuống một nhánh chỉ là tra cứu
+        totals = tree.totals(months=monthh, departments=phongban, commodities=commodityy)
+        st.markdown("##### Chi phí theo cấp Commodity")
+        col1, col2, col3 = st.columns([1, 2, 2])
+        kind = col1.radio("Kiểu biểu đồ", ["Sunburst", "Treemap"], horizontal=True, key="drilldown_kind")
+        path = ()
+        for column, level in zip((col2, col3), tree.levels):
+            options = tree.children(path, totals)["label"].tolist()
+            choice = column.selectbox(level, ["Tất cả"] + options, key=f"drilldown_{level}")
+            if choice == "Tất cả":
+                break
+            path += (choice,)
+
+        def build():
+            nodes = tree.subtree(path, totals)
+            nodes["sum"] = nodes["sum"].clip(lower=0)  # sunburst/treemap không vẽ được giá trị âm
+            trace = dict(ids=nodes["id"], parents=nodes["parent"], labels=nodes["label"], values=nodes["sum"],
+                         branchvalues="total", customdata=nodes["count"],
+                         hovertemplate="%{label}<br>%{value:,.0f} VND<br>%{customdata} dòng<extra></extra>")
+            fig = go.Figure(go.Sunburst(**trace, maxdepth=2) if kind == "Sunburst" else go.Treemap(**trace, maxdepth=3))
+            fig.update_layout(height=600, margin=dict(t=30, l=0, r=0, b=0))
+            return fig
+
+        st.plotly_chart(chart(f"drilldown.{kind}.{' › '.join(path)}", build), use_container_width=True)
+        st.dataframe(
+            tree.children(path, totals),
+            column_config={
+                "label": "Nhóm",
+                "sum": st.column_config.NumberColumn("Tổng Chi Phí", format="%.0f"),
+                "count": "Số dòng",
+                "share": st.column_config.ProgressColumn("Tỷ lệ", format="%.2f", min_value=0, max_value=1),
+            },
+            hide_index=True,
+            use_container_width=True,
+        )
+
+    #bar chart by Type - thêm hàm này
+    @perf.timed(kind="render")
+    def bar_chart_by_type(df):
+        def build():
+            # Nhóm chi phí theo cột "Type" (cộng từ lát cắt của khối tổng hợp)
+            df_grouped = rollup(df, 'Type').sort_values('Type', ignore_index=True)
+
+            # Định dạng số VND với dấu phân cách hàng nghìn
+            df_grouped['Total'] = df_grouped['Total'].apply(lambda x: f"{x:,.0f} VND")
+
+            # Vẽ biểu đồ cột
+            fig = px.bar(df_grouped, 
+                         x='Type', 
+                         y='Total', 
+                         title="Phân Loại Chi Phí",
+                         labels={'Type': 'Nhóm Chi Phí'},
+                         color='Type',  # Màu sắc theo nhóm
+                         text='Total')
+            # Tinh chỉnh biểu đồ
+            fig.update_traces(texttemplate='%{text}', textposition='outside')  # Hiển thị giá trị đã định dạng
+            fig.update_layout(
+                xaxis_title="Nhóm Chi Phí",
+                yaxis_title="Tổng Chi Phí",
+                showlegend=False
+            )
+            return fig
+
+        # Hiển thị biểu đồ
+        st.plotly_chart(chart("bar_chart_by_type", build), use_container_width=True)
+
+
+    #table
+    @perf.timed(kind="render")
+    def table():
+        with st.expander("Tabular"):
+            shwdata = st.multiselect('Filter :', df.columns, default=["Created Date", "Month", "Type", "phong_ban", "Commodity", "Item Number", "Item", "Quantity", "Price", "Total"])
+            paginated_table(df, shwdata, table_key, select_rows, widget_key="expense_table")
+            # Xuất toàn bộ lát cắt đang lọc (mọi cột) cho phòng tài chính
+            export_panel(df, table_key, select_rows, file_stem="chi_phi", widget_key="expense_export")
+
+    #option menu
+    with st.sidebar:
+        selected = option_menu(
+            menu_title="Main Menu",
+            options=["Home", "Table", "Ask"],
+            icons=["house", "book", "chat-dots"],
+            menu_icon="cast",
+            default_index=0,
+            orientation="vertical",
+        )
+
+    if selected == "Home":
+        div1, div2, div3 = st.columns(3)
+        pie()
+        barchart()
+        metrics()
+        commodity_piechart()
+        commodity_drilldown()
+        bar_chart_by_type(cube_selection)
+
+    elif selected == "Table":
+        metrics()
+        table()
+        st.dataframe(describe(df, table_key, select_rows), use_container_width=True)
+
+    elif selected == "Ask":
+        # Hỏi đáp trên toàn bộ dữ liệu chi phí; tóm tắt schema chỉ dựng lại khi có dòng mới
+        ask_panel(df, "test_file.csv (chi phí theo phòng ban)", dataset.version, widget_key="expense_ask")
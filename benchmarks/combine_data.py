@@ -0,0 +1,124 @@
+"""Benchmark combine_inventory against the original per-item loop
+
+Run from the project root:
+
+    python benchmarks/combine_data.py --rows 100000
+
+Prints the timings of both implementations. Their results are compared in
+tests/test_combine_parity.py.
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.warehouse.combine import apply_filters, combine_inventory  # noqa: E402
+
+
+def legacy_combine_data(inventory_df, outbound_df, filters=None):
+    # Bản gốc của combine_data trong pages/3_📌 Test.py (vòng lặp theo sản phẩm/tháng)
+    if inventory_df.empty or outbound_df.empty:
+        return pd.DataFrame()
+
+    filtered_inventory, filtered_outbound = apply_filters(inventory_df, outbound_df, filters)
+    all_item_numbers = pd.concat([filtered_inventory['itemNumber'], filtered_outbound['itemNumber']]).unique()
+
+    combined_data = []
+    for item_number in all_item_numbers:
+        inventory_items = filtered_inventory[filtered_inventory['itemNumber'] == item_number]
+        outbound_items = filtered_outbound[filtered_outbound['itemNumber'] == item_number]
+        months = pd.concat([inventory_items['month'], outbound_items['month']]).unique()
+
+        for month in months:
+            month_inventory = inventory_items[inventory_items['month'] == month]
+            in_stock = month_inventory['quantity'].sum() if not month_inventory.empty else 0
+            month_outbound = outbound_items[outbound_items['month'] == month]
+            outbound = month_outbound['quantity'].sum() if not month_outbound.empty else 0
+
+            if not month_inventory.empty:
+                total_quantity = month_inventory['quantity'].sum()
+                average_price = month_inventory['total'].sum() / total_quantity if total_quantity > 0 else 0
+            elif not month_outbound.empty:
+                average_price = month_outbound['price'].iloc[0]
+            else:
+                average_price = 0
+
+            if not month_inventory.empty:
+                item_info = month_inventory.iloc[0]
+            elif not month_outbound.empty:
+                item_info = month_outbound.iloc[0]
+            else:
+                continue
+
+            combined_data.append({
+                'itemNumber': item_number,
+                'item': item_info['item'],
+                'month': month,
+                'inStock': in_stock,
+                'outbound': outbound,
+                'balance': in_stock - outbound,
+                'uom': item_info['uom'],
+                'commodity': item_info['commodity'],
+                'averagePrice': average_price
+            })
+
+    return pd.DataFrame(combined_data)
+
+
+def make_frames(rows: int, items: int, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    commodities = np.array(["Consumables", "Chemicals", "Glassware", "Services"])
+    departments = np.array(["HCMCHEM", "HCMPEST", "HCMMICR", "HCMMYCO", "HCMOTH"])
+
+    def frame(n):
+        item_ids = rng.integers(0, items, n)
+        quantity = rng.integers(0, 50, n)
+        price = rng.integers(1_000, 500_000, n)
+        return pd.DataFrame({
+            'month': rng.integers(1, 13, n),
+            'itemNumber': np.char.add("IT", item_ids.astype(str)),
+            'item': np.char.add("Item ", item_ids.astype(str)),
+            'phongBan': departments[rng.integers(0, len(departments), n)],
+            'account': departments[rng.integers(0, len(departments), n)],
+            'quantity': quantity,
+            'uom': "each",
+            'price': price,
+            'total': quantity * price,
+            'commodity': commodities[item_ids % len(commodities)],
+        })
+
+    return frame(rows // 2), frame(rows - rows // 2)
+
+
+def timed(func, *args, **kwargs):
+    start = time.perf_counter()
+    result = func(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--items", type=int, default=2_000)
+    parser.add_argument("--skip-legacy", action="store_true", help="only time the vectorized engine")
+    args = parser.parse_args()
+
+    inventory_df, outbound_df = make_frames(args.rows, args.items)
+    print(f"rows={args.rows:,} items={args.items:,}")
+
+    for filters in (None, {'month': 3}, {'commodity': "Chemicals", 'phongBan': "HCMPEST"}):
+        result, elapsed = timed(combine_inventory, inventory_df, outbound_df, filters)
+        line = f"filters={filters!s:<48} engine={elapsed * 1000:9.1f} ms"
+        if not args.skip_legacy:
+            _, legacy_elapsed = timed(legacy_combine_data, inventory_df, outbound_df, filters)
+            line += f"  legacy={legacy_elapsed * 1000:9.1f} ms  x{legacy_elapsed / elapsed:,.0f}"
+        print(line)
+
+
+if __name__ == "__main__":
+    main()
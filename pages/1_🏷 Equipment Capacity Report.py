@@ -1,105 +1,76 @@
-import pandas as pd
-import matplotlib.pyplot as plt
+import os
+
+import plotly.express as px
 import streamlit as st
 
+from src.data.loader import load_frame
+from src.equipment.capacity import COLUMNS_TO_PLOT, MA_GROUPS, capacity_percentages, stacked_bar_figure
+from src.equipment.oee import RATIOS, get_store
+
+# Lịch sử theo kỳ: thư mục equipment_history/equipment_list_<YYYY-MM>.csv nếu có, nếu không chỉ có snapshot hiện tại
+OEE_SOURCE = os.environ.get("EQUIPMENT_HISTORY", "equipment_history")
+if not os.path.isdir(OEE_SOURCE):
+    OEE_SOURCE = "equipment_list.csv"
+
 # Đặt cấu hình cho ứng dụng Streamlit
 st.set_page_config(page_title="Analytics Dashboard", page_icon="🌎", layout="wide")
 st.subheader("📈 Analytics Dashboard ")
 
 # Tải dữ liệu từ file CSV
-df = pd.read_csv("equipment_list.csv")
-
-# Danh sách ma_id cần sử dụng
-ma_id_list = [
-    "ICP-MS", "IC-Anion", "INS003", "LC-MSMS-114", "LC-MSMS-105",
-    "GC-MSMS-141", "GC-MSMS-109", "GC-MSMS-108", "LC-MSMS-50",
-    "GC-MSMS-79", "GC-MSMS-47", "GC-MSMS-131", "HPLC-FLD106",
-    "HPLC-FLD99", "HPLC-FLD-IR101", "HPLC-UV103", "GC-FID60",
-    "HPLC-UV98", "HPLC-UV100", "GC-FID9", "HPLC-139",
-    "MOAH-MOSH-111", "LC-MSMS-119", "IC-5", "GC-MSMS144"
-]
-
-# Lọc dữ liệu dựa trên danh sách ID
-filtered_df = df[df['ID'].isin(ma_id_list)]
-
-# Các cột mới để vẽ biểu đồ
-columns_to_plot = ['Non-schedule time (min)', 'Non Production time (min)', 'Set up & cleaning time', 
-                   'DowntimeBreakdown', 'Quality losses (min)', 'Net Prod Time (min)']
-devices = filtered_df['ID']
-percentages = filtered_df[columns_to_plot]
-
-# Các nhóm ma_id
-ma_groups = {
-    "HCMCHEM": {"ICP-MS", "IC-Anion"},
-    "HCMPEST": {"INS003", "LC-MSMS-114", "LC-MSMS-105", "GC-MSMS-141", "GC-MSMS-109", "GC-MSMS-108",
-                "LC-MSMS-50", "GC-MSMS-79", "GC-MSMS-47", "GC-MSMS-131", "HPLC-FLD106"},
-    "HCMMYCO": {"HPLC-FLD99", "HPLC-FLD-IR101", "HPLC-UV103", "GC-FID60", "HPLC-UV98", "HPLC-UV100", "GC-FID9", "HPLC-139"},
-    "RD": {"MOAH-MOSH-111", "LC-MSMS-119", "IC-5", "GC-MSMS144"}
-}
-
-# Chuyển đổi tất cả các cột trong columns_to_plot thành số, nếu cần
-for col in columns_to_plot:
-    filtered_df[col] = pd.to_numeric(filtered_df[col], errors='coerce')
-
-# Tính phần trăm cho từng giá trị
-min_by_month = filtered_df['Calendar time']
-percentages = (filtered_df[columns_to_plot].div(min_by_month, axis=0)) * 100
-
-# Chú thích màu cho từng cột
-color_map = {
-    'Non-schedule time (min)': 'black',  # Không hiển thị số
-    'Set up & cleaning time': 'gray',     # Không hiển thị số
-    'Quality losses (min)': 'lightblue',
-    'Non Production time (min)': 'orange',
-    'DowntimeBreakdown': 'red',           # Không hiển thị số
-    'Net Prod Time (min)': 'limegreen'
-}
+df = load_frame("equipment_list.csv")
 
 # Tạo selectbox để người dùng chọn nhóm ma_id
-selected_group = st.selectbox("Chọn Phòng Ban", list(ma_groups.keys()))
+selected_group = st.selectbox("Chọn Phòng Ban", list(MA_GROUPS.keys()))
 
-# Lọc các ma_id trong nhóm được chọn
-filtered_ma_ids = ma_groups[selected_group]
+# Lọc các ma_id trong nhóm được chọn: cả biểu đồ và bảng đều chỉ dùng nhóm này
+filtered_ma_ids = MA_GROUPS[selected_group]
 filtered_data = df[df['ID'].isin(filtered_ma_ids)]
 
-# Vẽ biểu đồ dạng cột stacked
-plt.figure(figsize=(15, 8))
-bottoms = pd.Series([0] * len(devices), dtype='float')  # Đảm bảo bottoms là số
-
-for col in columns_to_plot:
-    plt.bar(devices, percentages[col], bottom=bottoms, label=col, color=color_map[col], alpha=0.85)
-    
-    # Thêm số phần trăm vào từng cột, ngoại trừ những cột không hiển thị số
-    if col not in ['Non-schedule time (min)', 'Set up & cleaning time', 'DowntimeBreakdown']:
-        for i, value in enumerate(percentages[col]):
-            if not pd.isna(value):  # Kiểm tra giá trị hợp lệ
-                plt.text(devices.iloc[i], bottoms.iloc[i] + value / 2, f'{value:.1f}%', 
-                         ha='center', va='center', fontsize=9, color='white', fontweight='bold')
-    
-    # Cập nhật bottoms cho vòng lặp tiếp theo
-    bottoms += percentages[col]
-
-# Thêm tiêu đề và chú thích
-plt.title('Comparison of Time Metrics by Equipment', fontsize=14)
-plt.ylabel('Percentage (%)', fontsize=12)
-plt.xlabel('Equipment ID', fontsize=12)
-plt.xticks(rotation=90)
-plt.legend(title="Metrics", bbox_to_anchor=(1.05, 1), loc='upper left')
-
-# Hiển thị biểu đồ
-st.pyplot(plt)
+# Tính phần trăm so với Calendar time cho các thiết bị trong nhóm
+percentages = capacity_percentages(df, filtered_ma_ids)
+
+# Vẽ biểu đồ cột stacked: mỗi chỉ số là một trace, nhãn được gắn theo mảng
+st.plotly_chart(stacked_bar_figure(percentages), use_container_width=True)
 
 # Hiển thị bảng dữ liệu dưới dạng phần trăm trong Streamlit mà không thay đổi dữ liệu gốc
 st.subheader("📊 Data Table")
-# Chuyển đổi các giá trị phần trăm thành chuỗi khi hiển thị trong bảng
-percentages_display = percentages.applymap(lambda x: f'{x:.1f}%')
-
-# Thêm cột ID vào bảng
-percentages_display['ID'] = filtered_df['ID']
 
 # Hiển thị bảng dữ liệu đã lọc
 st.write(f"Dữ liệu cho nhóm {selected_group}:")
 st.dataframe(filtered_data)
 
-# Hiển thị bảng dữ liệu dưới dạng phần trăm
-st.dataframe(percentages_display, width=1200, height=600)
+# Hiển thị bảng dữ liệu dưới dạng phần trăm (định dạng ở phía trình duyệt, không đổi số thành chuỗi)
+st.dataframe(
+    percentages.reset_index(),
+    column_config={col: st.column_config.NumberColumn(format="%.1f%%") for col in COLUMNS_TO_PLOT},
+    width=1200,
+    height=600
+)
+
+# Xu hướng OEE theo kỳ, đọc từ store đã tính sẵn tỉ lệ và tổng cộng dồn
+st.subheader("📉 OEE Trend")
+store = get_store(OEE_SOURCE)
+group_ids = [device for device in store.ids if device in filtered_ma_ids]
+
+col_metric, col_window = st.columns(2)
+with col_metric:
+    metric = st.selectbox("Chỉ số", RATIOS, index=RATIOS.index("OEE"))
+with col_window:
+    window = st.number_input("Cửa sổ trượt (số kỳ)", min_value=1, value=3, step=1)
+
+if len(store.periods) > 1:
+    trend = store.rolling(metric, int(window), ids=group_ids) * 100
+    trend.index = trend.index.to_timestamp()
+    fig_trend = px.line(trend, markers=True, labels={"value": f"{metric} (%)", "index": "Kỳ", "variable": "Equipment ID"},
+                        title=f"{metric} trượt {int(window)} kỳ - nhóm {selected_group}")
+    st.plotly_chart(fig_trend, use_container_width=True)
+else:
+    st.info("Chỉ có một kỳ dữ liệu. Thêm các file equipment_list_<YYYY-MM>.csv vào thư mục equipment_history để xem xu hướng.")
+
+# Tỉ lệ của cửa sổ gần nhất cho từng thiết bị
+latest = store.window(int(window), ids=group_ids)[RATIOS] * 100
+st.dataframe(
+    latest.reset_index(),
+    column_config={ratio: st.column_config.NumberColumn(format="%.1f%%") for ratio in RATIOS},
+    use_container_width=True
+)
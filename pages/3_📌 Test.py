@@ -7,6 +7,14 @@ from datetime import datetime
 import io
 import base64
 
+from src.data import frame_store
+from src.logger import perf
+from src.warehouse import aggregations, forecast
+from src.warehouse.combine import combine_inventory
+from src.warehouse.history import get_item_history
+from src.warehouse.ingest import INVENTORY_COLUMNS, OUTBOUND_COLUMNS, ingest_csv
+from src.warehouse.search import get_item_index
+
 # Thiết lập trang
 st.set_page_config(page_title="Kho Hàng Quản Lý", page_icon="📦", layout="wide")
 
@@ -35,317 +43,91 @@ def format_currency(value):
     return f"{value:,.0f} VNĐ"
 
 
-if 'inventory_df' not in st.session_state:
-    # Cố gắng đọc dữ liệu từ các tệp CSV
-    try:
-        inventory_df = pd.read_csv("tonkho2024.csv")
-        outbound_df = pd.read_csv("xuatkho2024.csv")
-
-        # Xác thực xem các cột có tồn tại hay không (quan trọng!)
-        inventory_required_columns = ['month', 'itemNumber', 'item', 'phongBan', 'quantity', 'uom', 'price', 'total', 'commodity']
-        outbound_required_columns = ['month', 'account', 'itemNumber', 'item', 'quantity', 'uom', 'price', 'total', 'currency', 'receiver', 'commodity']
-
-        if not all(col in inventory_df.columns for col in inventory_required_columns):
-            st.error("File tonkho2024.csv thiếu một hoặc nhiều cột bắt buộc.")
-            inventory_df = pd.DataFrame()  # Tạo DataFrame rỗng để tránh lỗi sau này
+def get_inventory_df():
+    # session_state chỉ giữ handle, dữ liệu được chia sẻ (chỉ đọc) giữa các phiên
+    return st.session_state.inventory_frame.df
 
-        if not all(col in outbound_df.columns for col in outbound_required_columns):
-            st.error("File xuatkho2024.csv thiếu một hoặc nhiều cột bắt buộc.")
-            outbound_df = pd.DataFrame() # Tạo DataFrame rỗng để tránh lỗi sau này
+def get_outbound_df():
+    return st.session_state.outbound_frame.df
 
-        # Convert 'month' to integer and handle errors
-        try:
-            inventory_df['month'] = pd.to_datetime(inventory_df['month'], errors='raise').dt.month.astype(int)
-             # Validate month values
-            if not ((inventory_df['month'] >= 1) & (inventory_df['month'] <= 12)).all():
-                st.error("Giá trị tháng trong tonkho2024.csv phải nằm trong khoảng từ 1 đến 12.")
-                inventory_df = pd.DataFrame() # Tạo DataFrame rỗng
-
-        except ValueError as e:
-            st.error(f"Lỗi trong cột 'month' của tonkho2024.csv: {str(e)}")
-            inventory_df = pd.DataFrame()  # Tạo DataFrame rỗng
-        except Exception as e:
-            st.error(f"Lỗi không xác định khi chuyển đổi cột 'month' của tonkho2024.csv: {str(e)}")
-            inventory_df = pd.DataFrame()
-
-        try:
-            outbound_df['month'] = pd.to_datetime(outbound_df['month'], errors='raise').dt.month.astype(int)
-             # Validate month values
-            if not ((outbound_df['month'] >= 1) & (outbound_df['month'] <= 12)).all():
-                st.error("Giá trị tháng trong xuatkho2024.csv phải nằm trong khoảng từ 1 đến 12.")
-                outbound_df = pd.DataFrame() # Tạo DataFrame rỗng
-
-        except ValueError as e:
-            st.error(f"Lỗi trong cột 'month' của xuatkho2024.csv: {str(e)}")
-            outbound_df = pd.DataFrame()  # Tạo DataFrame rỗng
-        except Exception as e:
-            st.error(f"Lỗi không xác định khi chuyển đổi cột 'month' của xuatkho2024.csv: {str(e)}")
-            outbound_df = pd.DataFrame()
-
-    except FileNotFoundError:
-        st.error("Không tìm thấy file tonkho2024.csv hoặc xuatkho2024.csv. Vui lòng đảm bảo rằng các file này nằm trong cùng thư mục với ứng dụng Streamlit.")
-        inventory_df, outbound_df = pd.DataFrame(), pd.DataFrame() # Trả về Dataframe rỗng thay vì dữ liệu mẫu để nhất quán
-    except Exception as e:
-        st.error(f"Lỗi khi đọc file CSV: {e}")
-        inventory_df, outbound_df = pd.DataFrame(), pd.DataFrame() # Trả về Dataframe rỗng thay vì dữ liệu mẫu để nhất quán
-
-    st.session_state.inventory_df = inventory_df
-    st.session_state.outbound_df = outbound_df
-    st.session_state.using_custom_data = True  # Đánh dấu là đang sử dụng dữ liệu tùy chỉnh
-else:
-    # Để tránh việc đọc lại file CSV mỗi khi có tương tác, giữ lại giá trị đã đọc
-    pass
 
 # --- Tập hợp dữ liệu ---
+@perf.timed(kind="aggregate")
 def combine_data(inventory_df, outbound_df, filters=None):
-    # Kiểm tra DataFrames rỗng
-    if inventory_df.empty or outbound_df.empty:
-        return pd.DataFrame()  # Trả về DataFrame rỗng nếu một trong hai DataFrame rỗng
-
-    # Áp dụng bộ lọc nếu có
-    if filters:
-        filtered_inventory = inventory_df.copy()
-        filtered_outbound = outbound_df.copy()
-
-        if 'month' in filters and filters['month']:
-            filtered_inventory = filtered_inventory[filtered_inventory['month'] == filters['month']]
-            filtered_outbound = filtered_outbound[filtered_outbound['month'] == filters['month']]
-
-        if 'commodity' in filters and filters['commodity']:
-            filtered_inventory = filtered_inventory[filtered_inventory['commodity'] == filters['commodity']]
-            filtered_outbound = filtered_outbound[filtered_outbound['commodity'] == filters['commodity']]
-
-        if 'phongBan' in filters and filters['phongBan']:
-            filtered_inventory = filtered_inventory[filtered_inventory['phongBan'] == filters['phongBan']]
-
-        if 'account' in filters and filters['account']:
-            filtered_outbound = filtered_outbound[filtered_outbound['account'] == filters['account']]
-    else:
-        filtered_inventory = inventory_df.copy()
-        filtered_outbound = outbound_df.copy()
-
-    # Lấy danh sách các mã sản phẩm duy nhất từ cả hai dữ liệu
-    all_item_numbers = pd.concat([
-        filtered_inventory['itemNumber'],
-        filtered_outbound['itemNumber']
-    ]).unique()
-
-    combined_data = []
-
-    for item_number in all_item_numbers:
-        inventory_items = filtered_inventory[filtered_inventory['itemNumber'] == item_number]
-        outbound_items = filtered_outbound[filtered_outbound['itemNumber'] == item_number]
-
-        # Kết hợp các tháng
-        months = pd.concat([
-            inventory_items['month'],
-            outbound_items['month']
-        ]).unique()
-
-        for month in months:
-            month_inventory = inventory_items[inventory_items['month'] == month]
-            in_stock = month_inventory['quantity'].sum() if not month_inventory.empty else 0
-
-            month_outbound = outbound_items[outbound_items['month'] == month]
-            outbound = month_outbound['quantity'].sum() if not month_outbound.empty else 0
-
-            # Tính giá trung bình
-            if not month_inventory.empty:
-                total_value = month_inventory['total'].sum()
-                total_quantity = month_inventory['quantity'].sum()
-                average_price = total_value / total_quantity if total_quantity > 0 else 0
-            elif not month_outbound.empty:
-                average_price = month_outbound['price'].iloc[0]
-            else:
-                average_price = 0
-
-            # Lấy thông tin sản phẩm từ một trong hai nguồn dữ liệu
-            if not month_inventory.empty:
-                item_info = month_inventory.iloc[0]
-            elif not month_outbound.empty:
-                item_info = month_outbound.iloc[0]
-            else:
-                continue
-
-            combined_data.append({
-                'itemNumber': item_number,
-                'item': item_info['item'],
-                'month': month,
-                'inStock': in_stock,
-                'outbound': outbound,
-                'balance': in_stock - outbound,
-                'uom': item_info['uom'],
-                'commodity': item_info['commodity'],
-                'averagePrice': average_price
-            })
-
-    return pd.DataFrame(combined_data)
+    # Gom nhóm theo (itemNumber, month) cho từng bên rồi ghép một lần, không lặp theo sản phẩm
+    return combine_inventory(inventory_df, outbound_df, filters)
 
+# Các số liệu xuất kho đọc từ một lần gom nhóm duy nhất, lưu cache theo phiên bản dữ liệu và bộ lọc
+@perf.timed(kind="aggregate")
 def get_monthly_usage():
-    # Kiểm tra DataFrames rỗng
-    if st.session_state.inventory_df.empty or st.session_state.outbound_df.empty:
-        return pd.DataFrame()
-
-    inventory_df = st.session_state.inventory_df
-    outbound_df = st.session_state.outbound_df
-
-    # Lấy tất cả các tháng
-    all_months = pd.concat([
-        inventory_df['month'],
-        outbound_df['month']
-    ]).unique()
-
-    # Convert to pandas Series before applying operations
-    all_months = pd.Series(all_months)
-
-    all_months = pd.to_numeric(all_months, errors='coerce')
-    all_months = all_months.dropna()
-    all_months = all_months.astype(int)
-    all_months = all_months.sort_values()  # Sort the Series
-
-    monthly_summary = []
-
-    for month in all_months:
-        monthly_outbound = outbound_df[outbound_df['month'] == month]
-
-        # Tính tổng
-        total_items = monthly_outbound['quantity'].sum() if not monthly_outbound.empty else 0
-        total_value = monthly_outbound['total'].sum() if not monthly_outbound.empty else 0
-
-        monthly_summary.append({
-            'month': month,  # No int() conversion needed here! Important
-            'totalItems': total_items,
-            'totalValue': total_value
-        })
-
-    return pd.DataFrame(monthly_summary)
+    return aggregations.get_monthly_usage(st.session_state.inventory_frame, st.session_state.outbound_frame)
 
+@perf.timed(kind="aggregate")
 def get_commodity_breakdown(month=None):
-    # Kiểm tra DataFrame rỗng
-    if st.session_state.outbound_df.empty:
-        return pd.DataFrame()
-
-    outbound_df = st.session_state.outbound_df
-
-    # Lọc theo tháng nếu có
-    filtered_outbound = outbound_df[outbound_df['month'] == month] if month else outbound_df
-
-    # Lấy danh mục duy nhất
-    commodities = filtered_outbound['commodity'].unique()
-
-    # Tính tổng giá trị
-    total_value = filtered_outbound['total'].sum() if not filtered_outbound.empty else 0
-
-    breakdown = []
-
-    for commodity in commodities:
-        commodity_items = filtered_outbound[filtered_outbound['commodity'] == commodity]
-        count = commodity_items['quantity'].sum()
-        value = commodity_items['total'].sum()
-        percentage = (value / total_value) * 100 if total_value > 0 else 0
-
-        breakdown.append({
-            'name': commodity,
-            'count': count,
-            'value': value,
-            'percentage': percentage
-        })
-
-    # Sắp xếp theo giá trị giảm dần
-    breakdown_df = pd.DataFrame(breakdown)
-    if not breakdown_df.empty:
-        breakdown_df = breakdown_df.sort_values(by='value', ascending=False)
-
-    return breakdown_df
+    return aggregations.get_commodity_breakdown(st.session_state.outbound_frame, month)
 
+@perf.timed(kind="aggregate")
 def get_top_used_items(limit=10, month=None):
-     # Kiểm tra DataFrame rỗng
-    if st.session_state.outbound_df.empty:
-        return pd.DataFrame()
-
-    outbound_df = st.session_state.outbound_df
-
-    # Lọc theo tháng nếu có
-    filtered_outbound = outbound_df[outbound_df['month'] == month] if month else outbound_df
-
-    # Nhóm các mặt hàng theo mã sản phẩm
-    if not filtered_outbound.empty:
-        grouped_items = filtered_outbound.groupby('itemNumber').agg({
-            'item': 'first',
-            'quantity': 'sum',
-            'total': 'sum',
-            'commodity': 'first',
-            'uom': 'first',
-            'price': 'first'
-        }).reset_index()
+    return aggregations.get_top_items(st.session_state.outbound_frame, limit, month)
 
-        # Sắp xếp theo số lượng
-        top_items = grouped_items.sort_values(by='quantity', ascending=False).head(limit)
-        return top_items
-
-    return pd.DataFrame()
+# Dự báo nhu cầu và điểm đặt hàng cho mọi sản phẩm, lưu cache theo phiên bản dữ liệu và tham số
+@perf.timed(kind="aggregate")
+def get_forecast(method="ses", window=3, lead_time_days=30, service_level=0.95, review_days=forecast.REVIEW_DAYS):
+    return forecast.get_forecast(st.session_state.inventory_frame, st.session_state.outbound_frame,
+                                 method, window, lead_time_days, service_level, review_days)
 
 # --- Xử lý tải lên CSV ---
-def parse_inventory_csv(uploaded_file):
-    try:
-        df = pd.read_csv(uploaded_file)
-
-        required_columns = ['month', 'itemNumber', 'item', 'phongBan', 'quantity', 'uom', 'price', 'total', 'commodity']
-        missing_columns = [col for col in required_columns if col not in df.columns]
-
-        if missing_columns:
-            return False, None, f"Thiếu các cột: {', '.join(missing_columns)}"
-
-        # Chuyển đổi kiểu dữ liệu
+def parse_inventory_csv(uploaded_file, progress=None):
+    # Kiểm tra tiêu đề trước, sau đó đọc từng khối và dừng ở khối lỗi đầu tiên
+    return ingest_csv(uploaded_file, INVENTORY_COLUMNS, progress=progress)
+
+def parse_outbound_csv(uploaded_file, progress=None):
+    return ingest_csv(uploaded_file, OUTBOUND_COLUMNS, progress=progress)
+
+@perf.timed(kind="load")
+def parse_shared(source, kind, parser, progress=None):
+    # Cùng nội dung file thì dùng lại DataFrame mà phiên khác đã phân tích
+    if isinstance(source, str):
+        digest = frame_store.digest_file(source, kind)
+    else:
+        digest = frame_store.digest_bytes(source.getvalue(), kind)
+
+    handle = frame_store.get(digest)
+    if handle is not None:
+        perf.count("frame_store.hit")
+        return True, handle, "Phân tích thành công", None
+    perf.count("frame_store.miss")
+
+    success, df, message, errors = parser(source, progress)
+    if not success:
+        return False, None, message, errors
+    return True, frame_store.put(digest, df), message, errors
+
+def load_default_data():
+    # Đọc dữ liệu mặc định, mỗi file chỉ được phân tích một lần cho tất cả các phiên
+    for key, path, parser in (
+        ('inventory_frame', "tonkho2024.csv", parse_inventory_csv),
+        ('outbound_frame', "xuatkho2024.csv", parse_outbound_csv),
+    ):
         try:
-            # Parse as date, extract month, and convert to int
-            df['month'] = pd.to_datetime(df['month'], errors='raise').dt.month.astype(int)
-            # Validate month values
-            if not ((df['month'] >= 1) & (df['month'] <= 12)).all():
-                return False, None, "Giá trị tháng phải nằm trong khoảng từ 1 đến 12."
-        except ValueError as e:
-            return False, None, f"Lỗi trong cột 'month': {str(e)}"
-        except Exception as e:
-            return False, None, f"Lỗi không xác định khi chuyển đổi cột 'month': {str(e)}"
-
-        df['quantity'] = pd.to_numeric(df['quantity'], errors='coerce').fillna(0)
-        df['price'] = pd.to_numeric(df['price'], errors='coerce').fillna(0)
-        df['total'] = pd.to_numeric(df['total'], errors='coerce').fillna(0)
-
-        return True, df, "Phân tích thành công"
-    except Exception as e:
-        return False, None, f"Lỗi khi phân tích: {str(e)}"
-
-def parse_outbound_csv(uploaded_file):
-    try:
-        df = pd.read_csv(uploaded_file)
+            success, handle, message, _ = parse_shared(path, key, parser)
+            if not success:
+                st.error(f"Lỗi khi đọc file {path}: {message}")
+        except FileNotFoundError:
+            st.error(f"Không tìm thấy file {path}. Vui lòng đảm bảo rằng file này nằm trong cùng thư mục với ứng dụng Streamlit.")
+            success, handle = False, None
 
-        required_columns = ['month', 'account', 'itemNumber', 'item', 'quantity', 'uom', 'price', 'total', 'currency', 'receiver', 'commodity']
-        missing_columns = [col for col in required_columns if col not in df.columns]
+        # Trả về DataFrame rỗng thay vì dữ liệu mẫu để nhất quán
+        st.session_state[key] = handle if success else frame_store.EMPTY
 
-        if missing_columns:
-            return False, None, f"Thiếu các cột: {', '.join(missing_columns)}"
+    st.session_state.using_custom_data = True  # Đánh dấu là đang sử dụng dữ liệu tùy chỉnh
 
-        # Chuyển đổi kiểu dữ liệu
-        try:
-            # Parse as date, extract month, and convert to int
-            df['month'] = pd.to_datetime(df['month'], errors='raise').dt.month.astype(int)
-            # Validate month values
-            if not ((df['month'] >= 1) & (df['month'] <= 12)).all():
-                return False, None, "Giá trị tháng phải nằm trong khoảng từ 1 đến 12."
-        except ValueError as e:
-            return False, None, f"Lỗi trong cột 'month': {str(e)}"
-        except Exception as e:
-            return False, None, f"Lỗi không xác định khi chuyển đổi cột 'month': {str(e)}"
-
-        df['quantity'] = pd.to_numeric(df['quantity'], errors='coerce').fillna(0)
-        df['price'] = pd.to_numeric(df['price'], errors='coerce').fillna(0)
-        df['total'] = pd.to_numeric(df['total'], errors='coerce').fillna(0)
-        return True, df, "Phân tích thành công"
-    except Exception as e:
-        return False, None, f"Lỗi khi phân tích: {str(e)}"
 # --- Giao diện người dùng ---
 def main():
+    # Để tránh việc đọc lại file CSV mỗi khi có tương tác, chỉ đọc một lần cho mỗi phiên
+    if 'inventory_frame' not in st.session_state:
+        load_default_data()
+
     # Sidebar với navigation
     st.sidebar.title("Kho Hàng Quản Lý")
 
@@ -363,6 +145,7 @@ def main():
     elif navigation == "Tải lên dữ liệu":
         show_upload()
 
+@perf.timed(kind="render")
 def show_dashboard():
     st.title("Tổng quan kho hàng")
     st.subheader("Thống kê dữ liệu kho hàng và xuất nhập kho năm 2024")
@@ -518,6 +301,7 @@ def show_dashboard():
     else:
         st.info("Không có dữ liệu sản phẩm để hiển thị")
 
+@perf.timed(kind="render")
 def show_inventory():
     st.title("Tồn kho")
 
@@ -525,13 +309,13 @@ def show_inventory():
     st.sidebar.header("Bộ lọc")
 
     # Lấy danh sách tháng, danh mục và phòng ban
-    months = sorted(st.session_state.inventory_df['month'].unique()) if not st.session_state.inventory_df.empty else []
-    commodities = sorted(st.session_state.inventory_df['commodity'].unique()) if not st.session_state.inventory_df.empty else []
+    months = sorted(get_inventory_df()['month'].unique()) if not get_inventory_df().empty else []
+    commodities = sorted(get_inventory_df()['commodity'].unique()) if not get_inventory_df().empty else []
 
     # Safely handle 'phongBan' if it doesn't exist or has mixed types
-    if 'phongBan' in st.session_state.inventory_df.columns and not st.session_state.inventory_df.empty:
+    if 'phongBan' in get_inventory_df().columns and not get_inventory_df().empty:
         # Convert the 'phongBan' column to strings to handle mixed data types
-        phong_ban_series = st.session_state.inventory_df['phongBan'].astype(str)
+        phong_ban_series = get_inventory_df()['phongBan'].astype(str)
 
         # Remove NaN values by replacing them with an empty string
         phong_ban_series = phong_ban_series.replace('nan', '')
@@ -556,7 +340,7 @@ def show_inventory():
         filters['phongBan'] = selected_department
 
     # Kết hợp dữ liệu với bộ lọc
-    combined_data = combine_data(st.session_state.inventory_df, st.session_state.outbound_df, filters)
+    combined_data = combine_data(get_inventory_df(), get_outbound_df(), filters)
 
     # Hiển thị dữ liệu
     if not combined_data.empty:
@@ -582,17 +366,18 @@ def show_inventory():
     else:
         st.info("Không có dữ liệu tồn kho phù hợp với bộ lọc")
 
+@perf.timed(kind="render")
 def show_analysis():
     st.title("Phân tích kho hàng")
 
     # Các tab phân tích
-    tab1, tab2, tab3 = st.tabs(["Phân tích theo danh mục", "Phân tích theo tháng", "Phân tích sản phẩm"])
+    tab1, tab2, tab3, tab4 = st.tabs(["Phân tích theo danh mục", "Phân tích theo tháng", "Phân tích sản phẩm", "Nguy cơ hết hàng"])
 
     with tab1:
         st.header("Phân bổ giá trị theo danh mục")
 
         # Lấy danh sách tháng
-        months = sorted(st.session_state.inventory_df['month'].unique()) if not st.session_state.inventory_df.empty else []
+        months = sorted(get_inventory_df()['month'].unique()) if not get_inventory_df().empty else []
         selected_month = st.selectbox("Chọn tháng", [None] + list(months), format_func=lambda x: "Tất cả" if x is None else get_month_name(x), key="commodity_month")
 
         # Lấy dữ liệu danh mục
@@ -688,110 +473,175 @@ def show_analysis():
         search_query = st.text_input("Tìm kiếm sản phẩm", placeholder="Nhập mã hoặc tên sản phẩm")
 
         if search_query:
-            # Tìm trong cả hai bộ dữ liệu
-            inventory_results = st.session_state.inventory_df[
-                st.session_state.inventory_df['itemNumber'].str.contains(search_query, case=False) |
-                st.session_state.inventory_df['item'].str.contains(search_query, case=False)
-            ] if not st.session_state.inventory_df.empty else pd.DataFrame() # thêm check Dataframe rỗng
-            outbound_results = st.session_state.outbound_df[
-                st.session_state.outbound_df['itemNumber'].str.contains(search_query, case=False) |
-                st.session_state.outbound_df['item'].str.contains(search_query, case=False)
-            ] if not st.session_state.outbound_df.empty else pd.DataFrame() # thêm check Dataframe rỗng
-
-            # Lấy mã sản phẩm duy nhất từ kết quả tìm kiếm
-            found_items = pd.concat([
-                inventory_results[['itemNumber', 'item']],
-                outbound_results[['itemNumber', 'item']]
-            ]).drop_duplicates(subset=['itemNumber'])
+            # Tra chỉ mục n-gram (không dấu, không phân biệt hoa thường) dựng một lần cho mỗi bộ dữ liệu
+            item_index = get_item_index(st.session_state.inventory_frame, st.session_state.outbound_frame)
+            found_items = item_index.search(search_query)
 
             if not found_items.empty:
+                item_names = dict(zip(found_items['itemNumber'], found_items['item']))
                 selected_item = st.selectbox(
                     "Chọn sản phẩm",
                     found_items['itemNumber'].tolist(),
-                    format_func=lambda x: f"{x} - {found_items[found_items['itemNumber'] == x]['item'].iloc[0]}"
+                    format_func=lambda x: f"{x} - {item_names[x]}"
                 )
 
                 if selected_item:
-                    # Lấy dữ liệu cho sản phẩm đã chọn
-                    item_inventory = st.session_state.inventory_df[st.session_state.inventory_df['itemNumber'] == selected_item] if not st.session_state.inventory_df.empty else pd.DataFrame()
-                    item_outbound = st.session_state.outbound_df[st.session_state.outbound_df['itemNumber'] == selected_item] if not  st.session_state.outbound_df.empty else pd.DataFrame()
+                    # Lịch sử 12 tháng của các sản phẩm được tính gộp một lần và lưu cache theo từng sản phẩm
+                    compare_items = st.multiselect(
+                        "So sánh với",
+                        [x for x in found_items['itemNumber'].tolist() if x != selected_item],
+                        format_func=lambda x: f"{x} - {item_names[x]}"
+                    )
+                    history = get_item_history(
+                        st.session_state.inventory_frame,
+                        st.session_state.outbound_frame,
+                        [selected_item] + compare_items
+                    )
+                    history['month_name'] = history['month'].apply(get_month_name)
+                    months_df = history[history['itemNumber'] == selected_item]
 
                     # Hiển thị thông tin sản phẩm
-                    item_name = item_inventory['item'].iloc[0] if not item_inventory.empty else item_outbound['item'].iloc[0] if not item_outbound.empty else ""
-                    commodity = item_inventory['commodity'].iloc[0] if not item_inventory.empty else item_outbound['commodity'].iloc[0] if not item_outbound.empty else ""
+                    item_name = months_df['item'].iloc[0]
+                    commodity = months_df['commodity'].iloc[0]
 
                     st.subheader(f"{selected_item} - {item_name}")
                     st.write(f"Danh mục: {commodity}")
 
-                    # Tạo dữ liệu phân tích theo tháng
-                    months_data = []
-                    for month in range(1, 13):
-                        month_inventory = item_inventory[item_inventory['month'] == month] if not item_inventory.empty else pd.DataFrame()
-                        month_outbound = item_outbound[item_outbound['month'] == month] if not item_outbound.empty else pd.DataFrame()
-
-                        in_stock = month_inventory['quantity'].sum() if not month_inventory.empty else 0
-                        out = month_outbound['quantity'].sum() if not month_outbound.empty else 0
-
-                    months_data.append({
-                        'month': month,
-                        'month_name': get_month_name(month),
-                        'inStock': in_stock,
-                        'outbound': out,
-                        'balance': in_stock - out
-                    })
-
-                months_df = pd.DataFrame(months_data)
-
-                # Hiển thị biểu đồ
-                st.subheader("Xu hướng tồn kho và xuất kho theo tháng")
-
-                fig = go.Figure()
-                fig.add_trace(go.Bar(
-                    x=months_df['month_name'],
-                    y=months_df['inStock'],
-                    name='Tồn kho',
-                    marker_color='#3b82f6'
-                ))
-                fig.add_trace(go.Bar(
-                    x=months_df['month_name'],
-                    y=months_df['outbound'],
-                    name='Xuất kho',
-                    marker_color='#ef4444'
-                ))
-                fig.add_trace(go.Line(
-                    x=months_df['month_name'],
-                    y=months_df['balance'],
-                    name='Còn lại',
-                    marker_color='#10b981'
-                ))
-
-                fig.update_layout(
-                    title='Phân tích tồn kho và xuất kho theo tháng',
-                    xaxis_title='Tháng',
-                    yaxis_title='Số lượng',
-                    barmode='group',
-                    height=500
-                )
-
-                st.plotly_chart(fig, use_container_width=True)
+                    # Hiển thị biểu đồ
+                    st.subheader("Xu hướng tồn kho và xuất kho theo tháng")
+
+                    fig = go.Figure()
+                    fig.add_trace(go.Bar(
+                        x=months_df['month_name'],
+                        y=months_df['inStock'],
+                        name='Tồn kho',
+                        marker_color='#3b82f6'
+                    ))
+                    fig.add_trace(go.Bar(
+                        x=months_df['month_name'],
+                        y=months_df['outbound'],
+                        name='Xuất kho',
+                        marker_color='#ef4444'
+                    ))
+                    fig.add_trace(go.Line(
+                        x=months_df['month_name'],
+                        y=months_df['balance'],
+                        name='Còn lại',
+                        marker_color='#10b981'
+                    ))
+
+                    fig.update_layout(
+                        title='Phân tích tồn kho và xuất kho theo tháng',
+                        xaxis_title='Tháng',
+                        yaxis_title='Số lượng',
+                        barmode='group',
+                        height=500
+                    )
+
+                    st.plotly_chart(fig, use_container_width=True)
+
+                    if compare_items:
+                        st.subheader("So sánh xuất kho theo tháng")
+                        fig = px.line(
+                            history,
+                            x='month_name',
+                            y='outbound',
+                            color='itemNumber',
+                            markers=True,
+                            labels={'outbound': 'Xuất kho', 'month_name': 'Tháng', 'itemNumber': 'Mã sản phẩm'}
+                        )
+                        fig.update_layout(height=400)
+                        st.plotly_chart(fig, use_container_width=True)
+
+                    # Hiển thị bảng dữ liệu
+                    st.subheader("Bảng dữ liệu chi tiết theo tháng")
+                    st.dataframe(
+                        months_df[['month', 'month_name', 'inStock', 'outbound', 'balance']],
+                        hide_index=True,
+                        column_config={
+                            'month': None,  # Ẩn cột số tháng
+                            'month_name': 'Tháng',
+                            'inStock': 'Tồn kho',
+                            'outbound': 'Xuất kho',
+                            'balance': 'Còn lại'
+                        },
+                        use_container_width=True
+                    )
+            else:
+                st.warning("Không tìm thấy sản phẩm phù hợp")
+
+    with tab4:
+        st.header("Nguy cơ hết hàng")
+
+        # Tham số dự báo: đổi tham số chỉ tính lại một lần cho cả danh sách sản phẩm
+        col1, col2, col3, col4, col5 = st.columns(5)
+        method = col1.radio(
+            "Mô hình",
+            forecast.METHODS,
+            format_func=lambda x: "San bằng mũ" if x == "ses" else "Trung bình trượt",
+            horizontal=True,
+            key="forecast_method"
+        )
+        window = col2.slider("Số tháng trung bình", 1, 6, 3, disabled=method != "ma", key="forecast_window")
+        lead_time_days = col3.number_input("Thời gian chờ hàng (ngày)", min_value=1, max_value=180, value=30, key="forecast_lead_time")
+        review_days = col4.number_input("Chu kỳ đặt hàng (ngày)", min_value=1, max_value=180, value=forecast.REVIEW_DAYS, key="forecast_review_days")
+        service_level = col5.slider("Mức phục vụ", 0.80, 0.99, 0.95, step=0.01, key="forecast_service_level")
+
+        forecast_data = get_forecast(method, window, lead_time_days, service_level, review_days)
+
+        if not forecast_data.empty:
+            at_risk = forecast_data[forecast_data['at_risk']]
+            if (forecast_data['status'] == forecast.UNKNOWN).all():
+                st.warning("Chưa có dữ liệu tồn kho: chỉ hiển thị dự báo nhu cầu, chưa đánh giá được nguy cơ hết hàng.")
+
+            col1, col2, col3 = st.columns(3)
+            col1.metric("Sản phẩm có xuất kho", f"{len(forecast_data):,}")
+            col2.metric("Hết hàng", f"{(forecast_data['status'] == forecast.OUT_OF_STOCK).sum():,}")
+            col3.metric("Cần đặt hàng", f"{len(at_risk):,}")
+
+            if not at_risk.empty:
+                # Các sản phẩm còn ít ngày hàng nhất (chưa hết hàng)
+                lowest_cover = at_risk[at_risk['status'] != forecast.OUT_OF_STOCK].head(20)
+                if not lowest_cover.empty:
+                    fig = px.bar(
+                        lowest_cover,
+                        x='days_of_cover',
+                        y='itemNumber',
+                        color='status',
+                        orientation='h',
+                        hover_data=['item', 'balance', 'reorder_point'],
+                        labels={'days_of_cover': 'Số ngày còn hàng', 'itemNumber': 'Mã sản phẩm', 'status': 'Trạng thái'}
+                    )
+                    fig.add_vline(x=lead_time_days, line_dash="dash", annotation_text="Thời gian chờ hàng")
+                    fig.update_layout(height=500, yaxis={'categoryorder': 'total descending'})
+                    st.plotly_chart(fig, use_container_width=True)
 
-                # Hiển thị bảng dữ liệu
-                st.subheader("Bảng dữ liệu chi tiết theo tháng")
                 st.dataframe(
-                    months_df,
+                    at_risk,
                     hide_index=True,
                     column_config={
-                        'month': None,  # Ẩn cột số tháng
-                        'month_name': 'Tháng',
-                        'inStock': 'Tồn kho',
-                        'outbound': 'Xuất kho',
-                        'balance': 'Còn lại'
+                        'itemNumber': 'Mã sản phẩm',
+                        'item': 'Sản phẩm',
+                        'commodity': 'Danh mục',
+                        'uom': 'ĐVT',
+                        'balance': st.column_config.NumberColumn('Còn lại', format="%.0f"),
+                        'forecast': st.column_config.NumberColumn('Dự báo tháng tới', format="%.1f"),
+                        'daily_demand': None,
+                        'sigma': st.column_config.NumberColumn('Độ lệch', format="%.1f"),
+                        'alpha': st.column_config.NumberColumn('Alpha', format="%.1f"),
+                        'reorder_point': st.column_config.NumberColumn('Điểm đặt hàng', format="%.0f"),
+                        'days_of_cover': st.column_config.NumberColumn('Số ngày còn hàng', format="%.0f"),
+                        'status': 'Trạng thái',
+                        'at_risk': None
                     },
                     use_container_width=True
                 )
+            else:
+                st.success("Không có sản phẩm nào có nguy cơ hết hàng")
         else:
-            st.warning("Không tìm thấy sản phẩm phù hợp")
+            st.info("Không có dữ liệu xuất kho để dự báo")
 
+@perf.timed(kind="render")
 def show_upload():
     st.title("Tải lên dữ liệu")
     st.subheader("Tải lên file dữ liệu CSV")
@@ -817,14 +667,17 @@ def show_upload():
         if inventory_file is not None and not st.session_state.inventory_uploaded:
             if st.button("Xử lý file tồn kho", key="process_inventory"):
                 with st.spinner("Đang xử lý file tồn kho..."):
-                    success, df, message = parse_inventory_csv(inventory_file)
+                    progress_bar = st.progress(0.0)
+                    success, handle, message, errors = parse_shared(inventory_file, 'inventory_frame', parse_inventory_csv, progress_bar.progress)
                     
                     if success:
-                        st.session_state.temp_inventory_df = df
+                        st.session_state.temp_inventory_frame = handle
                         st.session_state.inventory_uploaded = True
                         st.success("Đã tải lên dữ liệu tồn kho thành công")
                     else:
                         st.error(f"Lỗi khi phân tích file tồn kho: {message}")
+                        if errors is not None and not errors.empty:
+                            st.dataframe(errors, hide_index=True, use_container_width=True)
         
         if st.session_state.inventory_uploaded:
             st.success("✅ Đã tải lên file tồn kho")
@@ -839,14 +692,17 @@ def show_upload():
         if outbound_file is not None and not st.session_state.outbound_uploaded:
             if st.button("Xử lý file xuất kho", key="process_outbound"):
                 with st.spinner("Đang xử lý file xuất kho..."):
-                    success, df, message = parse_outbound_csv(outbound_file)
+                    progress_bar = st.progress(0.0)
+                    success, handle, message, errors = parse_shared(outbound_file, 'outbound_frame', parse_outbound_csv, progress_bar.progress)
                     
                     if success:
-                        st.session_state.temp_outbound_df = df
+                        st.session_state.temp_outbound_frame = handle
                         st.session_state.outbound_uploaded = True
                         st.success("Đã tải lên dữ liệu xuất kho thành công")
                     else:
                         st.error(f"Lỗi khi phân tích file xuất kho: {message}")
+                        if errors is not None and not errors.empty:
+                            st.dataframe(errors, hide_index=True, use_container_width=True)
         
         if st.session_state.outbound_uploaded:
             st.success("✅ Đã tải lên file xuất kho")
@@ -861,8 +717,8 @@ def show_upload():
             if st.button("Lưu và áp dụng dữ liệu", type="primary"):
                 with st.spinner("Đang cập nhật dữ liệu..."):
                     # Cập nhật dữ liệu
-                    st.session_state.inventory_df = st.session_state.temp_inventory_df
-                    st.session_state.outbound_df = st.session_state.temp_outbound_df
+                    st.session_state.inventory_frame = st.session_state.temp_inventory_frame
+                    st.session_state.outbound_frame = st.session_state.temp_outbound_frame
                     st.session_state.using_custom_data = True
                     
                     # Reset upload flags
@@ -881,4 +737,6 @@ def show_upload():
 
 # Run the app
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    # Mỗi lần chạy lại script ghi một bản ghi rerun (thời gian, cache, bộ nhớ) vào nhật ký hiệu năng
+    with perf.rerun("Test"):
+        main()
\ No newline at end of file
@@ -0,0 +1,95 @@
+import plotly.express as px
+import plotly.graph_objects as go
+import streamlit as st
+
+from src.logger.base import LOG_PATH
+from src.logger.report import cache_hit_rates, flame, latency_by_page, memory_by_session, read_log, slowest_functions
+
+# Thiết lập trang
+st.set_page_config(page_title="Performance", page_icon="⏱", layout="wide")
+st.subheader("⏱ Hiệu năng ứng dụng")
+st.caption(f"Nhật ký: {LOG_PATH}")
+
+spans, reruns = read_log(LOG_PATH)
+if reruns.empty:
+    st.info("Chưa có dữ liệu hiệu năng. Mở các trang Expense, Inventory hoặc Test để ghi nhật ký.")
+    st.stop()
+
+# Lọc theo trang
+pages = sorted(reruns["page"].dropna().unique().tolist())
+selected_pages = st.sidebar.multiselect("Trang", pages, default=pages)
+reruns = reruns[reruns["page"].isin(selected_pages)]
+spans = spans[spans["page"].isin(selected_pages)] if not spans.empty else spans
+if reruns.empty:
+    st.info("Chọn ít nhất một trang có dữ liệu để xem hiệu năng.")
+    st.stop()
+
+# Độ trễ mỗi lần chạy lại theo trang
+st.markdown("### Độ trễ chạy lại (ms)")
+latency = latency_by_page(reruns)
+col1, col2 = st.columns([2, 3])
+with col1:
+    st.dataframe(latency.round(1), use_container_width=True, hide_index=True)
+with col2:
+    fig = px.bar(latency.melt(id_vars="page", value_vars=["p50_ms", "p95_ms"], var_name="percentile", value_name="ms"),
+                 x="page", y="ms", color="percentile", barmode="group", title="p50 / p95 theo trang")
+    st.plotly_chart(fig, use_container_width=True)
+
+fig = px.scatter(reruns, x="time", y="ms", color="page", title="Độ trễ theo thời gian")
+st.plotly_chart(fig, use_container_width=True)
+
+# Hàm chậm nhất
+st.markdown("### Hàm chậm nhất")
+st.dataframe(slowest_functions(spans).round(1), use_container_width=True, hide_index=True)
+
+# Cache và bộ nhớ
+col1, col2 = st.columns(2)
+with col1:
+    st.markdown("### Tỉ lệ trúng cache")
+    st.dataframe(
+        cache_hit_rates(reruns),
+        use_container_width=True,
+        hide_index=True,
+        column_config={
+            "hit_rate": st.column_config.ProgressColumn("hit rate", format="%.2f", min_value=0, max_value=1),
+        },
+    )
+with col2:
+    st.markdown("### Bộ nhớ theo phiên")
+    st.dataframe(memory_by_session(reruns).round(1), use_container_width=True, hide_index=True)
+
+# Biểu đồ flame của một lần chạy lại
+st.markdown("### Phân rã một lần chạy lại")
+recent = reruns.sort_values("ts", ascending=False).head(200)
+labels = {
+    row.rerun_id: f"{row.time:%Y-%m-%d %H:%M:%S} · {row.page} · {row.ms:,.0f} ms"
+    for row in recent.itertuples()
+}
+slowest = recent.loc[recent["ms"].idxmax(), "rerun_id"]
+rerun_id = st.selectbox("Lần chạy lại (200 lần gần nhất)", list(labels), index=list(labels).index(slowest),
+                        format_func=labels.get)
+
+breakdown = flame(spans, rerun_id)
+if breakdown.empty:
+    st.info("Lần chạy lại này không có span nào.")
+else:
+    # Mỗi tầng lồng nhau là một hàng, thanh bắt đầu tại offset và dài đúng thời gian của span
+    fig = go.Figure(go.Bar(
+        y=breakdown["depth"],
+        x=breakdown["ms"],
+        base=breakdown["offset_ms"],
+        orientation="h",
+        text=breakdown["name"],
+        textposition="inside",
+        insidetextanchor="start",
+        hovertemplate="%{text}<br>%{x:.1f} ms (bắt đầu %{base:.1f} ms)<extra></extra>",
+        marker_color=breakdown["kind"].map({"load": "#636efa", "filter": "#00cc96", "aggregate": "#ffa15a",
+                                            "render": "#ef553b"}).fillna("#ab63fa"),
+    ))
+    fig.update_layout(
+        xaxis_title="ms từ đầu lần chạy lại",
+        yaxis=dict(title="Độ sâu", autorange="reversed", dtick=1),
+        height=200 + 40 * (int(breakdown["depth"].max()) + 1),
+    )
+    st.plotly_chart(fig, use_container_width=True)
+    st.dataframe(breakdown.round(2), use_container_width=True, hide_index=True)
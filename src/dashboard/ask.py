@@ -0,0 +1,45 @@
+"""Streamlit panel for the ask-your-data pipeline (src.models.ask)"""
+import os
+
+import pandas as pd
+import streamlit as st
+
+from src.models.ask import ask
+from src.models.llms import MODELS
+
+DEFAULT_MODEL = os.environ.get("LLM_MODEL", "gpt-3.5-turbo")
+
+
+def ask_panel(df: pd.DataFrame, name: str, data_version, widget_key: str = "ask") -> None:
+    """Question box, model picker, generated chart, code and stage timings
+
+    Args:
+        df (pd.DataFrame): data the questions are about
+        name (str): dataset name shown to the model
+        data_version: version of df, used by the summary/response/image caches
+        widget_key (str): prefix of the widget keys, unique per page
+    """
+    col_question, col_model = st.columns([4, 1])
+    question = col_question.text_input("Câu hỏi về dữ liệu", key=f"{widget_key}_question",
+                                       placeholder="Ví dụ: Chi phí theo tháng của từng phòng ban?")
+    model_name = col_model.selectbox("Mô hình", MODELS, index=MODELS.index(DEFAULT_MODEL)
+                                     if DEFAULT_MODEL in MODELS else 0, key=f"{widget_key}_model")
+    if not question.strip():
+        return
+
+    with st.spinner("Đang trả lời..."):
+        result = ask(question, df, name, data_version, model_name)
+
+    if result.image is not None:
+        st.image(result.image)
+    if result.error is not None:
+        st.error(f"Không trả lời được: {result.error}")
+    if result.code:
+        with st.expander("Mã được sinh ra"):
+            st.code(result.code, language="python")
+
+    timings = " · ".join(f"{stage}: {seconds * 1000:,.0f} ms" for stage, seconds in result.timings.items())
+    usage = result.usage
+    tokens = usage.get("total_tokens") or sum(usage.get(name, 0) for name in
+                                              ("prompt_tokens", "completion_tokens", "input_tokens", "output_tokens"))
+    st.caption(f"{timings} · tokens: {tokens:,}" + (" · cache" if result.cached else ""))
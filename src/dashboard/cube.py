@@ -0,0 +1,71 @@
+import pandas as pd
+
+CUBE_DIMS = ["phong_ban", "Commodity", "Month", "Type"]
+
+
+def build_cube(df: pd.DataFrame, dims: list = CUBE_DIMS, value: str = "Total", item_column: str = "Item") -> pd.DataFrame:
+    """Pre-aggregate the transactions on every combination of dims
+
+    Args:
+        df (pd.DataFrame): raw transactions
+        dims (list): dimension columns
+        value (str): measure column
+        item_column (str): column counted for the "Tổng Mặt Hàng" card
+
+    Returns:
+        pd.DataFrame: dims + sum, count, min, max (of value) and items
+    """
+    # dropna=False: dòng thiếu Type vẫn được tính như khi lọc trên dữ liệu gốc
+    grouped = df.groupby(dims, sort=False, dropna=False, observed=True)
+    cube = grouped[value].agg(["sum", "count", "min", "max"])
+    cube["items"] = grouped[item_column].count()
+    return cube.reset_index()
+
+
+def merge_cubes(cube: pd.DataFrame, delta: pd.DataFrame, dims: list = CUBE_DIMS) -> pd.DataFrame:
+    """Fold the cube of newly appended rows into an existing cube
+
+    Only cube rows are regrouped (sums and counts add, min/max combine), so
+    the cost does not grow with the transaction history.
+    """
+    both = pd.concat([cube, delta], ignore_index=True)
+    merged = both.groupby(dims, sort=False, dropna=False, observed=True).agg(
+        sum=("sum", "sum"),
+        count=("count", "sum"),
+        min=("min", "min"),
+        max=("max", "max"),
+        items=("items", "sum"),
+    )
+    return merged.reset_index()
+
+
+def slice_cube(cube: pd.DataFrame, **filters) -> pd.DataFrame:
+    """Keep the cells whose dimension values are in the selected lists
+
+    Example: slice_cube(cube, phong_ban=["HCMPEST"], Month=["Tháng 1"])
+    """
+    mask = pd.Series(True, index=cube.index)
+    for dim, values in filters.items():
+        # Giống df.query("dim==@values"): NaN không bao giờ khớp
+        mask &= cube[dim].isin(values) & cube[dim].notna()
+    return cube[mask]
+
+
+def rollup(cube: pd.DataFrame, by, value: str = "Total") -> pd.DataFrame:
+    """Sum a cube (slice) up to the given dimension(s)
+
+    Returns:
+        pd.DataFrame: by + value, one row per group in first-seen order
+    """
+    return cube.groupby(by, sort=False, observed=True)["sum"].sum().rename(value).reset_index()
+
+
+def summary(cube: pd.DataFrame) -> dict:
+    """Totals of a cube (slice): items, count, sum, min and max"""
+    return {
+        "items": int(cube["items"].sum()),
+        "count": int(cube["count"].sum()),
+        "sum": cube["sum"].sum(),
+        "min": cube["min"].min(),
+        "max": cube["max"].max(),
+    }
@@ -0,0 +1,48 @@
+"""Download buttons for the current selection (XLSX / CSV / Parquet)"""
+import pandas as pd
+import streamlit as st
+
+from src.data.cache import SizedLRUCache
+from src.data.export import FORMATS, MONEY_COLUMNS, export
+from src.dashboard.table import row_order
+
+_files = SizedLRUCache(256 * 1024 * 1024)
+
+
+def export_panel(df: pd.DataFrame, key, select=None, file_stem: str = "export", money_columns=MONEY_COLUMNS,
+                 widget_key: str = "export") -> None:
+    """Build the file of the selection on request, then offer it for download
+
+    The file is only written when the user asks for it (not on every rerun)
+    and is kept per (selection key, format), so the download button stays
+    available across reruns and sessions.
+
+    Args:
+        df (pd.DataFrame): full frame (not the selection)
+        key: hashable (dataset version, filter selection), see src.dashboard.table.row_order
+        select (callable, optional): function(df) -> boolean mask of the selection
+        file_stem (str): downloaded file name without extension
+        money_columns (list): columns formatted as VND in the XLSX file
+        widget_key (str): prefix of the widget keys, unique per page
+    """
+    col_format, col_build, col_download = st.columns([1, 1, 2])
+    fmt = col_format.selectbox("Định dạng", list(FORMATS), key=f"{widget_key}_format")
+    cache_key = (key, fmt)
+
+    if cache_key not in _files and col_build.button("Tạo file", key=f"{widget_key}_build"):
+        selection = df.iloc[row_order(df, key, select)]
+        with st.spinner(f"Đang ghi {len(selection):,} dòng..."):
+            try:
+                _files.put(cache_key, export(selection, fmt, money_columns))
+            except (ValueError, ImportError) as e:
+                st.error(f"Không xuất được file: {e}")
+
+    data = _files.get(cache_key)
+    if data is not None:
+        col_download.download_button(
+            f"Tải {file_stem}.{fmt} ({len(data) / 1024:,.0f} KB)",
+            data=data,
+            file_name=f"{file_stem}.{fmt}",
+            mime=FORMATS[fmt],
+            key=f"{widget_key}_download",
+        )
@@ -0,0 +1,63 @@
+"""Process-wide cache of rendered plotly figures
+
+A rerun that only changes the menu (Home <-> Table) or another widget keeps
+the same dataset version and filter selection, so every chart can be served
+from its serialized JSON instead of being re-aggregated and rebuilt by
+plotly express.
+"""
+import os
+
+import plotly.io as pio
+
+from src.data.cache import SizedLRUCache
+
+# Giới hạn bộ nhớ cho cache biểu đồ dùng chung (MB)
+FIGURE_CACHE_MB = int(os.environ.get("FIGURE_CACHE_MAX_MB", "64"))
+
+_figures = SizedLRUCache(FIGURE_CACHE_MB * 1024 * 1024)
+
+
+def _normalize(value):
+    if isinstance(value, dict):
+        return tuple(sorted((str(key), _normalize(item)) for key, item in value.items()))
+    if isinstance(value, (list, tuple, set, frozenset)):
+        # Thứ tự chọn trong multiselect không đổi biểu đồ
+        return tuple(sorted({str(item) for item in value}))
+    return str(value)
+
+
+def filter_key(**filters) -> tuple:
+    """Order-insensitive, hashable key of a filter selection
+
+    Example:
+        filter_key(phong_ban=["HCMPEST", "HCMCHEM"]) == filter_key(phong_ban=["HCMCHEM", "HCMPEST"])
+    """
+    return tuple(sorted((name, _normalize(value)) for name, value in filters.items()))
+
+
+def cached_figure(version, chart_id: str, filters: dict, build):
+    """Return the figure of (version, chart_id, filters), building it only once
+
+    Args:
+        version: hashable dataset version (file signature, IncrementalDataset.version, ...)
+        chart_id (str): unique name of the chart, per page
+        filters (dict): filter selection the figure depends on
+        build (callable): function() -> plotly Figure, called on a miss
+
+    Returns:
+        plotly.graph_objects.Figure: a fresh figure, safe to modify
+    """
+    key = (version, chart_id, filter_key(**filters))
+    payload = _figures.get(key)
+    if payload is not None:
+        return pio.from_json(payload)
+
+    fig = build()
+    # Phiên bản cũ của cùng biểu đồ không còn dùng được nữa
+    _figures.invalidate(lambda cached: cached[1] == chart_id and cached[0] != version)
+    _figures.put(key, fig.to_json())
+    return fig
+
+
+def cache_stats() -> dict:
+    return _figures.stats()
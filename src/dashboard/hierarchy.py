@@ -0,0 +1,186 @@
+"""Commodity hierarchy rollup tree (Commodity > level 2 > level 3)
+
+The leaves are the cells of a cube on (levels, Month, phong_ban), folded
+forward by IncrementalDataset like the expense cube. The tree is built once
+per dataset version from that cube: every node gets an id (parents before
+children), a parent id and its path. Totals for a filter selection are one
+bincount of the kept leaf cells plus one bincount per level to push sums to
+the parents; drilling to any node is then a lookup in those arrays.
+"""
+import numpy as np
+import pandas as pd
+
+from src.data.cache import SizedLRUCache
+from src.dashboard.cube import build_cube, merge_cubes
+
+LEVELS = ["Commodity", "Commodity level 2", "Commodity level 3"]
+SLICE_DIMS = ["Month", "phong_ban"]
+TREE_DIMS = LEVELS + SLICE_DIMS
+MISSING = "(không có)"
+
+_trees = SizedLRUCache(64 * 1024 * 1024)
+
+
+def build_tree_cube(df: pd.DataFrame) -> pd.DataFrame:
+    """Leaf cells of the tree, see src.dashboard.cube.build_cube"""
+    return build_cube(df, TREE_DIMS)
+
+
+def merge_tree_cubes(cube: pd.DataFrame, delta: pd.DataFrame) -> pd.DataFrame:
+    return merge_cubes(cube, delta, TREE_DIMS)
+
+
+class RollupTree:
+    """Nodes of the commodity hierarchy with per-slice totals
+
+    Args:
+        cube (pd.DataFrame): output of build_tree_cube
+        levels (list): hierarchy columns, top level first
+    """
+
+    def __init__(self, cube: pd.DataFrame, levels: list = LEVELS) -> None:
+        self.levels = [level for level in levels if level in cube.columns]
+        paths = pd.DataFrame({
+            level: cube[level].astype(object).where(cube[level].notna(), MISSING) for level in self.levels
+        })
+
+        labels, depths, parents = [], [], []
+        cell_node = None
+        offset = 0
+        for depth in range(1, len(self.levels) + 1):
+            # Mã của nút ở độ sâu này cho từng ô lá (đường dẫn depth cấp đầu)
+            codes, uniques = pd.factorize(pd.MultiIndex.from_frame(paths.iloc[:, :depth]))
+            node_ids = codes + offset
+            parent = np.full(len(uniques), -1)
+            if cell_node is not None:
+                parent[codes] = cell_node
+            labels.extend(uniques.get_level_values(depth - 1))
+            depths.extend([depth] * len(uniques))
+            parents.extend(parent)
+            if depth == 1:
+                self.cell_root = node_ids
+            cell_node = node_ids
+            offset += len(uniques)
+
+        self.labels = np.array(labels, dtype=object)
+        self.depth = np.array(depths, dtype=np.int8)
+        self.parent = np.array(parents, dtype=np.int64)
+        self.cell_leaf = cell_node if cell_node is not None else np.zeros(0, dtype=np.int64)
+        self.cell_sum = cube["sum"].to_numpy(dtype=float)
+        self.cell_count = cube["count"].to_numpy(dtype=float)
+        self.cell_month = cube["Month"].to_numpy()
+        self.cell_department = cube["phong_ban"].astype(object).to_numpy()
+
+        # Đường dẫn -> id và id -> các con, để đi xuống cây bằng tra cứu
+        self.paths = [None] * len(self.labels)
+        for node in range(len(self.labels)):
+            parent = self.parent[node]
+            self.paths[node] = (self.paths[parent] if parent >= 0 else ()) + (self.labels[node],)
+        self.node_ids = {path: node for node, path in enumerate(self.paths)}
+        order = np.argsort(self.parent, kind="stable")
+        boundaries = np.searchsorted(self.parent[order], np.arange(-1, len(self.labels)))
+        self._children = {parent: order[boundaries[parent + 1]:boundaries[parent + 2]]
+                          for parent in range(-1, len(self.labels) - 1)}
+
+    def __len__(self) -> int:
+        return len(self.labels)
+
+    @property
+    def nbytes(self) -> int:
+        arrays = (self.depth, self.parent, self.cell_leaf, self.cell_sum, self.cell_count, self.cell_month)
+        return sum(array.nbytes for array in arrays) + 200 * len(self.labels) + 8 * len(self.cell_department)
+
+    def _keep(self, months=None, departments=None, commodities=None) -> np.ndarray:
+        keep = np.ones(len(self.cell_sum), dtype=bool)
+        if months is not None:
+            keep &= np.isin(self.cell_month, list(months))
+        if departments is not None:
+            keep &= pd.Series(self.cell_department).isin(list(departments)).to_numpy()
+        if commodities is not None:
+            keep &= np.isin(self.labels[self.cell_root], list(commodities))
+        return keep
+
+    def totals(self, months=None, departments=None, commodities=None) -> tuple:
+        """Sum and row count of every node for a selection (None = no filter)
+
+        Returns:
+            tuple: (sums, counts) arrays indexed by node id
+        """
+        keep = self._keep(months, departments, commodities)
+        sums = np.bincount(self.cell_leaf[keep], weights=self.cell_sum[keep], minlength=len(self.labels))
+        counts = np.bincount(self.cell_leaf[keep], weights=self.cell_count[keep], minlength=len(self.labels))
+        # Cộng dồn từ cấp sâu nhất lên cấp trên, mỗi cấp một lần bincount
+        for depth in range(len(self.levels), 1, -1):
+            nodes = np.flatnonzero(self.depth == depth)
+            sums += np.bincount(self.parent[nodes], weights=sums[nodes], minlength=len(self.labels))
+            counts += np.bincount(self.parent[nodes], weights=counts[nodes], minlength=len(self.labels))
+        return sums, counts
+
+    def short_label(self, node: int) -> str:
+        """Label without the repeated parent prefix ("Consumables - Industrial Gases" -> "Industrial Gases")"""
+        label = str(self.labels[node])
+        parent = self.parent[node]
+        if parent >= 0:
+            prefix = f"{self.labels[parent]} - "
+            if label.startswith(prefix):
+                return label[len(prefix):]
+        return label
+
+    def node(self, path: tuple = ()) -> int:
+        """Id of the node at path (-1 for the root)"""
+        return self.node_ids[tuple(path)] if path else -1
+
+    def children(self, path: tuple = (), totals: tuple = None) -> pd.DataFrame:
+        """Children of the node at path, largest first
+
+        Args:
+            path (tuple): labels from the top level, () for the root
+            totals (tuple, optional): output of totals(); no filter by default
+
+        Returns:
+            pd.DataFrame: label, sum, count, share (of the parent), only non-empty children
+        """
+        sums, counts = totals if totals is not None else self.totals()
+        nodes = self._children.get(self.node(path), np.zeros(0, dtype=np.int64))
+        nodes = nodes[counts[nodes] > 0]
+        parent_sum = sums[nodes].sum()
+        frame = pd.DataFrame({
+            "label": self.labels[nodes],
+            "sum": sums[nodes],
+            "count": counts[nodes].astype(int),
+            "share": sums[nodes] / parent_sum if parent_sum else np.nan,
+        })
+        return frame.sort_values("sum", ascending=False, ignore_index=True)
+
+    def subtree(self, path: tuple = (), totals: tuple = None) -> pd.DataFrame:
+        """Every non-empty node under path (path included), for plotly sunburst/treemap
+
+        Returns:
+            pd.DataFrame: id, parent, label, depth, sum, count
+        """
+        sums, counts = totals if totals is not None else self.totals()
+        root = self.node(path)
+        within = np.ones(len(self.labels), dtype=bool) if root < 0 else np.array(
+            [self.paths[node][:len(path)] == tuple(path) for node in range(len(self.labels))])
+        nodes = np.flatnonzero(within & (counts > 0))
+        ids = [" › ".join(self.paths[node]) for node in nodes]
+        # Nút gốc của nhánh không có cha trong hình (plotly cần parent rỗng)
+        parents = [" › ".join(self.paths[self.parent[node]]) if self.parent[node] >= 0 and node != root else ""
+                   for node in nodes]
+        return pd.DataFrame({
+            "id": ids,
+            "parent": parents,
+            "label": [self.short_label(node) for node in nodes],
+            "depth": self.depth[nodes],
+            "sum": sums[nodes],
+            "count": counts[nodes].astype(int),
+        })
+
+
+def get_tree(version, cube: pd.DataFrame) -> RollupTree:
+    """RollupTree of the tree cube, built once per dataset version"""
+    tree = _trees.get(version)
+    if tree is None:
+        tree = RollupTree(cube)
+        _trees.put(version, tree)
+    return tree
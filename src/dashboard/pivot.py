@@ -0,0 +1,98 @@
+"""Sparse pre-aggregated pivot for heatmaps
+
+The transactions are summed once per dataset into the non-empty cells of
+(index, columns, filter dims), stored as parallel code arrays (COO).
+A filter selection is a boolean lookup on those codes and the dense matrix
+is only materialized for the rows and columns of the selected slice, so a
+heatmap rerun costs O(non-empty cells) instead of a pivot_table over the
+transactions.
+"""
+import numpy as np
+import pandas as pd
+
+PIVOT_DIMS = ["Commodity", "Commodity level 2", "Commodity level 3", "Warehouse", "phong_ban"]
+FILTER_DIMS = ["phong_ban", "Commodity"]
+
+
+class SparsePivot:
+    """Sum of value per non-empty (index, columns, *filters) cell
+
+    Args:
+        df (pd.DataFrame): transactions
+        index (str): row dimension of the matrix
+        columns (str): column dimension of the matrix
+        value (str): summed measure
+        filters (list): dimensions that can be filtered with matrix(**selected)
+    """
+
+    def __init__(self, df: pd.DataFrame, index: str, columns: str, value: str = "Total",
+                 filters: list = FILTER_DIMS) -> None:
+        self.index = index
+        self.columns = columns
+        self.dims = list(dict.fromkeys([index, columns] + [dim for dim in filters if dim in df.columns]))
+
+        # Như pivot_table: dòng thiếu nhãn hàng/cột không vào ma trận
+        cells = (df.dropna(subset=[index, columns])
+                 .groupby(self.dims, observed=True, sort=False)[value].sum()
+                 .reset_index())
+        self.values = cells[value].to_numpy(dtype=float)
+        self.codes = {}
+        self.labels = {}
+        for dim in self.dims:
+            codes, uniques = pd.factorize(cells[dim])
+            self.codes[dim] = codes.astype(np.int32)
+            self.labels[dim] = pd.Index(uniques)
+
+    def __len__(self) -> int:
+        return len(self.values)
+
+    @property
+    def nbytes(self) -> int:
+        return self.values.nbytes + sum(codes.nbytes for codes in self.codes.values()) + \
+            sum(int(labels.memory_usage(deep=True)) for labels in self.labels.values())
+
+    def mask(self, **selected) -> np.ndarray:
+        """Boolean mask of the cells kept by {dim: allowed labels}"""
+        keep = np.ones(len(self.values), dtype=bool)
+        for dim, allowed in selected.items():
+            if dim not in self.codes or allowed is None:
+                continue
+            # Bảng tra theo mã: mã -> được chọn hay không, rồi lấy theo mảng mã của các ô
+            lookup = self.labels[dim].isin(list(allowed))
+            keep &= lookup[self.codes[dim]]
+        return keep
+
+    def matrix(self, all_columns: bool = True, **selected) -> pd.DataFrame:
+        """Dense index x columns sums of the selected slice
+
+        Args:
+            all_columns (bool): keep every column label of the dataset (zeros when
+                filtered out), like pivot_table(...).reindex(columns=all labels)
+            **selected: {dim: allowed labels}, for dims in self.dims
+
+        Returns:
+            pd.DataFrame: rows sorted by label, only rows present in the slice
+        """
+        keep = self.mask(**selected)
+        row_codes = self.codes[self.index][keep]
+        col_codes = self.codes[self.columns][keep]
+        values = self.values[keep]
+
+        row_labels = self.labels[self.index]
+        rows = np.unique(row_codes)
+        rows = rows[row_labels[rows].argsort()]
+        columns = np.arange(len(self.labels[self.columns])) if all_columns else np.unique(col_codes)
+
+        # Vị trí gọn của mã hàng/cột trong ma trận kết quả
+        row_position = np.full(len(row_labels), -1)
+        row_position[rows] = np.arange(len(rows))
+        col_position = np.full(len(self.labels[self.columns]), -1)
+        col_position[columns] = np.arange(len(columns))
+
+        flat = row_position[row_codes] * len(columns) + col_position[col_codes]
+        dense = np.bincount(flat, weights=values, minlength=len(rows) * len(columns))
+        return pd.DataFrame(
+            dense.reshape(len(rows), len(columns)),
+            index=pd.Index(row_labels[rows], name=self.index),
+            columns=pd.Index(self.labels[self.columns][columns], name=self.columns),
+        )
@@ -0,0 +1,124 @@
+"""Server-side paginated table for large selections
+
+Only the visible window of rows is sent to the browser. Filtering, text
+search and sorting run here on row positions, which are cached per
+(dataset version, filters, search, sort), so paging through a selection is a
+slice of a cached position array. describe() statistics are cached per
+(dataset version, filters) as well.
+"""
+import math
+import os
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from src.data.cache import SizedLRUCache
+
+PAGE_SIZES = [50, 100, 500, 1000]
+NO_SORT = "(không sắp xếp)"
+
+# Giới hạn bộ nhớ cho cache vị trí dòng và thống kê (MB)
+TABLE_CACHE_MB = int(os.environ.get("TABLE_CACHE_MAX_MB", "64"))
+
+_orders = SizedLRUCache(TABLE_CACHE_MB * 1024 * 1024, sizeof=lambda positions: positions.nbytes)
+_describes = SizedLRUCache(16 * 1024 * 1024)
+
+
+def _search_mask(df: pd.DataFrame, positions: np.ndarray, search: str) -> np.ndarray:
+    """Rows (among positions) where any text or numeric column contains search, case-insensitive
+
+    Numbers are matched on their text form, so an int64 "Item Number" column
+    is searchable like in the browser-side table.
+    """
+    found = np.zeros(len(positions), dtype=bool)
+    for column in df.columns:
+        values = df[column]
+        if isinstance(values.dtype, pd.CategoricalDtype):
+            # So khớp trên danh mục rồi tra theo mã, không duyệt từng dòng (mã -1 = thiếu -> False)
+            hits = values.cat.categories.astype(str).str.contains(search, case=False, regex=False)
+            codes = values.cat.codes.to_numpy()[positions]
+            found |= np.append(hits, False)[codes]
+        elif values.dtype == object or pd.api.types.is_numeric_dtype(values):
+            subset = values.iloc[positions]
+            # Giá trị thiếu không khớp (tránh "nan" khớp với từ khoá)
+            matches = subset.astype(str).str.contains(search, case=False, regex=False) & subset.notna()
+            found |= matches.to_numpy()
+    return found
+
+
+def row_order(df: pd.DataFrame, key, select=None, search: str = "", sort_by: str = None,
+              ascending: bool = True) -> np.ndarray:
+    """Positions (into df) of the selected, searched and sorted rows
+
+    Args:
+        df (pd.DataFrame): full frame
+        key: hashable (dataset version, filter selection) identifying select's result
+        select (callable, optional): function(df) -> boolean mask, called only on a miss
+        search (str): keep rows where a text column contains this text
+        sort_by (str, optional): column to sort on (stable, missing values last)
+        ascending (bool): sort direction
+
+    Returns:
+        np.ndarray: row positions, cached
+    """
+    search = search.strip()
+    cache_key = (key, search, sort_by, ascending)
+    positions = _orders.get(cache_key)
+    if positions is not None:
+        return positions
+
+    if search or sort_by:
+        positions = row_order(df, key, select)
+    else:
+        mask = np.ones(len(df), dtype=bool) if select is None else np.asarray(select(df), dtype=bool)
+        positions = np.flatnonzero(mask)
+
+    if search:
+        positions = positions[_search_mask(df, positions, search)]
+    if sort_by:
+        values = df[sort_by].iloc[positions].reset_index(drop=True)
+        ranked = values.sort_values(ascending=ascending, kind="stable", na_position="last").index.to_numpy()
+        positions = positions[ranked]
+
+    _orders.put(cache_key, positions)
+    return positions
+
+
+def describe(df: pd.DataFrame, key, select=None) -> pd.DataFrame:
+    """describe().T of the selected rows, computed once per key"""
+    stats = _describes.get(key)
+    if stats is None:
+        stats = df.iloc[row_order(df, key, select)].describe().T
+        _describes.put(key, stats)
+    return stats
+
+
+def paginated_table(df: pd.DataFrame, columns: list, key, select=None, widget_key: str = "table") -> None:
+    """Render sort/search/page controls and the visible window of the selection
+
+    Args:
+        df (pd.DataFrame): full frame (not the selection)
+        columns (list): columns to show
+        key: hashable (dataset version, filter selection), see row_order
+        select (callable, optional): function(df) -> boolean mask of the selection
+        widget_key (str): prefix of the widget keys, unique per page
+    """
+    col_search, col_sort, col_order, col_size = st.columns([3, 2, 1, 1])
+    search = col_search.text_input("Tìm kiếm", key=f"{widget_key}_search")
+    sort_by = col_sort.selectbox("Sắp xếp theo", [NO_SORT] + list(columns), key=f"{widget_key}_sort")
+    ascending = col_order.radio("Thứ tự", ["Tăng", "Giảm"], key=f"{widget_key}_order") == "Tăng"
+    page_size = col_size.selectbox("Số dòng", PAGE_SIZES, index=1, key=f"{widget_key}_size")
+
+    positions = row_order(df, key, select, search, None if sort_by == NO_SORT else sort_by, ascending)
+    pages = max(math.ceil(len(positions) / page_size), 1)
+    page_key = f"{widget_key}_page"
+    # Bộ lọc mới có thể làm trang đang chọn vượt quá số trang
+    if st.session_state.get(page_key, 1) > pages:
+        st.session_state[page_key] = 1
+    page = st.number_input("Trang", min_value=1, max_value=pages, step=1, key=page_key)
+
+    start = (int(page) - 1) * page_size
+    window = df.iloc[positions[start:start + page_size]][list(columns)]
+    st.dataframe(window, use_container_width=True)
+    st.caption(f"Trang {int(page)}/{pages} - dòng {min(start + 1, len(positions)):,} - {start + len(window):,} / {len(positions):,}")
@@ -0,0 +1,100 @@
+import sys
+import threading
+from collections import OrderedDict
+
+import pandas as pd
+
+
+def estimate_size(value) -> int:
+    """Estimate the resident size of a cached value in bytes
+
+    Args:
+        value: DataFrame, Series, bytes/str, object with nbytes or any other object
+
+    Returns:
+        int: size in bytes
+    """
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(index=True, deep=True).sum())
+    if isinstance(value, pd.Series):
+        return int(value.memory_usage(index=True, deep=True))
+    if isinstance(value, (bytes, bytearray, str)):
+        return len(value)
+    if hasattr(value, "nbytes"):
+        # np.ndarray và các cấu trúc tự khai báo kích thước (index, pivot, ...)
+        return int(value.nbytes)
+    return sys.getsizeof(value)
+
+
+class SizedLRUCache:
+    """Thread-safe LRU cache bounded by the total size of its values
+
+    Streamlit serves every session from its own thread of the same process,
+    so one instance is shared by all sessions.
+    """
+
+    def __init__(self, max_bytes: int, sizeof=estimate_size) -> None:
+        self.max_bytes = max_bytes
+        self.sizeof = sizeof
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._sizes = {}
+        self._total = 0
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            if key not in self._entries:
+                self.misses += 1
+                return default
+            self.hits += 1
+            self._entries.move_to_end(key)
+            return self._entries[key]
+
+    def put(self, key, value) -> None:
+        size = self.sizeof(value)
+        with self._lock:
+            if key in self._entries:
+                self._drop(key)
+            if size > self.max_bytes:
+                # Too large to ever fit: do not flush everything else for it
+                return
+            self._entries[key] = value
+            self._sizes[key] = size
+            self._total += size
+            while self._total > self.max_bytes:
+                self._drop(next(iter(self._entries)))
+
+    def invalidate(self, predicate=None) -> int:
+        """Remove entries whose key matches the predicate (all if None)
+
+        Returns:
+            int: number of removed entries
+        """
+        with self._lock:
+            keys = [key for key in self._entries if predicate is None or predicate(key)]
+            for key in keys:
+                self._drop(key)
+            return len(keys)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self._total,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+            }
+
+    def __contains__(self, key) -> bool:
+        with self._lock:
+            return key in self._entries
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _drop(self, key) -> None:
+        del self._entries[key]
+        self._total -= self._sizes.pop(key)
@@ -0,0 +1,163 @@
+"""Streaming export of a selection to XLSX, CSV or Parquet
+
+XLSX is written row by row in constant memory (xlsxwriter constant_memory
+mode when installed, otherwise openpyxl write-only mode), straight from the
+column arrays, with money columns kept as numbers and formatted in the file
+(#,##0 "VNĐ", like format_currency) instead of being converted to strings.
+"""
+import io
+import os
+import tempfile
+
+import pandas as pd
+
+try:
+    import xlsxwriter
+except ImportError:  # không có xlsxwriter thì dùng openpyxl write-only
+    xlsxwriter = None
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+
+FORMATS = {
+    "xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+    "csv": "text/csv",
+    "parquet": "application/vnd.apache.parquet",
+}
+MONEY_COLUMNS = ["Price", "Total", "TotalPrice", "averagePrice", "totalValue", "value"]
+# Chỉ cột số lượng có dấu phân cách hàng nghìn; mã (Item Number, ...) giữ nguyên chữ số
+QUANTITY_COLUMNS = ["Quantity", "quantity", "inStock", "outbound", "balance", "totalItems", "count"]
+VND_FORMAT = '#,##0 "VNĐ"'
+INTEGER_FORMAT = "#,##0"
+CHUNK_ROWS = 10_000
+MAX_XLSX_ROWS = 1_048_575  # giới hạn của Excel, trừ dòng tiêu đề
+
+
+def _column_values(values: pd.Series) -> list:
+    """Python values Excel understands: None for missing, str for categories, datetime for dates"""
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        values = values.astype(object)
+    if pd.api.types.is_datetime64_any_dtype(values):
+        return [None if pd.isna(value) else value.to_pydatetime() for value in values]
+    array = values.to_numpy(dtype=object)
+    array[pd.isna(values).to_numpy()] = None
+    return array.tolist()
+
+
+def _column_formats(df: pd.DataFrame, money_columns) -> dict:
+    formats = {}
+    for position, column in enumerate(df.columns):
+        if column in money_columns:
+            formats[position] = VND_FORMAT
+        elif column in QUANTITY_COLUMNS and pd.api.types.is_integer_dtype(df[column]):
+            formats[position] = INTEGER_FORMAT
+        elif pd.api.types.is_datetime64_any_dtype(df[column]):
+            formats[position] = "yyyy-mm-dd"
+    return formats
+
+
+def _chunks(df: pd.DataFrame):
+    """Rows as tuples, converted one chunk of columns at a time"""
+    for start in range(0, len(df), CHUNK_ROWS):
+        chunk = df.iloc[start:start + CHUNK_ROWS]
+        yield from zip(*(_column_values(chunk[column]) for column in chunk.columns))
+
+
+def _write_xlsxwriter(df: pd.DataFrame, output, sheet_name: str, formats: dict) -> None:
+    workbook = xlsxwriter.Workbook(output, {"constant_memory": True, "nan_inf_to_errors": True})
+    worksheet = workbook.add_worksheet(sheet_name)
+    header = workbook.add_format({"bold": True})
+    cell_formats = {position: workbook.add_format({"num_format": number_format})
+                    for position, number_format in formats.items()}
+
+    # constant_memory: phải ghi theo thứ tự dòng, định dạng cột đặt trước khi ghi dữ liệu
+    for position, cell_format in cell_formats.items():
+        worksheet.set_column(position, position, 16, cell_format)
+    worksheet.write_row(0, 0, [str(column) for column in df.columns], header)
+    worksheet.freeze_panes(1, 0)
+    for row, values in enumerate(_chunks(df), start=1):
+        worksheet.write_row(row, 0, values)
+    workbook.close()
+
+
+def _write_openpyxl(df: pd.DataFrame, output, sheet_name: str, formats: dict) -> None:
+    from openpyxl import Workbook
+    from openpyxl.cell import WriteOnlyCell
+    from openpyxl.styles import Font
+
+    workbook = Workbook(write_only=True)
+    worksheet = workbook.create_sheet(sheet_name)
+    worksheet.freeze_panes = "A2"
+
+    header = []
+    for column in df.columns:
+        cell = WriteOnlyCell(worksheet, value=str(column))
+        cell.font = Font(bold=True)
+        header.append(cell)
+    worksheet.append(header)
+
+    for values in _chunks(df):
+        if formats:
+            values = list(values)
+            for position, number_format in formats.items():
+                cell = WriteOnlyCell(worksheet, value=values[position])
+                cell.number_format = number_format
+                values[position] = cell
+        worksheet.append(values)
+    workbook.save(output)
+
+
+def to_xlsx(df: pd.DataFrame, money_columns=MONEY_COLUMNS, sheet_name: str = "Data") -> bytes:
+    """Write df to an XLSX file in constant memory
+
+    Args:
+        df (pd.DataFrame): rows to export (at most MAX_XLSX_ROWS)
+        money_columns (list): columns formatted as VND amounts
+        sheet_name (str): worksheet name
+
+    Returns:
+        bytes: file content
+    """
+    if len(df) > MAX_XLSX_ROWS:
+        raise ValueError(f"{len(df):,} rows exceed the Excel limit of {MAX_XLSX_ROWS:,}; export CSV or Parquet")
+    formats = _column_formats(df, set(money_columns))
+
+    # Ghi ra file tạm trên đĩa để không giữ hai bản của file trong RAM khi đang nén
+    fd, path = tempfile.mkstemp(suffix=".xlsx")
+    os.close(fd)
+    try:
+        if xlsxwriter is not None:
+            _write_xlsxwriter(df, path, sheet_name, formats)
+        else:
+            _write_openpyxl(df, path, sheet_name, formats)
+        with open(path, "rb") as f:
+            return f.read()
+    finally:
+        os.remove(path)
+
+
+def to_csv(df: pd.DataFrame) -> bytes:
+    """CSV with a BOM so Excel opens Vietnamese text correctly"""
+    return df.to_csv(index=False).encode("utf-8-sig")
+
+
+def to_parquet(df: pd.DataFrame) -> bytes:
+    if pa is None:
+        raise ImportError("Parquet export needs pyarrow")
+    buffer = io.BytesIO()
+    pq.write_table(pa.Table.from_pandas(df, preserve_index=False), buffer, compression="zstd")
+    return buffer.getvalue()
+
+
+def export(df: pd.DataFrame, fmt: str, money_columns=MONEY_COLUMNS) -> bytes:
+    """Serialize df in one of FORMATS"""
+    if fmt == "xlsx":
+        return to_xlsx(df, money_columns)
+    if fmt == "csv":
+        return to_csv(df)
+    if fmt == "parquet":
+        return to_parquet(df)
+    raise ValueError(f"Unsupported format {fmt!r}, expected one of {list(FORMATS)}")
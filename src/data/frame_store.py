@@ -0,0 +1,76 @@
+"""Process-wide, content-addressed store for parsed frames
+
+Streamlit sessions share one process. Parsing the same upload in twenty
+sessions would hold twenty copies of it; instead each parsed frame is kept
+once under the hash of its source bytes and sessions keep a FrameHandle.
+Frames are shared read-only: never modify handle.df in place.
+
+The store only holds weak references, so a frame is released as soon as
+no session keeps a handle to it.
+"""
+import hashlib
+import threading
+import weakref
+
+import pandas as pd
+
+from src.data.cache import estimate_size
+
+_frames = weakref.WeakValueDictionary()
+_lock = threading.Lock()
+
+
+class FrameHandle:
+    """Reference to a shared frame, the only thing kept in st.session_state"""
+
+    __slots__ = ("digest", "df")
+
+    def __init__(self, digest: str, df: pd.DataFrame) -> None:
+        self.digest = digest
+        self.df = df
+
+    def __repr__(self) -> str:
+        return f"FrameHandle({self.digest[:12]}, {self.df.shape})"
+
+
+EMPTY = FrameHandle("empty", pd.DataFrame())
+
+
+def digest_bytes(data: bytes, *salt: str) -> str:
+    """Content key of raw bytes; salt separates frames parsed differently"""
+    hasher = hashlib.sha256()
+    for part in salt:
+        hasher.update(part.encode("utf-8") + b"\0")
+    hasher.update(data)
+    return hasher.hexdigest()
+
+
+def digest_file(path: str, *salt: str, chunk_size: int = 1 << 20) -> str:
+    """Content key of a file, read in chunks"""
+    hasher = hashlib.sha256()
+    for part in salt:
+        hasher.update(part.encode("utf-8") + b"\0")
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            hasher.update(chunk)
+    return hasher.hexdigest()
+
+
+def get(digest: str):
+    """Handle to an already parsed frame, or None"""
+    with _lock:
+        df = _frames.get(digest)
+    return FrameHandle(digest, df) if df is not None else None
+
+
+def put(digest: str, df: pd.DataFrame) -> FrameHandle:
+    """Share df under digest; if another session got there first, reuse its frame"""
+    with _lock:
+        df = _frames.setdefault(digest, df)
+    return FrameHandle(digest, df)
+
+
+def stats() -> dict:
+    with _lock:
+        frames = list(_frames.values())
+    return {"frames": len(frames), "bytes": sum(estimate_size(df) for df in frames)}
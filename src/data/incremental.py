@@ -0,0 +1,249 @@
+"""Append-only datasets whose aggregates are folded forward, not recomputed
+
+A dataset is one CSV file or a directory of CSV partitions. refresh() reads
+only what was added since the last call: the bytes after the stored offset
+of each known file, plus any new partition file. The new rows are appended
+to the frame, and each registered aggregate is updated with
+merge(aggregate, build(new_rows)). If a file shrinks or its content before
+the offset changes, the dataset is reloaded from scratch.
+
+The first read of a single file goes through load_frame (shared cache and
+Feather sidecar); only the appended bytes are parsed with read_csv.
+
+verify() recomputes every aggregate from the full frame and compares it
+with the folded one.
+
+Scope: the Expense page (test_file.csv) is the only append-only source. The
+Test page frames come from uploads shared by content hash (frame_store), and
+the Inventory page reads Excel exports that are replaced rather than
+appended; their aggregates (per-item balances included) are cached per
+content/file version instead of being folded forward.
+"""
+import glob
+import hashlib
+import io
+import os
+import threading
+
+import pandas as pd
+from pandas.api.types import CategoricalDtype, union_categoricals
+
+from src.data.cache import SizedLRUCache
+from src.data.loader import load_frame
+from src.data.schema import apply_schema
+
+FINGERPRINT_BYTES = 4096
+# Số dataset tối đa giữ trong tiến trình (mỗi dataset giữ toàn bộ frame của nó)
+MAX_DATASETS = int(os.environ.get("INCREMENTAL_MAX_DATASETS", "8"))
+
+
+class _FileState:
+    __slots__ = ("offset", "fingerprint", "columns", "text_columns")
+
+    def __init__(self) -> None:
+        self.offset = 0
+        self.fingerprint = b""
+        self.columns = None
+        self.text_columns = {}
+
+
+def _fingerprint(f, offset: int) -> bytes:
+    # Băm đoạn cuối phần đã đọc: phát hiện file bị ghi đè mà không phải đọc lại toàn bộ
+    start = max(0, offset - FINGERPRINT_BYTES)
+    f.seek(start)
+    return hashlib.sha1(f.read(offset - start)).digest()
+
+
+def _append(old: pd.DataFrame, new: pd.DataFrame) -> pd.DataFrame:
+    """Concatenate rows, keeping categorical columns categorical"""
+    if old.empty:
+        return new.reset_index(drop=True)
+    if new.empty:
+        return old
+    columns = {}
+    for column in old.columns.union(new.columns, sort=False):
+        if column not in new.columns or column not in old.columns:
+            columns[column] = pd.concat([old.get(column), new.get(column)], ignore_index=True)
+        elif isinstance(old[column].dtype, CategoricalDtype):
+            columns[column] = pd.Series(union_categoricals(
+                [old[column], new[column].astype(str).where(new[column].notna()).astype("category")],
+                ignore_order=True,
+            ))
+        else:
+            columns[column] = pd.concat([old[column], new[column]], ignore_index=True)
+    return pd.DataFrame(columns)
+
+
+class IncrementalDataset:
+    """Rows of one CSV file or of a directory of CSV partitions, read incrementally"""
+
+    def __init__(self, path: str, schema: dict = None) -> None:
+        self.path = path
+        self.schema = schema
+        self.frame = pd.DataFrame()
+        self._files = {}
+        self._aggregates = {}
+        self._lock = threading.RLock()
+
+    def register(self, name: str, build, merge, keys: list) -> None:
+        """Add an aggregate: build(rows) -> frame, merge(old, delta) -> frame
+
+        keys are the grouping columns, used by verify() to align rows.
+        Registering the same name again keeps the existing aggregate.
+        """
+        with self._lock:
+            if name in self._aggregates:
+                return
+            value = build(self.frame) if not self.frame.empty else None
+            self._aggregates[name] = {"build": build, "merge": merge, "keys": keys, "value": value}
+
+    def aggregate(self, name: str) -> pd.DataFrame:
+        return self._aggregates[name]["value"]
+
+    @property
+    def version(self) -> tuple:
+        """Changes whenever rows are added; use it in cache keys"""
+        return tuple(sorted((path, state.offset) for path, state in self._files.items()))
+
+    def _sources(self) -> list:
+        if os.path.isdir(self.path):
+            return sorted(glob.glob(os.path.join(self.path, "*.csv")))
+        return [self.path]
+
+    def _load_whole_file(self, path: str, state: _FileState, size: int):
+        """First read of a single file through load_frame, None if it cannot be used"""
+        with open(path, "rb") as f:
+            f.seek(size - 1)
+            # Dòng cuối đang ghi dở: để read_csv theo offset xử lý
+            if f.read(1) != b"\n":
+                return None
+        rows = load_frame(path, schema=self.schema)
+        if os.path.getsize(path) != size:
+            return None
+        state.columns = list(rows.columns)
+        # Cột chữ trong file gốc: object, hoặc categorical có nhãn là chuỗi
+        state.text_columns = {
+            column: str for column in rows.columns
+            if rows[column].dtype == object or (
+                isinstance(rows[column].dtype, CategoricalDtype) and rows[column].cat.categories.dtype == object)
+        }
+        state.offset = size
+        with open(path, "rb") as f:
+            state.fingerprint = _fingerprint(f, state.offset)
+        return rows
+
+    def _read_new_rows(self, path: str, state: _FileState):
+        """Rows after state.offset, or None if the file was rewritten"""
+        size = os.path.getsize(path)
+        if size == state.offset:
+            return pd.DataFrame()
+        if state.offset == 0 and not os.path.isdir(self.path):
+            rows = self._load_whole_file(path, state, size)
+            if rows is not None:
+                return rows
+        with open(path, "rb") as f:
+            if size < state.offset or (state.offset and _fingerprint(f, state.offset) != state.fingerprint):
+                return None
+            f.seek(state.offset)
+            data = f.read(size - state.offset)
+
+        # Chỉ lấy các dòng đã ghi xong (kết thúc bằng xuống dòng)
+        end = data.rfind(b"\n") + 1
+        if end == 0:
+            return pd.DataFrame()
+        data = data[:end]
+
+        if state.columns is None:
+            rows = pd.read_csv(io.BytesIO(data), encoding="utf-8-sig")
+            state.columns = list(rows.columns)
+            state.text_columns = {col: str for col in rows.columns[rows.dtypes == object]}
+        else:
+            rows = pd.read_csv(io.BytesIO(data), header=None, names=state.columns, dtype=state.text_columns)
+
+        state.offset += end
+        with open(path, "rb") as f:
+            state.fingerprint = _fingerprint(f, state.offset)
+        return apply_schema(rows, self.schema) if self.schema is not None else rows
+
+    def refresh(self) -> pd.DataFrame:
+        """Fold rows added since the last refresh into the frame and the aggregates
+
+        Returns:
+            pd.DataFrame: the new rows (empty if nothing changed)
+        """
+        with self._lock:
+            parts = []
+            for path in self._sources():
+                state = self._files.setdefault(path, _FileState())
+                rows = self._read_new_rows(path, state)
+                if rows is None:
+                    return self.reload()
+                if not rows.empty:
+                    parts.append(rows)
+            if not parts:
+                return pd.DataFrame()
+
+            new_rows = parts[0]
+            for part in parts[1:]:
+                new_rows = _append(new_rows, part)
+            self.frame = _append(self.frame, new_rows)
+
+            for entry in self._aggregates.values():
+                delta = entry["build"](new_rows)
+                entry["value"] = delta if entry["value"] is None else entry["merge"](entry["value"], delta)
+            return new_rows
+
+    def reload(self) -> pd.DataFrame:
+        """Forget everything and read all files again"""
+        with self._lock:
+            self.frame = pd.DataFrame()
+            self._files = {}
+            for entry in self._aggregates.values():
+                entry["value"] = None
+            return self.refresh()
+
+    def verify(self) -> dict:
+        """Compare each folded aggregate with a full recompute
+
+        Returns:
+            dict: aggregate name -> None if consistent, else the difference message
+        """
+        with self._lock:
+            results = {}
+            for name, entry in self._aggregates.items():
+                keys = entry["keys"]
+                folded = entry["value"]
+                full = entry["build"](self.frame)
+                try:
+                    pd.testing.assert_frame_equal(
+                        _aligned(folded, keys), _aligned(full, keys),
+                        check_dtype=False, check_categorical=False, check_index_type=False,
+                    )
+                    results[name] = None
+                except AssertionError as e:
+                    results[name] = str(e)
+            return results
+
+
+def _aligned(df: pd.DataFrame, keys: list) -> pd.DataFrame:
+    df = df.copy()
+    for key in keys:
+        if isinstance(df[key].dtype, CategoricalDtype):
+            df[key] = df[key].astype(object)
+    return df.sort_values(keys, na_position="last").reset_index(drop=True)
+
+
+# Giới hạn theo số dataset (mỗi dataset tính là 1), dataset ít dùng nhất bị bỏ trước
+_datasets = SizedLRUCache(MAX_DATASETS, sizeof=lambda dataset: 1)
+_datasets_lock = threading.Lock()
+
+
+def open_dataset(path: str, schema: dict = None) -> IncrementalDataset:
+    """Process-wide dataset for path, shared by every Streamlit session"""
+    key = (os.path.abspath(path), repr(schema))
+    with _datasets_lock:
+        dataset = _datasets.get(key)
+        if dataset is None:
+            dataset = IncrementalDataset(path, schema)
+            _datasets.put(key, dataset)
+        return dataset
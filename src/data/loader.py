@@ -0,0 +1,108 @@
+import os
+
+import pandas as pd
+
+from src.data import sidecar
+from src.data.cache import SizedLRUCache
+from src.data.schema import apply_schema
+
+# Giới hạn bộ nhớ cho cache dữ liệu dùng chung (MB)
+MAX_CACHE_MB = int(os.environ.get("DATA_CACHE_MAX_MB", "512"))
+
+_cache = SizedLRUCache(MAX_CACHE_MB * 1024 * 1024)
+
+
+def file_signature(path: str) -> tuple:
+    """Identify the current version of a file without reading it
+
+    Args:
+        path (str): path to the file
+
+    Returns:
+        tuple: (absolute path, mtime in ns, size in bytes)
+    """
+    stat = os.stat(path)
+    return os.path.abspath(path), stat.st_mtime_ns, stat.st_size
+
+
+def _freeze(value):
+    if isinstance(value, dict):
+        return tuple(sorted((key, _freeze(item)) for key, item in value.items()))
+    if isinstance(value, (list, tuple, set)):
+        return tuple(_freeze(item) for item in value)
+    return value
+
+
+def load_frame(path: str, columns: list = None, schema: dict = None, **read_kwargs) -> pd.DataFrame:
+    """Load a CSV/Excel file, served from the shared cache while unchanged
+
+    The cache key is (path, mtime, size, columns, schema, read options), so
+    editing the file reloads it on the next call and a rerun with the same
+    file costs no read. Without read options the file goes through its columnar sidecar
+    (see src.data.sidecar). The returned frame is shared between sessions: do
+    not modify it in place, copy it first.
+
+    Args:
+        path (str): path to a .csv, .xlsx or .xls file
+        columns (list, optional): only load these columns
+        schema (dict, optional): compact dtypes, see src.data.schema
+        **read_kwargs: options passed to pd.read_csv / pd.read_excel
+
+    Returns:
+        pd.DataFrame: file content
+    """
+    signature = file_signature(path)
+    key = signature + (_freeze(columns), _freeze(schema), _freeze(read_kwargs))
+
+    df = _cache.get(key)
+    if df is None:
+        if read_kwargs:
+            df = sidecar.read_source(path, usecols=columns, **read_kwargs)
+        else:
+            df = sidecar.load(path, columns)
+        if schema is not None:
+            df = apply_schema(df, schema)
+        # Phiên bản cũ của cùng file không còn dùng được nữa
+        _cache.invalidate(lambda cached: cached[0] == signature[0] and cached[1:3] != signature[1:3])
+        _cache.put(key, df)
+    return df
+
+
+def load_derived(path: str, name: str, build, columns: list = None, schema: dict = None):
+    """Cache an artifact computed from a file (cube, index, ...) per file version
+
+    Args:
+        path (str): source file, loaded with load_frame
+        name (str): artifact name, unique per builder
+        build (callable): function(df) -> artifact
+        columns (list, optional): only load these columns for the builder
+        schema (dict, optional): compact dtypes of the frame given to the builder
+
+    Returns:
+        the cached or freshly built artifact
+    """
+    signature = file_signature(path)
+    key = signature + (_freeze(columns), _freeze(schema), ("derived", name))
+
+    artifact = _cache.get(key)
+    if artifact is None:
+        artifact = build(load_frame(path, columns, schema))
+        _cache.invalidate(lambda cached: cached[0] == signature[0] and cached[1:3] != signature[1:3])
+        _cache.put(key, artifact)
+    return artifact
+
+
+def invalidate(path: str = None) -> int:
+    """Drop cached frames of one file, or of every file when path is None
+
+    Returns:
+        int: number of removed entries
+    """
+    if path is None:
+        return _cache.invalidate()
+    target = os.path.abspath(path)
+    return _cache.invalidate(lambda key: key[0] == target)
+
+
+def cache_stats() -> dict:
+    return _cache.stats()
@@ -0,0 +1,118 @@
+"""Compact dtypes for the transaction frames of the Expense and Inventory pages
+
+Repeated strings (department codes, commodity paths, UOM, receivers, item
+names) become categoricals, "Tháng N" becomes a small int and numeric
+columns are downcast to the narrowest type that holds them exactly.
+
+Print the memory saved per column:
+
+    python -m src.data.schema test_file.csv inventory_balance_list.xlsx
+"""
+import sys
+
+import numpy as np
+import pandas as pd
+
+CATEGORY = "category"
+MONTH = "month"
+NUMERIC = "numeric"
+
+# Một schema dùng chung: cột nào không có trong file thì bỏ qua
+TRANSACTION_SCHEMA = {
+    "Created Date": NUMERIC,
+    "Month": MONTH,
+    "Type": CATEGORY,
+    "phong_ban": CATEGORY,
+    "Warehouse": CATEGORY,
+    "Commodity": CATEGORY,
+    "Commodity level 2": CATEGORY,
+    "Commodity level 3": CATEGORY,
+    "Item Number": CATEGORY,
+    "Item": CATEGORY,
+    "Quantity": NUMERIC,
+    "UOM": CATEGORY,
+    "Price": NUMERIC,
+    "Total": NUMERIC,
+    "Receiver": CATEGORY,
+}
+
+
+def to_month(series: pd.Series) -> pd.Series:
+    """Convert "Tháng N" (or N) to an int8 month number, NaN-free columns only"""
+    if not pd.api.types.is_numeric_dtype(series):
+        series = pd.to_numeric(series.astype(str).str.extract(r"(\d+)", expand=False), errors="coerce")
+    if series.isna().any() or not series.between(1, 12).all():
+        return series
+    return series.astype(np.int8)
+
+
+def to_narrowest(series: pd.Series) -> pd.Series:
+    """Downcast a numeric column without losing precision
+
+    Floats holding only whole numbers become integers (VND amounts); other
+    floats stay float64 so that sums keep their precision.
+    """
+    if not pd.api.types.is_numeric_dtype(series) or pd.api.types.is_bool_dtype(series):
+        return series
+    if pd.api.types.is_float_dtype(series):
+        if series.isna().any() or not np.array_equal(series, np.round(series)):
+            return series
+    return pd.to_numeric(series, downcast="integer")
+
+
+def to_category(series: pd.Series) -> pd.Series:
+    """Categorical when values repeat; mostly-unique columns are left as they are"""
+    if series.nunique() > len(series) // 2:
+        return series
+    return series.astype("category")
+
+
+CONVERTERS = {
+    CATEGORY: to_category,
+    MONTH: to_month,
+    NUMERIC: to_narrowest,
+}
+
+
+def apply_schema(df: pd.DataFrame, schema: dict = TRANSACTION_SCHEMA) -> pd.DataFrame:
+    """Return a compact copy of df following schema (column -> kind)
+
+    Args:
+        df (pd.DataFrame): frame as read from the file
+        schema (dict): column name -> CATEGORY / MONTH / NUMERIC
+
+    Returns:
+        pd.DataFrame: frame with compact dtypes
+    """
+    converted = {
+        column: CONVERTERS[kind](df[column])
+        for column, kind in schema.items()
+        if column in df.columns
+    }
+    return df.assign(**converted)
+
+
+def memory_report(before: pd.DataFrame, after: pd.DataFrame) -> pd.DataFrame:
+    """Bytes per column before and after apply_schema, with a total row"""
+    report = pd.DataFrame({
+        "dtype_before": before.dtypes.astype(str),
+        "dtype_after": after.dtypes.astype(str),
+        "bytes_before": before.memory_usage(index=False, deep=True),
+        "bytes_after": after.memory_usage(index=False, deep=True),
+    })
+    report.loc["TOTAL"] = ["", "", report["bytes_before"].sum(), report["bytes_after"].sum()]
+    report["ratio"] = report["bytes_before"] / report["bytes_after"]
+    return report
+
+
+def main(paths: list) -> None:
+    from src.data.sidecar import read_source
+
+    for path in paths:
+        raw = read_source(path)
+        print(f"\n{path}")
+        print(memory_report(raw, apply_schema(raw)).to_string(float_format=lambda x: f"{x:,.1f}"))
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:] or ["test_file.csv", "inventory_balance_list.xlsx"])
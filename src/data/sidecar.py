@@ -0,0 +1,172 @@
+"""Columnar sidecars for the Excel/CSV sources
+
+The first load of a source converts it to an uncompressed Feather (Arrow
+IPC) file under SIDECAR_DIR. Later loads memory-map that file and read only
+the requested columns, as long as the source mtime/size still match the
+signature stored in the sidecar metadata.
+
+Build every sidecar and print cold vs. warm load times:
+
+    python -m src.data.sidecar inventory_balance_list.xlsx test_file.csv
+"""
+import hashlib
+import os
+import sys
+import time
+
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.feather as feather
+    import pyarrow.ipc as ipc
+except ImportError:  # pyarrow không có thì đọc thẳng từ file gốc
+    pa = None
+
+SIDECAR_DIR = os.environ.get("SIDECAR_DIR", os.path.join(".cache", "sidecars"))
+SIGNATURE_KEY = b"source_signature"
+
+READERS = {
+    ".csv": pd.read_csv,
+    ".xlsx": pd.read_excel,
+    ".xls": pd.read_excel,
+}
+
+# path -> {"cold": seconds, "warm": seconds, "rows": int, "columns": int}
+LOAD_TIMES = {}
+
+
+def read_source(path: str, **read_kwargs) -> pd.DataFrame:
+    extension = os.path.splitext(path)[1].lower()
+    if extension not in READERS:
+        raise ValueError(f"Unsupported file type: {extension}")
+    return READERS[extension](path, **read_kwargs)
+
+
+def sidecar_path(path: str) -> str:
+    source = os.path.abspath(path)
+    digest = hashlib.sha1(source.encode("utf-8")).hexdigest()[:10]
+    stem = os.path.splitext(os.path.basename(source))[0]
+    return os.path.join(SIDECAR_DIR, f"{stem}-{digest}.feather")
+
+
+def _signature(path: str) -> bytes:
+    stat = os.stat(path)
+    return f"{stat.st_mtime_ns}:{stat.st_size}".encode("ascii")
+
+
+def _to_table(df: pd.DataFrame):
+    """Convert to Arrow, turning mixed-type object columns (common in Excel) into strings"""
+    try:
+        return pa.Table.from_pandas(df, preserve_index=False)
+    except (pa.ArrowTypeError, pa.ArrowInvalid):
+        df = df.copy()
+        for column in df.columns[df.dtypes == object]:
+            try:
+                pa.array(df[column], from_pandas=True)
+            except (pa.ArrowTypeError, pa.ArrowInvalid):
+                df[column] = df[column].astype(str).where(df[column].notna())
+        return pa.Table.from_pandas(df, preserve_index=False)
+
+
+def _is_fresh(path: str, sidecar: str) -> bool:
+    if not os.path.exists(sidecar):
+        return False
+    try:
+        with pa.memory_map(sidecar) as source:
+            metadata = ipc.open_file(source).schema.metadata or {}
+    except (OSError, pa.ArrowInvalid):
+        return False
+    return metadata.get(SIGNATURE_KEY) == _signature(path)
+
+
+def write_sidecar(path: str, df: pd.DataFrame) -> str:
+    """Write df as the sidecar of path (atomic replace)
+
+    Returns:
+        str: sidecar path
+    """
+    sidecar = sidecar_path(path)
+    os.makedirs(os.path.dirname(sidecar), exist_ok=True)
+
+    table = _to_table(df)
+    metadata = dict(table.schema.metadata or {})
+    metadata[SIGNATURE_KEY] = _signature(path)
+    table = table.replace_schema_metadata(metadata)
+
+    # Không nén để có thể memory-map khi đọc lại
+    temporary = f"{sidecar}.{os.getpid()}.tmp"
+    feather.write_feather(table, temporary, compression="uncompressed")
+    os.replace(temporary, sidecar)
+    return sidecar
+
+
+def load(path: str, columns: list = None) -> pd.DataFrame:
+    """Load a source through its sidecar, building it if missing or stale
+
+    Args:
+        path (str): .csv / .xlsx / .xls source
+        columns (list, optional): only read these columns
+
+    Returns:
+        pd.DataFrame: file content
+    """
+    if pa is None:
+        return read_source(path, usecols=columns)
+
+    sidecar = sidecar_path(path)
+    start = time.perf_counter()
+    if _is_fresh(path, sidecar):
+        df = feather.read_table(sidecar, columns=columns, memory_map=True).to_pandas()
+        _record(path, "warm", time.perf_counter() - start, df)
+        return df
+
+    # Lần nạp lạnh cũng đọc lại từ sidecar: cột hỗn hợp đã thành chuỗi, NaN thành None,
+    # nên phiên đầu tiên và các phiên sau nhận cùng một DataFrame
+    write_sidecar(path, read_source(path))
+    df = feather.read_table(sidecar, columns=columns, memory_map=True).to_pandas()
+    _record(path, "cold", time.perf_counter() - start, df)
+    return df
+
+
+def _record(path: str, kind: str, seconds: float, df: pd.DataFrame) -> None:
+    entry = LOAD_TIMES.setdefault(os.path.abspath(path), {})
+    entry[kind] = seconds
+    entry["rows"], entry["columns"] = df.shape
+
+
+def load_report() -> pd.DataFrame:
+    """Cold (source parse + sidecar write) vs. warm (sidecar) load times per file"""
+    rows = []
+    for path, entry in LOAD_TIMES.items():
+        cold, warm = entry.get("cold"), entry.get("warm")
+        rows.append({
+            "file": os.path.basename(path),
+            "rows": entry.get("rows"),
+            "columns": entry.get("columns"),
+            "cold_ms": cold * 1000 if cold is not None else None,
+            "warm_ms": warm * 1000 if warm is not None else None,
+            "speedup": cold / warm if cold and warm else None,
+        })
+    return pd.DataFrame(rows, columns=["file", "rows", "columns", "cold_ms", "warm_ms", "speedup"])
+
+
+def main(paths: list) -> None:
+    if pa is None:
+        sys.exit("pyarrow is required to build sidecars")
+    for path in paths:
+        # Bắt buộc đo lần nạp lạnh: xoá sidecar cũ trước
+        if os.path.exists(sidecar_path(path)):
+            os.remove(sidecar_path(path))
+        load(path)
+        load(path)
+    print(load_report().to_string(index=False, float_format=lambda x: f"{x:,.1f}"))
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:] or [
+        "inventory_balance_list.xlsx",
+        "inventory_transaction_list_Power BI.xlsx",
+        "test_file.csv",
+        "equipment_list.csv",
+    ])
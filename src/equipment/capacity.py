@@ -0,0 +1,90 @@
+import numpy as np
+import pandas as pd
+import plotly.graph_objects as go
+
+# Các nhóm ma_id
+MA_GROUPS = {
+    "HCMCHEM": {"ICP-MS", "IC-Anion"},
+    "HCMPEST": {"INS003", "LC-MSMS-114", "LC-MSMS-105", "GC-MSMS-141", "GC-MSMS-109", "GC-MSMS-108",
+                "LC-MSMS-50", "GC-MSMS-79", "GC-MSMS-47", "GC-MSMS-131", "HPLC-FLD106"},
+    "HCMMYCO": {"HPLC-FLD99", "HPLC-FLD-IR101", "HPLC-UV103", "GC-FID60", "HPLC-UV98", "HPLC-UV100", "GC-FID9", "HPLC-139"},
+    "RD": {"MOAH-MOSH-111", "LC-MSMS-119", "IC-5", "GC-MSMS144"}
+}
+
+CALENDAR_TIME = "Calendar time"
+COLUMNS_TO_PLOT = ['Non-schedule time (min)', 'Non Production time (min)', 'Set up & cleaning time',
+                   'DowntimeBreakdown', 'Quality losses (min)', 'Net Prod Time (min)']
+
+# Chú thích màu cho từng cột
+COLOR_MAP = {
+    'Non-schedule time (min)': 'black',
+    'Set up & cleaning time': 'gray',
+    'Quality losses (min)': 'lightblue',
+    'Non Production time (min)': 'orange',
+    'DowntimeBreakdown': 'red',
+    'Net Prod Time (min)': 'limegreen'
+}
+
+# Các cột không hiển thị số trên biểu đồ
+UNLABELED_COLUMNS = {'Non-schedule time (min)', 'Set up & cleaning time', 'DowntimeBreakdown'}
+
+
+def capacity_percentages(df: pd.DataFrame, ids) -> pd.DataFrame:
+    """Share of calendar time spent in each time bucket, per device
+
+    Args:
+        df (pd.DataFrame): equipment_list.csv content
+        ids: device IDs to keep (file order is preserved)
+
+    Returns:
+        pd.DataFrame: one row per ID (index), one column per COLUMNS_TO_PLOT, in %
+    """
+    devices = df[df['ID'].isin(ids)].set_index('ID')
+    minutes = devices[COLUMNS_TO_PLOT].apply(pd.to_numeric, errors='coerce')
+    calendar = pd.to_numeric(devices[CALENDAR_TIME], errors='coerce')
+    return minutes.div(calendar, axis=0) * 100
+
+
+def stacked_bar_figure(percentages: pd.DataFrame, title: str = 'Comparison of Time Metrics by Equipment') -> go.Figure:
+    """Stacked bars from precomputed cumulative offsets, one trace per metric
+
+    Every label is passed as one array per trace, so the cost does not
+    depend on the number of devices.
+
+    Args:
+        percentages (pd.DataFrame): output of capacity_percentages
+
+    Returns:
+        go.Figure: plotly figure
+    """
+    values = percentages[COLUMNS_TO_PLOT].to_numpy(dtype=float)
+    # Vị trí chân của mỗi đoạn = tổng cộng dồn các đoạn bên dưới (NaN tính là 0)
+    bases = np.cumsum(np.nan_to_num(values), axis=1) - np.nan_to_num(values)
+    devices = percentages.index.astype(str)
+
+    fig = go.Figure()
+    for position, column in enumerate(COLUMNS_TO_PLOT):
+        labeled = column not in UNLABELED_COLUMNS
+        fig.add_trace(go.Bar(
+            x=devices,
+            y=values[:, position],
+            base=bases[:, position],
+            name=column,
+            marker_color=COLOR_MAP[column],
+            opacity=0.85,
+            texttemplate='%{y:.1f}%' if labeled else None,
+            textposition='inside' if labeled else 'none',
+            insidetextanchor='middle',
+            textfont=dict(color='white', size=11),
+        ))
+
+    fig.update_layout(
+        title=title,
+        barmode='overlay',
+        xaxis_title='Equipment ID',
+        yaxis_title='Percentage (%)',
+        xaxis_tickangle=-90,
+        legend_title='Metrics',
+        height=600,
+    )
+    return fig
@@ -0,0 +1,253 @@
+"""Time-partitioned OEE store for the equipment time buckets
+
+equipment_list.csv is one snapshot (one period) of minutes per device. The
+store stacks any number of such snapshots into a (period x device x bucket)
+array of minutes, precomputes the availability / performance / quality / OEE
+ratios of every cell and keeps cumulative sums along the period axis, so a
+rolling window over years of data is two array lookups per cell instead of a
+reload and a regroup of the raw files.
+
+Loss model (minutes, same columns as equipment_list.csv):
+    loading time   = Calendar time - Non-schedule time
+    operating time = loading time - Non Production - Set up & cleaning - Downtime
+    availability   = operating time / loading time
+    performance    = (Net Prod Time + Quality losses) / operating time
+    quality        = Net Prod Time / (Net Prod Time + Quality losses)
+    OEE            = availability x performance x quality = Net Prod Time / loading time
+"""
+import glob
+import os
+import re
+
+import numpy as np
+import pandas as pd
+
+from src.data.cache import SizedLRUCache
+from src.data.loader import file_signature, load_frame
+
+PERIOD_COLUMN = "Period"
+ID_COLUMN = "ID"
+MINUTE_COLUMNS = ['Calendar time', 'Non-schedule time (min)', 'Non Production time (min)',
+                  'Set up & cleaning time', 'DowntimeBreakdown', 'Quality losses (min)', 'Net Prod Time (min)']
+RATIOS = ['Availability', 'Performance', 'Quality', 'OEE']
+
+# Kỳ của một snapshot lấy từ tên file: equipment_list_2024-01.csv (tháng) hoặc ..._2024-01-15.csv (ngày)
+_PERIOD_IN_NAME = re.compile(r"(\d{4}-\d{2}(?:-\d{2})?)$")
+
+
+def _ratio(numerator: np.ndarray, denominator: np.ndarray) -> np.ndarray:
+    out = np.full(np.broadcast(numerator, denominator).shape, np.nan)
+    np.divide(numerator, denominator, out=out, where=denominator > 0)
+    return out
+
+
+def oee_ratios(minutes: np.ndarray) -> np.ndarray:
+    """Availability, performance, quality and OEE from summed minutes
+
+    Ratios are always computed from minutes (never averaged), so a window of
+    several periods is weighted by time like a single longer period.
+
+    Args:
+        minutes (np.ndarray): [..., len(MINUTE_COLUMNS)] minutes
+
+    Returns:
+        np.ndarray: [..., len(RATIOS)] ratios in 0..1 (NaN when undefined)
+    """
+    calendar, non_schedule, non_production, setup, downtime, quality_losses, net = np.moveaxis(minutes, -1, 0)
+    loading = calendar - non_schedule
+    operating = loading - non_production - setup - downtime
+    produced = net + quality_losses
+    return np.stack([
+        _ratio(operating, loading),
+        _ratio(produced, operating),
+        _ratio(net, produced),
+        _ratio(net, loading),
+    ], axis=-1)
+
+
+def read_snapshots(source: str) -> pd.DataFrame:
+    """Read equipment snapshots into one long frame with a Period column
+
+    Args:
+        source (str): a CSV file, or a directory of equipment_list_<YYYY-MM[-DD]>.csv
+            files. A file carrying its own Period column may hold many periods;
+            a single file without it is dated by its modification month.
+
+    Returns:
+        pd.DataFrame: Period (pd.Period), ID and MINUTE_COLUMNS
+    """
+    if os.path.isdir(source):
+        paths = sorted(glob.glob(os.path.join(source, "*.csv")))
+    else:
+        paths = [source]
+
+    parts = []
+    for path in paths:
+        snapshot = load_frame(path)
+        if PERIOD_COLUMN in snapshot.columns:
+            periods = [pd.Period(str(value)) for value in snapshot[PERIOD_COLUMN]]
+        else:
+            match = _PERIOD_IN_NAME.search(os.path.splitext(os.path.basename(path))[0])
+            if match:
+                label = match.group(1)
+                period = pd.Period(label, freq="D" if len(label) == 10 else "M")
+            elif len(paths) == 1:
+                period = pd.Timestamp(os.stat(path).st_mtime, unit="s").to_period("M")
+            else:
+                # File không ghi kỳ trong thư mục nhiều kỳ: không xếp được vào chuỗi thời gian
+                continue
+            periods = [period] * len(snapshot)
+
+        part = snapshot[[ID_COLUMN] + MINUTE_COLUMNS].copy()
+        part[MINUTE_COLUMNS] = part[MINUTE_COLUMNS].apply(pd.to_numeric, errors="coerce")
+        part.insert(0, PERIOD_COLUMN, periods)
+        parts.append(part)
+
+    if not parts:
+        return pd.DataFrame(columns=[PERIOD_COLUMN, ID_COLUMN] + MINUTE_COLUMNS)
+    return pd.concat(parts, ignore_index=True)
+
+
+class OEEStore:
+    """Minutes and ratios per (period, device), with cumulative sums for windows"""
+
+    def __init__(self, snapshots: pd.DataFrame) -> None:
+        freqs = {period.freqstr for period in snapshots[PERIOD_COLUMN]}
+        if len(freqs) > 1:
+            raise ValueError(f"Mixed period frequencies in one store: {sorted(freqs)}")
+
+        # Cùng một kỳ và thiết bị xuất hiện nhiều lần: snapshot đọc sau thay thế snapshot trước
+        snapshots = snapshots.drop_duplicates([PERIOD_COLUMN, ID_COLUMN], keep="last")
+        self.periods = pd.PeriodIndex(sorted(snapshots[PERIOD_COLUMN].unique()), freq=freqs.pop() if freqs else "M")
+        self.ids = pd.Index(snapshots[ID_COLUMN].drop_duplicates().astype(str))
+
+        period_pos = self.periods.get_indexer(snapshots[PERIOD_COLUMN])
+        id_pos = self.ids.get_indexer(snapshots[ID_COLUMN].astype(str))
+
+        shape = (len(self.periods), len(self.ids), len(MINUTE_COLUMNS))
+        self.minutes = np.zeros(shape)
+        self.minutes[period_pos, id_pos] = np.nan_to_num(snapshots[MINUTE_COLUMNS].to_numpy(dtype=float))
+        self.present = np.zeros(shape[:2], dtype=bool)
+        self.present[period_pos, id_pos] = True
+
+        self.ratios = oee_ratios(self.minutes)
+        self.ratios[~self.present] = np.nan
+        # Tổng cộng dồn theo kỳ, có hàng 0 ở đầu: tổng cửa sổ (a, b] = cumulative[b] - cumulative[a]
+        self.cumulative = np.concatenate([np.zeros((1,) + shape[1:]), np.cumsum(self.minutes, axis=0)])
+
+    @property
+    def nbytes(self) -> int:
+        arrays = (self.minutes, self.present, self.ratios, self.cumulative)
+        return sum(array.nbytes for array in arrays) + 64 * (len(self.periods) + len(self.ids))
+
+    def _id_positions(self, ids) -> np.ndarray:
+        if ids is None:
+            return np.arange(len(self.ids))
+        positions = self.ids.get_indexer([str(device) for device in ids])
+        return positions[positions >= 0]
+
+    def _period_bounds(self, start, end) -> tuple:
+        first = 0 if start is None else int(self.periods.searchsorted(pd.Period(start, freq=self.periods.freq)))
+        last = len(self.periods) if end is None else int(
+            self.periods.searchsorted(pd.Period(end, freq=self.periods.freq), side="right"))
+        return first, last
+
+    def frame(self, ids=None, start=None, end=None) -> pd.DataFrame:
+        """Long frame of minutes and precomputed ratios
+
+        Args:
+            ids (list, optional): devices to keep, all by default
+            start, end (optional): inclusive period bounds ("2024-01", Period, Timestamp)
+
+        Returns:
+            pd.DataFrame: Period, ID, MINUTE_COLUMNS and RATIOS, one row per present cell
+        """
+        columns = self._id_positions(ids)
+        first, last = self._period_bounds(start, end)
+        present = self.present[first:last][:, columns]
+        period_pos, id_pos = np.nonzero(present)
+
+        frame = pd.DataFrame({
+            PERIOD_COLUMN: self.periods[first:last][period_pos],
+            ID_COLUMN: self.ids[columns][id_pos],
+        })
+        minutes = self.minutes[first:last][:, columns][period_pos, id_pos]
+        ratios = self.ratios[first:last][:, columns][period_pos, id_pos]
+        frame[MINUTE_COLUMNS] = minutes
+        frame[RATIOS] = ratios
+        return frame
+
+    def rolling(self, metric: str = "OEE", window: int = 3, ids=None, start=None, end=None) -> pd.DataFrame:
+        """Time-weighted rolling ratio per device
+
+        Each value is the ratio of the minutes summed over the last `window`
+        periods (fewer at the start of the series), computed from the
+        cumulative sums in O(1) per cell.
+
+        Args:
+            metric (str): one of RATIOS
+            window (int): number of periods per window
+            ids (list, optional): devices to keep, all by default
+            start, end (optional): inclusive period bounds of the result
+
+        Returns:
+            pd.DataFrame: index Period, one column per device, ratios in 0..1
+        """
+        if metric not in RATIOS:
+            raise ValueError(f"Unknown metric {metric!r}, expected one of {RATIOS}")
+        if window < 1:
+            raise ValueError("window must be >= 1")
+
+        columns = self._id_positions(ids)
+        first, last = self._period_bounds(start, end)
+        upper = np.arange(first, last) + 1
+        lower = np.maximum(upper - window, 0)
+        sums = self.cumulative[upper][:, columns] - self.cumulative[lower][:, columns]
+        values = oee_ratios(sums)[..., RATIOS.index(metric)]
+
+        # Cửa sổ không có kỳ nào của thiết bị thì để trống thay vì 0
+        seen = np.concatenate([np.zeros((1, len(self.ids)), dtype=int), np.cumsum(self.present, axis=0)])
+        values[(seen[upper][:, columns] - seen[lower][:, columns]) == 0] = np.nan
+        return pd.DataFrame(values, index=self.periods[first:last], columns=self.ids[columns])
+
+    def window(self, periods: int = 1, end=None, ids=None) -> pd.DataFrame:
+        """Minutes and ratios summed over the last `periods` periods up to `end`
+
+        Returns:
+            pd.DataFrame: index ID, MINUTE_COLUMNS and RATIOS
+        """
+        columns = self._id_positions(ids)
+        _, last = self._period_bounds(None, end)
+        lower = max(last - periods, 0)
+        sums = self.cumulative[last][columns] - self.cumulative[lower][columns]
+        frame = pd.DataFrame(sums, index=self.ids[columns], columns=MINUTE_COLUMNS)
+        frame[RATIOS] = oee_ratios(sums)
+        frame.index.name = ID_COLUMN
+        return frame
+
+
+_stores = SizedLRUCache(64 * 1024 * 1024, sizeof=lambda store: store.nbytes)
+
+
+def _source_signature(source: str) -> tuple:
+    if os.path.isdir(source):
+        return tuple(file_signature(path) for path in sorted(glob.glob(os.path.join(source, "*.csv"))))
+    return (file_signature(source),)
+
+
+def get_store(source: str) -> OEEStore:
+    """OEE store of a snapshot file or directory, rebuilt only when a file changes
+
+    Args:
+        source (str): see read_snapshots
+
+    Returns:
+        OEEStore: cached store
+    """
+    key = (os.path.abspath(source), _source_signature(source))
+    store = _stores.get(key)
+    if store is None:
+        store = OEEStore(read_snapshots(source))
+        _stores.invalidate(lambda cached: cached[0] == key[0] and cached != key)
+        _stores.put(key, store)
+    return store
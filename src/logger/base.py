@@ -1,4 +1,78 @@
+"""JSON-lines logging shared by the app and the performance instrumentation
+
+Every record is one JSON object per line in PERF_LOG (default
+.cache/logs/perf.jsonl), so the file can be tailed, grepped or loaded with
+pd.read_json(path, lines=True). The file is rotated to <path>.1 once it
+exceeds PERF_LOG_MAX_MB.
+"""
+import json
+import os
+import threading
+import time
+
+LOG_PATH = os.environ.get("PERF_LOG", os.path.join(".cache", "logs", "perf.jsonl"))
+MAX_LOG_MB = float(os.environ.get("PERF_LOG_MAX_MB", "50"))
+
+
+class JsonLinesWriter:
+    """Thread-safe appender of JSON records, one per line"""
+
+    def __init__(self, path: str = LOG_PATH, max_bytes: int = int(MAX_LOG_MB * 1024 * 1024)) -> None:
+        self.path = path
+        self.max_bytes = max_bytes
+        self._file = None
+        self._lock = threading.Lock()
+
+    def write(self, record: dict) -> None:
+        line = json.dumps(record, ensure_ascii=False, default=str) + "\n"
+        with self._lock:
+            if self._file is None:
+                os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+                self._file = open(self.path, "a", encoding="utf-8", buffering=1)
+            self._file.write(line)
+            if self.max_bytes and self._file.tell() > self.max_bytes:
+                self._rotate()
+
+    def _rotate(self) -> None:
+        self._file.close()
+        os.replace(self.path, self.path + ".1")
+        self._file = open(self.path, "a", encoding="utf-8", buffering=1)
+
+    def close(self) -> None:
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+
+writer = JsonLinesWriter()
+
+
 class BaseLogger:
+    """Structured logger: logger.info("message", key=value) writes a JSON record
+
+    Args:
+        name (str): logger name stored in every record
+        context (callable, optional): function() -> dict merged into every record
+            (the instrumentation passes the current session/page/rerun)
+    """
+
+    def __init__(self, name: str = "app", context=None) -> None:
+        self.name = name
+        self.context = context
+
+    def log(self, level: str, message: str, **fields) -> None:
+        record = {"type": "log", "ts": time.time(), "level": level, "logger": self.name, "msg": str(message)}
+        if self.context is not None:
+            record.update(self.context())
+        record.update(fields)
+        writer.write(record)
+
+    def info(self, message: str, **fields) -> None:
+        self.log("info", message, **fields)
+
+    def warning(self, message: str, **fields) -> None:
+        self.log("warning", message, **fields)
 
-    def __init__(self) -> None:
-        self.info = print
\ No newline at end of file
+    def error(self, message: str, **fields) -> None:
+        self.log("error", message, **fields)
@@ -0,0 +1,202 @@
+"""Timing spans, counters and per-session context for the Streamlit pages
+
+Usage in a page:
+
+    perf.start_rerun("Expense")          # top of the script
+    with perf.span("load", kind="load"):
+        ...
+    @perf.timed(kind="render")
+    def heatmap(): ...
+    perf.end_rerun()                     # bottom of the script
+
+Records (JSON lines, see src.logger.base):
+    span   name, kind, ms, offset_ms, span_id, parent_id, ok, + context
+    rerun  page, ms, counters, caches (hits/misses/bytes), rss_bytes,
+           session_bytes, + context
+Context = session_id, page, rerun_id of the current Streamlit script run.
+"""
+import contextvars
+import functools
+import itertools
+import os
+import sys
+import time
+import uuid
+from collections import Counter
+from contextlib import contextmanager
+
+from src.logger.base import BaseLogger, writer
+
+SPAN_KINDS = ("load", "filter", "aggregate", "render")
+
+# Cache có hàm stats(): chỉ đọc module đã được import, không kéo thêm phụ thuộc
+CACHES = {
+    "frames": ("src.data.loader", "cache_stats"),
+    "figures": ("src.dashboard.figures", "cache_stats"),
+    "plots": ("src.sandbox.engine", "cache_stats"),
+    "llm": ("src.models.llms", "cache_stats"),
+}
+
+_context = contextvars.ContextVar("perf_context", default={})
+_parent = contextvars.ContextVar("perf_parent", default=None)
+_counters = contextvars.ContextVar("perf_counters", default=None)
+_started = contextvars.ContextVar("perf_started", default=None)
+_span_ids = itertools.count(1)
+
+
+def context() -> dict:
+    """session_id / page / rerun_id of the current script run"""
+    return dict(_context.get())
+
+
+logger = BaseLogger("app", context=context)
+
+
+def _session_id() -> str:
+    try:
+        from streamlit.runtime.scriptrunner import get_script_run_ctx
+        ctx = get_script_run_ctx()
+        return ctx.session_id if ctx is not None else None
+    except Exception:
+        return None
+
+
+def _session_bytes() -> int:
+    try:
+        import streamlit as st
+        from src.data.cache import estimate_size
+        return sum(estimate_size(getattr(value, "df", value)) for value in st.session_state.values())
+    except Exception:
+        return None
+
+
+def rss_bytes() -> int:
+    """Resident memory of the process (Linux /proc, else peak RSS)"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        pass
+    try:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == "darwin" else peak * 1024
+    except ImportError:
+        return None
+
+
+def cache_snapshot() -> dict:
+    snapshot = {}
+    for name, (module_name, function) in CACHES.items():
+        module = sys.modules.get(module_name)
+        if module is not None:
+            try:
+                snapshot[name] = getattr(module, function)()
+            except Exception:
+                continue
+    return snapshot
+
+
+def set_context(**fields) -> None:
+    _context.set({**_context.get(), **fields})
+
+
+def start_rerun(page: str) -> None:
+    """Open the context of one script run of a page"""
+    _context.set({"session_id": _session_id(), "page": page, "rerun_id": uuid.uuid4().hex[:12]})
+    _parent.set(None)
+    _counters.set(Counter())
+    _started.set(time.perf_counter())
+
+
+def end_rerun(ok: bool = True) -> None:
+    """Write the rerun record (total time, counters, caches, memory) and close its context"""
+    started = _started.get()
+    if started is None:
+        return
+    _started.set(None)
+    writer.write({
+        "type": "rerun",
+        "ts": time.time(),
+        **_context.get(),
+        "ms": (time.perf_counter() - started) * 1000,
+        "ok": ok,
+        "counters": dict(_counters.get() or {}),
+        "caches": cache_snapshot(),
+        "rss_bytes": rss_bytes(),
+        "session_bytes": _session_bytes(),
+    })
+    # Span ghi sau lần chạy lại này không được mang page/rerun_id cũ
+    _context.set({})
+    _counters.set(None)
+    _parent.set(None)
+
+
+@contextmanager
+def rerun(page: str):
+    """start_rerun / end_rerun around a block, written even if the block raises or calls st.stop()"""
+    start_rerun(page)
+    ok = True
+    try:
+        yield
+    except BaseException as e:
+        # StopException/RerunException của Streamlit không phải lỗi của trang
+        ok = type(e).__module__.startswith("streamlit")
+        raise
+    finally:
+        end_rerun(ok)
+
+
+def count(name: str, value: int = 1) -> None:
+    """Add to a counter of the current rerun"""
+    counters = _counters.get()
+    if counters is None:
+        counters = Counter()
+        _counters.set(counters)
+    counters[name] += value
+
+
+@contextmanager
+def span(name: str, kind: str = None, **fields):
+    """Time a block; nested spans record their parent"""
+    span_id = next(_span_ids)
+    parent_id = _parent.get()
+    token = _parent.set(span_id)
+    started = time.perf_counter()
+    rerun_started = _started.get()
+    ok = True
+    try:
+        yield
+    except BaseException as e:
+        # StopException/RerunException của Streamlit không phải lỗi của khối đo
+        ok = type(e).__module__.startswith("streamlit")
+        raise
+    finally:
+        _parent.reset(token)
+        writer.write({
+            "type": "span",
+            "ts": time.time(),
+            **_context.get(),
+            "name": name,
+            "kind": kind,
+            "ms": (time.perf_counter() - started) * 1000,
+            # Vị trí bắt đầu tính từ đầu lần chạy lại, để dựng biểu đồ flame
+            "offset_ms": (started - rerun_started) * 1000 if rerun_started is not None else None,
+            "span_id": span_id,
+            "parent_id": parent_id,
+            "ok": ok,
+            **fields,
+        })
+
+
+def timed(name: str = None, kind: str = None):
+    """Decorator: run the function inside span(name or function name, kind)"""
+    def decorator(function):
+        label = name or function.__name__
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            with span(label, kind):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorator
@@ -0,0 +1,138 @@
+"""Summaries of the performance log for the Performance page
+
+The log is parsed once per file version (path, mtime, size); every
+summary below works on the parsed span/rerun frames.
+"""
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+from src.data.cache import SizedLRUCache
+from src.data.loader import file_signature
+from src.logger.base import LOG_PATH
+
+_parsed = SizedLRUCache(256 * 1024 * 1024, sizeof=lambda frames: sum(
+    int(frame.memory_usage(index=True, deep=True).sum()) for frame in frames))
+
+
+def read_log(path: str = LOG_PATH) -> tuple:
+    """Parse the JSON-lines log
+
+    Returns:
+        tuple: (spans, reruns) DataFrames, empty when the file does not exist
+    """
+    if not os.path.exists(path):
+        return pd.DataFrame(), pd.DataFrame()
+
+    key = file_signature(path)
+    frames = _parsed.get(key)
+    if frames is None:
+        records = {"span": [], "rerun": []}
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:  # dòng đang ghi dở ở cuối file
+                    continue
+                if record.get("type") in records:
+                    records[record["type"]].append(record)
+        frames = tuple(pd.DataFrame(records[kind]) for kind in ("span", "rerun"))
+        for frame in frames:
+            if "ts" in frame:
+                frame["time"] = pd.to_datetime(frame["ts"], unit="s")
+        _parsed.invalidate(lambda cached: cached[0] == key[0])
+        _parsed.put(key, frames)
+    return frames
+
+
+def latency_by_page(reruns: pd.DataFrame) -> pd.DataFrame:
+    """Rerun count and p50/p95/max latency (ms) per page"""
+    if reruns.empty:
+        return pd.DataFrame(columns=["page", "reruns", "p50_ms", "p95_ms", "max_ms"])
+    grouped = reruns.groupby("page")["ms"]
+    return pd.DataFrame({
+        "reruns": grouped.size(),
+        "p50_ms": grouped.quantile(0.5),
+        "p95_ms": grouped.quantile(0.95),
+        "max_ms": grouped.max(),
+    }).reset_index().sort_values("p95_ms", ascending=False, ignore_index=True)
+
+
+def slowest_functions(spans: pd.DataFrame, limit: int = 20) -> pd.DataFrame:
+    """Spans grouped by (page, name, kind), ranked by total time"""
+    if spans.empty:
+        return pd.DataFrame(columns=["page", "name", "kind", "calls", "total_ms", "p50_ms", "p95_ms", "errors"])
+    grouped = spans.groupby(["page", "name", "kind"], dropna=False)
+    summary = pd.DataFrame({
+        "calls": grouped.size(),
+        "total_ms": grouped["ms"].sum(),
+        "p50_ms": grouped["ms"].quantile(0.5),
+        "p95_ms": grouped["ms"].quantile(0.95),
+        "errors": grouped["ok"].apply(lambda ok: int((~ok.astype(bool)).sum())),
+    })
+    return summary.reset_index().sort_values("total_ms", ascending=False, ignore_index=True).head(limit)
+
+
+def cache_hit_rates(reruns: pd.DataFrame) -> pd.DataFrame:
+    """Latest stats of every cache reported in the rerun records, with hit rate"""
+    if reruns.empty or "caches" not in reruns:
+        return pd.DataFrame(columns=["cache", "hits", "misses", "hit_rate", "entries", "bytes"])
+    latest = {}
+    # Bộ đếm của cache là tích lũy trong tiến trình: bản ghi mới nhất là đủ
+    for caches in reruns.sort_values("ts")["caches"]:
+        if isinstance(caches, dict):
+            latest.update(caches)
+    rows = []
+    for name, stats in latest.items():
+        hits, misses = stats.get("hits", 0), stats.get("misses", 0)
+        rows.append({
+            "cache": name,
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": hits / (hits + misses) if hits + misses else np.nan,
+            "entries": stats.get("entries", stats.get("clients")),
+            "bytes": stats.get("bytes"),
+        })
+    return pd.DataFrame(rows, columns=["cache", "hits", "misses", "hit_rate", "entries", "bytes"])
+
+
+def memory_by_session(reruns: pd.DataFrame) -> pd.DataFrame:
+    """Last process RSS and session_state size seen per session"""
+    columns = ["session_id", "page", "last_seen", "reruns", "rss_mb", "session_mb"]
+    if reruns.empty:
+        return pd.DataFrame(columns=columns)
+    ordered = reruns.sort_values("ts").assign(session_id=lambda frame: frame["session_id"].fillna("(không có phiên)"))
+    last = ordered.groupby("session_id").tail(1).set_index("session_id")
+    summary = pd.DataFrame({
+        "page": last["page"],
+        "last_seen": last["time"],
+        "reruns": ordered.groupby("session_id").size(),
+        "rss_mb": pd.to_numeric(last["rss_bytes"], errors="coerce") / 1024 ** 2,
+        "session_mb": pd.to_numeric(last["session_bytes"], errors="coerce") / 1024 ** 2,
+    })
+    return summary.reset_index().sort_values("last_seen", ascending=False, ignore_index=True)[columns]
+
+
+def flame(spans: pd.DataFrame, rerun_id: str) -> pd.DataFrame:
+    """Spans of one rerun with their nesting depth, ordered by start
+
+    Returns:
+        pd.DataFrame: name, kind, offset_ms, ms, depth
+    """
+    if spans.empty:
+        return pd.DataFrame(columns=["name", "kind", "offset_ms", "ms", "depth"])
+    run = spans[spans["rerun_id"] == rerun_id].copy()
+    parents = dict(zip(run["span_id"], run["parent_id"]))
+
+    def depth(span_id) -> int:
+        level = 0
+        parent = parents.get(span_id)
+        while parent is not None and not pd.isna(parent) and parent in parents:
+            level += 1
+            parent = parents.get(parent)
+        return level
+
+    run["depth"] = run["span_id"].map(depth)
+    return run.sort_values("offset_ms")[["name", "kind", "offset_ms", "ms", "depth"]].reset_index(drop=True)
@@ -0,0 +1,142 @@
+"""Ask-your-data pipeline: question -> model -> matplotlib code -> image
+
+The schema summary (columns, dtypes, ranges, frequent values and a few
+sample rows) is built once per dataset version and reused by every
+question, so a question costs the summary tokens plus the question, and a
+repeated question on the same data is answered from the response cache.
+The generated code runs in the sandboxed plot engine (src.sandbox.engine),
+the same one behind src.utils.execute_plt_code.
+"""
+import re
+import time
+from typing import NamedTuple
+
+import pandas as pd
+
+from src.data.cache import SizedLRUCache
+from src.models.llms import complete
+from src.sandbox.engine import render
+
+SAMPLE_ROWS = 5
+TOP_VALUES = 5
+MAX_CELL_CHARS = 40
+
+PROMPT_TEMPLATE = """You write Python code that answers a question about a pandas DataFrame `df`.
+`pd` and `plt` (matplotlib.pyplot) are already imported. Draw the answer with plt
+(one chart, with a title and axis labels). Do not read files, do not call plt.show().
+Reply with a single ```python code block and nothing else.
+
+Dataset: {name}
+{summary}
+
+Question: {question}
+"""
+
+_summaries = SizedLRUCache(16 * 1024 * 1024)
+
+_CODE_BLOCK = re.compile(r"```(?:python|py)?\s*\n(.*?)```", re.DOTALL)
+
+
+class AskResult(NamedTuple):
+    question: str
+    code: str          # mã do mô hình sinh ra, None nếu không có
+    image: bytes       # PNG, None nếu lỗi
+    error: str         # None nếu thành công
+    timings: dict      # giây theo từng bước: schema, llm, execute, total
+    usage: dict        # số token do nhà cung cấp trả về
+    cached: bool       # câu trả lời lấy từ cache
+
+
+def _clip(value) -> str:
+    text = str(value)
+    return text if len(text) <= MAX_CELL_CHARS else text[:MAX_CELL_CHARS - 1] + "…"
+
+
+def _describe_column(values: pd.Series) -> str:
+    dtype = str(values.dtype)
+    missing = int(values.isna().sum())
+    parts = [f"{dtype}"]
+    if pd.api.types.is_numeric_dtype(values) and not pd.api.types.is_bool_dtype(values):
+        parts.append(f"min={values.min()}, max={values.max()}")
+    else:
+        counts = values.value_counts().head(TOP_VALUES)
+        parts.append(f"{values.nunique()} distinct")
+        parts.append("top: " + ", ".join(_clip(value) for value in counts.index))
+    if missing:
+        parts.append(f"{missing} missing")
+    return "; ".join(parts)
+
+
+def build_schema_summary(df: pd.DataFrame, sample_rows: int = SAMPLE_ROWS) -> str:
+    """Compact text description of df for the prompt
+
+    Returns:
+        str: row count, one line per column and a few sample rows as CSV
+    """
+    lines = [f"{len(df):,} rows, {len(df.columns)} columns:"]
+    lines += [f"- {column}: {_describe_column(df[column])}" for column in df.columns]
+    sample = df.head(sample_rows).astype(str).apply(lambda column: column.map(_clip))
+    lines.append("Sample rows (CSV):")
+    lines.append(sample.to_csv(index=False).strip())
+    return "\n".join(lines)
+
+
+def schema_summary(df: pd.DataFrame, name: str, data_version) -> str:
+    """build_schema_summary, computed once per (dataset name, data version)"""
+    key = (name, str(data_version))
+    summary = _summaries.get(key)
+    if summary is None:
+        summary = build_schema_summary(df)
+        _summaries.invalidate(lambda cached: cached[0] == name and cached != key)
+        _summaries.put(key, summary)
+    return summary
+
+
+def extract_code(reply: str) -> str:
+    """First fenced code block of a reply (or the reply itself if it has no fence)"""
+    match = _CODE_BLOCK.search(reply)
+    code = match.group(1) if match else reply
+    return code.strip() or None
+
+
+def ask(question: str, df: pd.DataFrame, name: str, data_version, model_name: str = "gpt-3.5-turbo") -> AskResult:
+    """Answer a question about df with a chart
+
+    Args:
+        question (str): question in natural language
+        df (pd.DataFrame): data the question is about
+        name (str): dataset name shown to the model, part of the summary cache key
+        data_version: version of df (file signature, IncrementalDataset.version, ...)
+        model_name (str): see src.models.llms.MODELS
+
+    Returns:
+        AskResult: generated code, rendered image or error, and stage timings
+    """
+    timings = {}
+    started = time.perf_counter()
+    version = str(data_version)
+
+    summary = schema_summary(df, name, version)
+    timings["schema"] = time.perf_counter() - started
+
+    prompt = PROMPT_TEMPLATE.format(name=name, summary=summary, question=question.strip())
+    step = time.perf_counter()
+    try:
+        completion = complete(prompt, model_name, fingerprint=version)
+    except Exception as e:
+        timings["llm"] = time.perf_counter() - step
+        timings["total"] = time.perf_counter() - started
+        return AskResult(question, None, None, f"{type(e).__name__}: {e}", timings, {}, False)
+    timings["llm"] = time.perf_counter() - step
+
+    code = extract_code(completion.text)
+    if code is None:
+        timings["total"] = time.perf_counter() - started
+        return AskResult(question, None, None, "The model did not return any code", timings,
+                         completion.usage, completion.cached)
+
+    step = time.perf_counter()
+    result = render(code, df, data_version=version)
+    timings["execute"] = time.perf_counter() - step
+    timings["total"] = time.perf_counter() - started
+    return AskResult(question, code, result.data, result.error, timings, completion.usage, completion.cached)
@@ -1,25 +1,212 @@
-from langchain_openai import ChatOpenAI
+"""Chat model provider layer
 
+* one client per model name, created on first use and shared by every
+  session (connection pools are reused instead of rebuilt per question);
+* responses cached on disk per (model, prompt, data fingerprint), see
+  src.models.response_cache;
+* complete_many() sends a batch of prompts concurrently with asyncio,
+  bounded by LLM_CONCURRENCY, and deduplicates identical prompts;
+* the "fake" model answers locally, so the whole path runs offline.
+"""
+import asyncio
+import concurrent.futures
+import os
+import threading
+import time
+from typing import NamedTuple
 
+from src.models.response_cache import ResponseCache
 
-def load_llm(model_name):
-    if model_name == "gpt-3.5-turbo":
+OPENAI_MODELS = ["gpt-3.5-turbo", "gpt-4"]
+GEMINI_MODELS = ["gemini-pro"]
+FAKE_MODEL = "fake"
+MODELS = OPENAI_MODELS + GEMINI_MODELS + [FAKE_MODEL]
+
+MAX_TOKENS = 500
+CONCURRENCY = int(os.environ.get("LLM_CONCURRENCY", "4"))
+
+
+class Completion(NamedTuple):
+    text: str
+    model: str
+    usage: dict       # số token nếu nhà cung cấp trả về
+    cached: bool
+    elapsed: float    # giây
+
+
+class FakeMessage(NamedTuple):
+    content: str
+    response_metadata: dict
+
+
+class FakeLLM:
+    """Offline stand-in with the invoke/ainvoke interface of a langchain chat model
+
+    Args:
+        respond (callable, optional): function(prompt) -> reply text; echoes the prompt by default
+        delay (float): simulated latency in seconds
+    """
+
+    def __init__(self, respond=None, delay: float = 0.0) -> None:
+        self.respond = respond or (lambda prompt: f"FAKE: {prompt[-200:]}")
+        self.delay = delay
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def invoke(self, prompt) -> FakeMessage:
+        if self.delay:
+            time.sleep(self.delay)
+        return self._reply(prompt)
+
+    async def ainvoke(self, prompt) -> FakeMessage:
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        return self._reply(prompt)
+
+    def _reply(self, prompt) -> FakeMessage:
+        with self._lock:
+            self.calls += 1
+        text = self.respond(str(prompt))
+        usage = {"prompt_tokens": len(str(prompt).split()), "completion_tokens": len(text.split())}
+        return FakeMessage(text, {"token_usage": usage})
+
+
+def _create_client(model_name: str):
+    if model_name in OPENAI_MODELS:
+        from langchain_openai import ChatOpenAI
         return ChatOpenAI(
             model=model_name,
             temperature=0.0,
-            max_tokens=500,
+            max_tokens=MAX_TOKENS,
         )
-    elif model_name == "gpt-4":
-        return ChatOpenAI(
+    elif model_name in GEMINI_MODELS:
+        try:
+            from langchain_google_genai import ChatGoogleGenerativeAI
+        except ImportError as e:
+            raise ImportError(
+                "gemini-pro needs the langchain-google-genai package and GOOGLE_API_KEY"
+            ) from e
+        return ChatGoogleGenerativeAI(
             model=model_name,
             temperature=0.0,
-            max_tokens=500,
+            max_output_tokens=MAX_TOKENS,
         )
-    elif model_name == "gemini-pro":
-        # Import Gemini and Return Gemini mode
-        pass
+    elif model_name == FAKE_MODEL:
+        return FakeLLM()
     else:
         raise ValueError(
-            "Unknown model.\
-                Please choose from ['gpt-3.5-turbo','gpt-4', ...]"
-        )
\ No newline at end of file
+            f"Unknown model {model_name!r}. Please choose from {MODELS}"
+        )
+
+
+_clients = {}
+_clients_lock = threading.Lock()
+_responses = ResponseCache()
+
+
+def load_llm(model_name):
+    """Shared client of a model, created once per process
+
+    Raises:
+        ValueError: unknown model name
+        ImportError: provider package not installed
+    """
+    with _clients_lock:
+        client = _clients.get(model_name)
+        if client is None:
+            client = _create_client(model_name)
+            _clients[model_name] = client
+        return client
+
+
+def set_client(model_name: str, client) -> None:
+    """Replace the client of a model, e.g. a FakeLLM with scripted replies"""
+    with _clients_lock:
+        _clients[model_name] = client
+
+
+def _usage(message) -> dict:
+    usage = getattr(message, "usage_metadata", None)
+    if usage:
+        return dict(usage)
+    return dict(getattr(message, "response_metadata", {}).get("token_usage") or {})
+
+
+def complete(prompt: str, model_name: str = "gpt-3.5-turbo", fingerprint: str = "",
+             use_cache: bool = True) -> Completion:
+    """Answer one prompt, from the disk cache when possible
+
+    Args:
+        prompt (str): full prompt text
+        model_name (str): one of MODELS
+        fingerprint (str): version of the data the prompt is about (part of the cache key)
+        use_cache (bool): read the cache (the answer is always written)
+
+    Returns:
+        Completion: reply text and metadata
+    """
+    started = time.perf_counter()
+    if use_cache:
+        entry = _responses.get(model_name, prompt, fingerprint)
+        if entry is not None:
+            return Completion(entry["response"], model_name, entry["usage"], True, time.perf_counter() - started)
+
+    message = load_llm(model_name).invoke(prompt)
+    usage = _usage(message)
+    _responses.put(model_name, prompt, fingerprint, message.content, usage)
+    return Completion(message.content, model_name, usage, False, time.perf_counter() - started)
+
+
+async def acomplete(prompt: str, model_name: str = "gpt-3.5-turbo", fingerprint: str = "",
+                    use_cache: bool = True, semaphore: asyncio.Semaphore = None) -> Completion:
+    """Async version of complete(); semaphore bounds the number of requests in flight"""
+    started = time.perf_counter()
+    if use_cache:
+        entry = _responses.get(model_name, prompt, fingerprint)
+        if entry is not None:
+            return Completion(entry["response"], model_name, entry["usage"], True, time.perf_counter() - started)
+
+    client = load_llm(model_name)
+    if semaphore is None:
+        message = await client.ainvoke(prompt)
+    else:
+        async with semaphore:
+            message = await client.ainvoke(prompt)
+    usage = _usage(message)
+    _responses.put(model_name, prompt, fingerprint, message.content, usage)
+    return Completion(message.content, model_name, usage, False, time.perf_counter() - started)
+
+
+async def _gather(prompts: list, model_name: str, fingerprint: str, use_cache: bool, concurrency: int) -> list:
+    semaphore = asyncio.Semaphore(concurrency)
+    return await asyncio.gather(*(
+        acomplete(prompt, model_name, fingerprint, use_cache, semaphore) for prompt in prompts
+    ))
+
+
+def complete_many(prompts: list, model_name: str = "gpt-3.5-turbo", fingerprint: str = "",
+                  use_cache: bool = True, concurrency: int = CONCURRENCY) -> list:
+    """Answer a batch of prompts concurrently
+
+    Identical prompts are sent once. Safe to call from a thread that already
+    runs an event loop (the batch then runs on a helper thread).
+
+    Returns:
+        list: one Completion per prompt, in order
+    """
+    unique = list(dict.fromkeys(prompts))
+    coroutine = _gather(unique, model_name, fingerprint, use_cache, max(concurrency, 1))
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        results = asyncio.run(coroutine)
+    else:
+        with concurrent.futures.ThreadPoolExecutor(1) as executor:
+            results = executor.submit(asyncio.run, coroutine).result()
+
+    by_prompt = dict(zip(unique, results))
+    return [by_prompt[prompt] for prompt in prompts]
+
+
+def cache_stats() -> dict:
+    return {"clients": len(_clients), **_responses.stats()}
@@ -0,0 +1,84 @@
+"""On-disk cache of model responses
+
+One JSON file per (model, prompt, data fingerprint) under LLM_CACHE_DIR, so
+asking the same question about the same data again costs a file read
+instead of a round-trip, across sessions and restarts.
+"""
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+
+LLM_CACHE_DIR = os.environ.get("LLM_CACHE_DIR", os.path.join(".cache", "llm"))
+
+
+def cache_key(model_name: str, prompt: str, fingerprint: str = "") -> str:
+    hasher = hashlib.sha256()
+    for part in (model_name, fingerprint, prompt):
+        hasher.update(part.encode("utf-8") + b"\0")
+    return hasher.hexdigest()
+
+
+class ResponseCache:
+    """Content-addressed JSON files, written atomically"""
+
+    def __init__(self, directory: str = LLM_CACHE_DIR) -> None:
+        self.directory = directory
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def _path(self, key: str) -> str:
+        # Chia thư mục theo 2 ký tự đầu để không dồn hàng nghìn file vào một chỗ
+        return os.path.join(self.directory, key[:2], f"{key}.json")
+
+    def get(self, model_name: str, prompt: str, fingerprint: str = ""):
+        """Cached entry {"response", "usage", ...} or None"""
+        path = self._path(cache_key(model_name, prompt, fingerprint))
+        try:
+            with open(path, encoding="utf-8") as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            with self._lock:
+                self.misses += 1
+            return None
+        with self._lock:
+            self.hits += 1
+        return entry
+
+    def put(self, model_name: str, prompt: str, fingerprint: str, response: str, usage: dict = None) -> None:
+        path = self._path(cache_key(model_name, prompt, fingerprint))
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        entry = {
+            "model": model_name,
+            "fingerprint": fingerprint,
+            "prompt": prompt,
+            "response": response,
+            "usage": usage or {},
+            "created": time.time(),
+        }
+        # Ghi vào file tạm rồi đổi tên: phiên khác không bao giờ đọc phải file ghi dở
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(entry, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+
+    def clear(self) -> int:
+        """Delete every cached response
+
+        Returns:
+            int: number of removed files
+        """
+        removed = 0
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                if name.endswith(".json"):
+                    os.remove(os.path.join(root, name))
+                    removed += 1
+        return removed
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses}
@@ -0,0 +1,297 @@
+"""Render every department x month expense and inventory report into reports/
+
+Run from the project root:
+
+    python -m src.reports.batch --formats html xlsx
+    python -m src.reports.batch --kinds expense --departments HCMCHEM HCMPEST --months 1 2 3 --workers 8
+
+Expense reports come from the transactions (test_file.csv), aggregated once
+into the expense cube (the same one the Expense page reads, see
+src.dashboard.cube). Inventory reports come from the stock balance export
+(inventory_balance_list.xlsx, the Inventory page source), aggregated into a
+cube on (phong_ban, Commodity, Month, Warehouse) where Month is the month of
+the snapshot date; they are written under reports/ton_kho/. Every report is
+rendered from its own slice in a process pool. A report is skipped when its output exists
+and the fingerprint of its inputs (slice of the cube, transaction rows and
+REPORT_VERSION) matches reports/manifest.json, so a rerun after appending a
+few rows only regenerates the affected department x month reports.
+
+PDF output needs the kaleido package (plotly static export).
+"""
+import argparse
+import hashlib
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import pandas as pd
+
+from src.dashboard.cube import CUBE_DIMS, build_cube, rollup, slice_cube, summary
+from src.data.loader import load_frame
+from src.data.schema import TRANSACTION_SCHEMA
+
+# Tăng khi nội dung/định dạng báo cáo thay đổi để buộc dựng lại toàn bộ
+REPORT_VERSION = "1"
+FORMATS = ("html", "xlsx", "pdf")
+DETAIL_COLUMNS = ["Created Date", "Month", "Type", "phong_ban", "Commodity", "Item Number", "Item",
+                  "Quantity", "UOM", "Price", "Total"]
+INVENTORY_DETAIL_COLUMNS = ["Created Date", "Month", "phong_ban", "Warehouse", "Commodity", "Item Number", "Item",
+                            "Quantity", "UOM", "Total"]
+VND_FORMAT = "#,##0"
+MANIFEST = "manifest.json"
+
+# Mỗi loại báo cáo: khối tổng hợp, chiều phân loại thứ hai và nhãn hiển thị
+KINDS = {
+    "expense": {
+        "dims": CUBE_DIMS,
+        "breakdown": "Type",
+        "detail": DETAIL_COLUMNS,
+        "title": "Báo cáo chi phí",
+        "value_label": "Tổng Chi Phí",
+        "range_labels": ["Chi phí nhỏ nhất", "Chi phí lớn nhất"],
+        "breakdown_label": "Nhóm Chi Phí",
+        "pie_title": "Tỷ lệ chi phí theo Commodity",
+        "bar_title": "Phân Loại Chi Phí",
+    },
+    "inventory": {
+        "dims": ["phong_ban", "Commodity", "Month", "Warehouse"],
+        "breakdown": "Warehouse",
+        "detail": INVENTORY_DETAIL_COLUMNS,
+        "title": "Báo cáo tồn kho",
+        "value_label": "Giá Trị Tồn",
+        "range_labels": ["Giá trị nhỏ nhất", "Giá trị lớn nhất"],
+        "breakdown_label": "Kho",
+        "pie_title": "Tỷ lệ giá trị tồn theo Commodity",
+        "bar_title": "Giá trị tồn theo kho",
+    },
+}
+
+
+def fingerprint(cube_slice: pd.DataFrame, rows: pd.DataFrame) -> str:
+    """Content hash of the inputs of one report"""
+    hasher = hashlib.sha256(REPORT_VERSION.encode("ascii"))
+    for frame in (cube_slice, rows):
+        hasher.update(pd.util.hash_pandas_object(frame, index=False).to_numpy().tobytes())
+    return hasher.hexdigest()
+
+
+def report_path(out_dir: str, department: str, month: int, fmt: str, kind: str = "expense") -> str:
+    if kind == "inventory":
+        return os.path.join(out_dir, "ton_kho", str(department), f"{department}_ton_kho_thang_{int(month):02d}.{fmt}")
+    return os.path.join(out_dir, str(department), f"{department}_thang_{int(month):02d}.{fmt}")
+
+
+def inventory_frame(df: pd.DataFrame) -> pd.DataFrame:
+    """Stock balance rows with the Month of their snapshot date (Created Date, m/d/y)"""
+    dates = pd.to_datetime(df["Created Date"].astype(str), format="%m/%d/%y", errors="coerce")
+    return df.assign(Month=dates.dt.month.astype("Int64"))
+
+
+def _figures(cube_slice: pd.DataFrame, title: str, kind: str = "expense") -> list:
+    import plotly.express as px
+
+    config = KINDS[kind]
+    breakdown = config["breakdown"]
+    # plotly express không xử lý tốt danh mục không xuất hiện trong lát cắt: dùng chuỗi
+    by_commodity = rollup(cube_slice, "Commodity").astype({"Commodity": str})
+    by_breakdown = rollup(cube_slice, breakdown).sort_values(breakdown, ignore_index=True).astype({breakdown: str})
+    pie = px.pie(by_commodity, values="Total", names="Commodity", title=f"{config['pie_title']} - {title}")
+    pie.update_traces(textinfo="percent+label", textposition="inside")
+    bar = px.bar(by_breakdown, x=breakdown, y="Total", color=breakdown, title=f"{config['bar_title']} - {title}",
+                 labels={breakdown: config["breakdown_label"], "Total": config["value_label"]})
+    bar.update_traces(texttemplate="%{y:,.0f}", textposition="outside")
+    bar.update_layout(showlegend=False)
+    return [pie, bar]
+
+
+def _tables(cube_slice: pd.DataFrame, kind: str = "expense") -> dict:
+    config = KINDS[kind]
+    breakdown = config["breakdown"]
+    totals = summary(cube_slice)
+    return {
+        "Tổng hợp": pd.DataFrame({
+            "Chỉ số": ["Tổng Mặt Hàng", "Số dòng", config["value_label"], *config["range_labels"]],
+            "Giá trị": [totals["items"], totals["count"], totals["sum"], totals["min"], totals["max"]],
+        }),
+        "Commodity": rollup(cube_slice, "Commodity").sort_values("Total", ascending=False, ignore_index=True),
+        breakdown: rollup(cube_slice, breakdown).sort_values("Total", ascending=False, ignore_index=True),
+    }
+
+
+def write_html(path: str, title: str, cube_slice: pd.DataFrame, kind: str = "expense") -> None:
+    parts = [f"<html><head><meta charset='utf-8'><title>{title}</title></head><body><h1>{title}</h1>"]
+    for name, table in _tables(cube_slice, kind).items():
+        parts.append(f"<h2>{name}</h2>")
+        parts.append(table.to_html(index=False, float_format=lambda value: f"{value:,.0f}"))
+    for position, fig in enumerate(_figures(cube_slice, title, kind)):
+        # Chỉ tải plotly.js một lần (CDN) thay vì nhúng ~3MB vào mỗi file
+        parts.append(fig.to_html(full_html=False, include_plotlyjs="cdn" if position == 0 else False))
+    parts.append("</body></html>")
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("\n".join(parts))
+
+
+def write_xlsx(path: str, title: str, cube_slice: pd.DataFrame, rows: pd.DataFrame, kind: str = "expense") -> None:
+    sheets = dict(_tables(cube_slice, kind), **{"Giao dịch" if kind == "expense" else "Tồn kho": rows})
+    with pd.ExcelWriter(path, engine="openpyxl") as excel:
+        for name, table in sheets.items():
+            table.to_excel(excel, sheet_name=name, index=False)
+            sheet = excel.sheets[name]
+            # Định dạng số VND trong file, giá trị vẫn là số
+            for position, column in enumerate(table.columns, start=1):
+                if pd.api.types.is_numeric_dtype(table[column]) and column not in ("Month", "Created Date", "Item Number"):
+                    for (cell,) in sheet.iter_rows(min_row=2, min_col=position, max_col=position):
+                        cell.number_format = VND_FORMAT
+
+
+def write_pdf(path: str, title: str, cube_slice: pd.DataFrame, kind: str = "expense") -> None:
+    from plotly.subplots import make_subplots
+
+    pie, bar = _figures(cube_slice, title, kind)
+    fig = make_subplots(rows=2, cols=1, specs=[[{"type": "domain"}], [{"type": "xy"}]])
+    for trace in pie.data:
+        fig.add_trace(trace, row=1, col=1)
+    for trace in bar.data:
+        fig.add_trace(trace, row=2, col=1)
+    fig.update_layout(title=title, height=1100, width=850, showlegend=False)
+    fig.write_image(path, format="pdf")
+
+
+def render_report(task: dict) -> dict:
+    """Worker: render one department x month report in every requested format"""
+    started = time.perf_counter()
+    kind = task["kind"]
+    title = f"{KINDS[kind]['title']} {task['department']} - Tháng {task['month']}"
+    errors = {}
+    for fmt, path in task["outputs"].items():
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # File tạm giữ đuôi gốc (ExcelWriter chọn engine theo đuôi file)
+        base, extension = os.path.splitext(path)
+        tmp_path = f"{base}.tmp{extension}"
+        try:
+            if fmt == "html":
+                write_html(tmp_path, title, task["cube"], kind)
+            elif fmt == "xlsx":
+                write_xlsx(tmp_path, title, task["cube"], task["rows"], kind)
+            elif fmt == "pdf":
+                write_pdf(tmp_path, title, task["cube"], kind)
+            os.replace(tmp_path, path)
+        except Exception as e:
+            errors[fmt] = f"{type(e).__name__}: {e}"
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+    return {"key": task["key"], "fingerprint": task["fingerprint"], "errors": errors,
+            "seconds": time.perf_counter() - started}
+
+
+def _load_manifest(out_dir: str) -> dict:
+    try:
+        with open(os.path.join(out_dir, MANIFEST), encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _save_manifest(out_dir: str, manifest: dict) -> None:
+    path = os.path.join(out_dir, MANIFEST)
+    with open(f"{path}.tmp", "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=1, sort_keys=True)
+    os.replace(f"{path}.tmp", path)
+
+
+def plan(df: pd.DataFrame, out_dir: str, formats: list, departments: list = None, months: list = None,
+         force: bool = False, kind: str = "expense") -> tuple:
+    """Tasks of the reports to (re)build, and the number of up-to-date ones
+
+    Args:
+        kind (str): "expense" (transactions) or "inventory" (stock balance, see inventory_frame)
+
+    Returns:
+        tuple: (tasks, skipped)
+    """
+    cube = build_cube(df, KINDS[kind]["dims"])
+    departments = departments or sorted(cube["phong_ban"].dropna().unique().tolist())
+    months = months or sorted(int(month) for month in cube["Month"].dropna().unique())
+    manifest = _load_manifest(out_dir)
+    detail_columns = [column for column in KINDS[kind]["detail"] if column in df.columns]
+
+    # Nhóm dòng chi tiết một lần theo (phòng ban, tháng) thay vì lọc lại cho từng báo cáo
+    row_groups = df.groupby(["phong_ban", "Month"], observed=True, sort=False).indices
+
+    tasks, skipped = [], 0
+    for department in departments:
+        for month in months:
+            cube_slice = slice_cube(cube, phong_ban=[department], Month=[month])
+            if cube_slice.empty:
+                continue
+            rows = df.iloc[row_groups.get((department, month), [])][detail_columns].reset_index(drop=True)
+            key = f"{department}/{month:02d}" if kind == "expense" else f"ton_kho/{department}/{month:02d}"
+            digest = fingerprint(cube_slice.reset_index(drop=True), rows)
+            outputs = {fmt: report_path(out_dir, department, month, fmt, kind) for fmt in formats}
+            entry = manifest.get(key, {})
+            if not force and all(entry.get(fmt) == digest and os.path.exists(path) for fmt, path in outputs.items()):
+                skipped += 1
+                continue
+            tasks.append({"key": key, "kind": kind, "department": department, "month": month, "fingerprint": digest,
+                          "cube": cube_slice, "rows": rows, "outputs": outputs})
+    return tasks, skipped
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--kinds", nargs="+", choices=list(KINDS), default=list(KINDS))
+    parser.add_argument("--source", default="test_file.csv", help="transactions file (same as the Expense page)")
+    parser.add_argument("--inventory-source", default="inventory_balance_list.xlsx",
+                        help="stock balance export (same as the Inventory page)")
+    parser.add_argument("--out", default="reports")
+    parser.add_argument("--formats", nargs="+", choices=FORMATS, default=["html", "xlsx"])
+    parser.add_argument("--departments", nargs="+", help="phong_ban values, all by default")
+    parser.add_argument("--months", nargs="+", type=int, help="month numbers, all by default")
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--force", action="store_true", help="rebuild even if the inputs are unchanged")
+    args = parser.parse_args()
+
+    if "pdf" in args.formats:
+        try:
+            import kaleido  # noqa: F401
+        except ImportError:
+            sys.exit("PDF output needs the kaleido package (pip install kaleido)")
+
+    started = time.perf_counter()
+    tasks, skipped = [], 0
+    for kind in args.kinds:
+        if kind == "expense":
+            df = load_frame(args.source, schema=TRANSACTION_SCHEMA)
+        else:
+            df = inventory_frame(load_frame(args.inventory_source, schema=TRANSACTION_SCHEMA))
+        kind_tasks, kind_skipped = plan(df, args.out, args.formats, args.departments, args.months, args.force, kind)
+        print(f"{kind}: {len(kind_tasks)} reports to build, {kind_skipped} unchanged")
+        tasks += kind_tasks
+        skipped += kind_skipped
+
+    manifest = _load_manifest(args.out)
+    failures = 0
+    if tasks:
+        with ProcessPoolExecutor(max_workers=max(args.workers or 1, 1)) as pool:
+            futures = [pool.submit(render_report, task) for task in tasks]
+            for future in as_completed(futures):
+                result = future.result()
+                entry = manifest.setdefault(result["key"], {})
+                for fmt in args.formats:
+                    if fmt in result["errors"]:
+                        entry.pop(fmt, None)
+                    else:
+                        entry[fmt] = result["fingerprint"]
+                if result["errors"]:
+                    failures += 1
+                    print(f"  {result['key']}: {result['errors']}")
+        _save_manifest(args.out, manifest)
+
+    print(f"done in {time.perf_counter() - started:,.1f}s ({failures} failed)")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,276 @@
+"""Isolated, time-limited execution of generated matplotlib snippets
+
+Snippets run in a pool of worker processes, never in the Streamlit server
+process:
+
+* each run gets a fresh pyplot state in its own process, so concurrent
+  sessions cannot draw on each other's figures;
+* a wall-clock timer (SIGALRM) and a CPU-time limit (RLIMIT_CPU) stop slow
+  or endless snippets, and a worker that still does not answer is killed
+  together with the pool, which is then recreated;
+* the address space of a worker is capped (RLIMIT_AS), so a snippet
+  allocating too much fails with MemoryError instead of swapping the host;
+* the DataFrame is published once per data version as an Arrow IPC stream
+  in shared memory; workers map it and keep the decoded frame for later
+  snippets on the same version (falls back to pickling without pyarrow);
+* rendered images are cached on (code hash, data version, format, dpi).
+
+Limits can be tuned with PLOT_WORKERS, PLOT_TIMEOUT_S, PLOT_CPU_S and
+PLOT_MEMORY_MB (0 disables the memory cap).
+"""
+import atexit
+import hashlib
+import io
+import multiprocessing
+import os
+import signal
+import threading
+import time
+from collections import OrderedDict
+from multiprocessing import shared_memory
+from typing import NamedTuple
+
+import pandas as pd
+
+from src.data.cache import SizedLRUCache
+
+try:
+    import pyarrow as pa
+except ImportError:  # không có pyarrow thì gửi DataFrame bằng pickle
+    pa = None
+
+try:
+    import resource
+except ImportError:  # Windows: chỉ còn giới hạn thời gian phía tiến trình chính
+    resource = None
+
+WORKERS = int(os.environ.get("PLOT_WORKERS", "2"))
+TIMEOUT_S = float(os.environ.get("PLOT_TIMEOUT_S", "10"))
+CPU_S = int(os.environ.get("PLOT_CPU_S", "20"))
+MEMORY_MB = int(os.environ.get("PLOT_MEMORY_MB", "2048"))
+FORMATS = ("png", "svg")
+
+# Thời gian chờ thêm trước khi coi worker là bị treo (tiến trình chính)
+_GRACE_S = 2.0
+# Số phiên bản dữ liệu giữ trong shared memory cùng lúc
+_KEEP_SEGMENTS = 4
+
+_images = SizedLRUCache(128 * 1024 * 1024, sizeof=lambda result: len(result.data or b"") + 256)
+
+
+class PlotResult(NamedTuple):
+    data: bytes        # ảnh đã render, None nếu lỗi
+    format: str        # "png" hoặc "svg"
+    error: str         # None nếu thành công
+    elapsed: float     # giây, tính cả thời gian chờ worker
+    cached: bool = False
+
+
+def frame_version(df: pd.DataFrame) -> str:
+    """Content hash of a frame, for callers without a dataset version at hand"""
+    hasher = hashlib.sha256()
+    hasher.update(repr((list(df.columns), [str(dtype) for dtype in df.dtypes])).encode("utf-8"))
+    hasher.update(pd.util.hash_pandas_object(df, index=True).to_numpy().tobytes())
+    return hasher.hexdigest()
+
+
+# version -> (DataFrame, SharedMemory or None), chỉ giữ vài phiên bản gần nhất
+_worker_frames = OrderedDict()
+
+
+class _SnippetTimeout(Exception):
+    pass
+
+
+def _on_timeout(signum, frame):
+    raise _SnippetTimeout()
+
+
+def _init_worker(memory_mb: int) -> None:
+    import matplotlib
+    matplotlib.use("Agg")
+
+    if resource is not None and memory_mb > 0:
+        limit = memory_mb * 1024 * 1024
+        resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+    if hasattr(signal, "SIGALRM"):
+        signal.signal(signal.SIGALRM, _on_timeout)
+    if hasattr(signal, "SIGXCPU"):
+        signal.signal(signal.SIGXCPU, _on_timeout)
+
+
+def _attach_frame(version: str, payload) -> pd.DataFrame:
+    if version in _worker_frames:
+        _worker_frames.move_to_end(version)
+        return _worker_frames[version][0]
+
+    segment = None
+    if isinstance(payload, pd.DataFrame):
+        df = payload
+    else:
+        name, size = payload
+        # Worker dùng chung resource tracker với tiến trình chính, nơi sở hữu và unlink vùng nhớ
+        segment = shared_memory.SharedMemory(name=name)
+        df = pa.ipc.open_stream(pa.py_buffer(segment.buf).slice(0, size)).read_all().to_pandas()
+
+    _worker_frames[version] = (df, segment)
+    while len(_worker_frames) > 2:
+        _, (_, old_segment) = _worker_frames.popitem(last=False)
+        if old_segment is not None:
+            try:
+                old_segment.close()
+            except BufferError:  # pandas vẫn tham chiếu vùng nhớ: để GC đóng sau
+                pass
+    return df
+
+
+def _run_snippet(code: str, version: str, payload, fmt: str, dpi: int, timeout: float) -> tuple:
+    """Execute one snippet in the worker and return (image bytes, error)"""
+    import matplotlib.pyplot as plt
+
+    use_alarm = hasattr(signal, "SIGALRM")
+    if use_alarm:
+        signal.setitimer(signal.ITIMER_REAL, timeout)
+    if resource is not None:
+        used = resource.getrusage(resource.RUSAGE_SELF)
+        soft = int(used.ru_utime + used.ru_stime) + CPU_S
+        _, hard = resource.getrlimit(resource.RLIMIT_CPU)
+        resource.setrlimit(resource.RLIMIT_CPU, (soft if hard == resource.RLIM_INFINITY else min(soft, hard), hard))
+
+    try:
+        df = _attach_frame(version, payload)
+        plt.close("all")
+        fig = plt.figure()
+        local_vars = {"plt": plt, "df": df, "fig": fig, "pd": pd}
+        exec(compile(code, "<snippet>", "exec"), local_vars, local_vars)
+
+        buffer = io.BytesIO()
+        plt.gcf().savefig(buffer, format=fmt, dpi=dpi, bbox_inches="tight")
+        return buffer.getvalue(), None
+    except _SnippetTimeout:
+        return None, f"Snippet exceeded the time limit ({timeout:g}s)"
+    except MemoryError:
+        return None, "Snippet exceeded the memory limit"
+    except Exception as e:
+        return None, f"{type(e).__name__}: {e}"
+    finally:
+        if use_alarm:
+            signal.setitimer(signal.ITIMER_REAL, 0)
+        plt.close("all")
+
+
+_pool = None
+_pool_lock = threading.Lock()
+_segments = OrderedDict()  # version -> (SharedMemory, size)
+_segments_lock = threading.Lock()
+
+
+def _get_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # spawn: không fork tiến trình server đang chạy nhiều luồng
+            context = multiprocessing.get_context("spawn")
+            _pool = context.Pool(WORKERS, initializer=_init_worker, initargs=(MEMORY_MB,))
+        return _pool
+
+
+def _reset_pool(pool) -> None:
+    """Kill a pool with a stuck worker; the next call starts a fresh one"""
+    global _pool
+    with _pool_lock:
+        if _pool is pool:
+            _pool = None
+    pool.terminate()
+
+
+def _publish(df: pd.DataFrame, version: str):
+    """Payload that lets a worker rebuild df: shared memory (name, size) or the frame"""
+    if pa is None:
+        return df
+
+    with _segments_lock:
+        if version in _segments:
+            _segments.move_to_end(version)
+            segment, size = _segments[version]
+            return segment.name, size
+
+        table = pa.Table.from_pandas(df, preserve_index=True)
+        sink = pa.MockOutputStream()
+        with pa.ipc.new_stream(sink, table.schema) as writer:
+            writer.write_table(table)
+        size = sink.size()
+
+        # Ghi thẳng luồng Arrow vào shared memory, không tạo bản sao trung gian
+        segment = shared_memory.SharedMemory(create=True, size=max(size, 1))
+        with pa.ipc.new_stream(pa.FixedSizeBufferWriter(pa.py_buffer(segment.buf)), table.schema) as writer:
+            writer.write_table(table)
+
+        _segments[version] = (segment, size)
+        while len(_segments) > _KEEP_SEGMENTS:
+            _, (old, _) = _segments.popitem(last=False)
+            old.close()
+            old.unlink()
+        return segment.name, size
+
+
+def render(code: str, df: pd.DataFrame, data_version: str = None, fmt: str = "png",
+           dpi: int = 100, timeout: float = TIMEOUT_S) -> PlotResult:
+    """Render a matplotlib snippet against df in an isolated worker
+
+    The snippet sees `plt`, `pd`, `df` and a fresh `fig`; whatever is the
+    current figure at the end is rendered.
+
+    Args:
+        code (str): python code using plt
+        df (pd.DataFrame): data exposed to the snippet as `df` (read-only copy)
+        data_version (str, optional): version of df, see frame_version (computed if None)
+        fmt (str): "png" or "svg"
+        dpi (int): resolution for png
+        timeout (float): wall-clock limit in seconds
+
+    Returns:
+        PlotResult: image bytes or error message
+    """
+    if fmt not in FORMATS:
+        raise ValueError(f"Unsupported format {fmt!r}, expected one of {FORMATS}")
+
+    started = time.perf_counter()
+    version = data_version or frame_version(df)
+    key = (hashlib.sha256(code.encode("utf-8")).hexdigest(), version, fmt, dpi)
+    cached = _images.get(key)
+    if cached is not None:
+        return cached._replace(elapsed=time.perf_counter() - started, cached=True)
+
+    pool = _get_pool()
+    pending = pool.apply_async(_run_snippet, (code, version, _publish(df, version), fmt, dpi, timeout))
+    try:
+        data, error = pending.get(timeout + _GRACE_S)
+    except multiprocessing.TimeoutError:
+        # Mã chạy trong C không nhận tín hiệu: hủy cả pool
+        _reset_pool(pool)
+        data, error = None, f"Snippet exceeded the time limit ({timeout:g}s), worker restarted"
+
+    result = PlotResult(data, fmt, error, time.perf_counter() - started)
+    if error is None:
+        _images.put(key, result)
+    return result
+
+
+def cache_stats() -> dict:
+    return _images.stats()
+
+
+@atexit.register
+def shutdown() -> None:
+    """Stop the workers and release the shared memory segments"""
+    global _pool
+    with _pool_lock:
+        pool, _pool = _pool, None
+    if pool is not None:
+        pool.terminate()
+    with _segments_lock:
+        while _segments:
+            _, (segment, _) = _segments.popitem()
+            segment.close()
+            segment.unlink()
@@ -1,26 +1,27 @@
-import matplotlib.pyplot as plt
 import pandas as pd
 import streamlit as st
 
+from src.sandbox.engine import render
 
-def execute_plt_code(code: str, df: pd.DataFrame):
+
+def execute_plt_code(code: str, df: pd.DataFrame, data_version: str = None, fmt: str = "png"):
     """Execute the passing code to plot figure
 
+    The code runs in an isolated worker process with its own figure and
+    time/memory limits (see src.sandbox.engine); identical code on the same
+    data version is served from the image cache.
+
     Args:
         code (str): action string (containing plt code)
         df (pd.DataFrame): our dataframe
+        data_version (str, optional): version of df used in the cache key
+        fmt (str): "png" or "svg"
 
     Returns:
-        _type_: plt figure
+        bytes: rendered image (for st.image), or None on error
     """
-
-    try:
-        local_vars = {"plt": plt, "df": df}
-        compiled_code = compile(code, "<string>", "exec")
-        exec(compiled_code, globals(), local_vars)
-
-        return plt.gcf()
-
-    except Exception as e:
-        st.error(f"Error excuting plt code: {e}")
-        return None
\ No newline at end of file
+    result = render(code, df, data_version=data_version, fmt=fmt)
+    if result.error is not None:
+        st.error(f"Error excuting plt code: {result.error}")
+        return None
+    return result.data
@@ -0,0 +1,134 @@
+"""Outbound aggregations shared by the dashboard and analysis tabs
+
+build_outbound_cube makes the single grouped pass over outbound_df, on
+(month, commodity, itemNumber). Monthly totals, the commodity breakdown and
+the top items are small roll-ups of that cube, memoized per dataset version
+and filter.
+"""
+import pandas as pd
+
+from src.data.cache import SizedLRUCache
+
+CUBE_KEYS = ["month", "commodity", "itemNumber"]
+
+
+def build_outbound_cube(outbound_df: pd.DataFrame) -> pd.DataFrame:
+    """One grouped pass over the outbound rows
+
+    Returns:
+        pd.DataFrame: month, commodity, itemNumber, quantity, total (sums)
+            and item, uom, price (first value)
+    """
+    if outbound_df.empty:
+        return pd.DataFrame(columns=CUBE_KEYS + ["quantity", "total", "item", "uom", "price"])
+    return outbound_df.groupby(CUBE_KEYS, sort=False, dropna=False).agg(
+        quantity=("quantity", "sum"),
+        total=("total", "sum"),
+        item=("item", "first"),
+        uom=("uom", "first"),
+        price=("price", "first"),
+    ).reset_index()
+
+
+def _for_month(cube: pd.DataFrame, month=None) -> pd.DataFrame:
+    return cube[cube["month"] == month] if month else cube
+
+
+def monthly_usage(cube: pd.DataFrame, months) -> pd.DataFrame:
+    """Outbound quantity/value per month, 0 for months without outbound
+
+    Args:
+        cube (pd.DataFrame): see build_outbound_cube
+        months: every month to report (stock and outbound months)
+
+    Returns:
+        pd.DataFrame: month, totalItems, totalValue sorted by month
+    """
+    months = pd.to_numeric(pd.Series(pd.unique(pd.Series(months))), errors="coerce").dropna().astype(int)
+    months = months.sort_values()
+    totals = cube.groupby("month")[["quantity", "total"]].sum().reindex(months, fill_value=0)
+    return pd.DataFrame({
+        "month": months.to_numpy(),
+        "totalItems": totals["quantity"].to_numpy(),
+        "totalValue": totals["total"].to_numpy(),
+    })
+
+
+def commodity_breakdown(cube: pd.DataFrame, month=None) -> pd.DataFrame:
+    """Quantity, value and share of value per commodity, largest first
+
+    Returns:
+        pd.DataFrame: name, count, value, percentage
+    """
+    cells = _for_month(cube, month)
+    if cells.empty:
+        return pd.DataFrame()
+
+    total_value = cells["total"].sum()
+    breakdown = cells.groupby("commodity", sort=False)[["quantity", "total"]].sum().reset_index()
+    breakdown.columns = ["name", "count", "value"]
+    breakdown["percentage"] = breakdown["value"] / total_value * 100 if total_value > 0 else 0
+    return breakdown.sort_values(by="value", ascending=False)
+
+
+def top_items(cube: pd.DataFrame, limit: int = 10, month=None) -> pd.DataFrame:
+    """Items with the largest outbound quantity
+
+    Returns:
+        pd.DataFrame: itemNumber, item, quantity, total, commodity, uom, price
+    """
+    cells = _for_month(cube, month)
+    if cells.empty:
+        return pd.DataFrame()
+
+    grouped = cells.groupby("itemNumber").agg({
+        "item": "first",
+        "quantity": "sum",
+        "total": "sum",
+        "commodity": "first",
+        "uom": "first",
+        "price": "first",
+    }).reset_index()
+    return grouped.sort_values(by="quantity", ascending=False).head(limit)
+
+
+_results = SizedLRUCache(32 * 1024 * 1024)
+
+
+def _memo(key: tuple, compute):
+    result = _results.get(key)
+    if result is None:
+        result = compute()
+        _results.put(key, result)
+    return result
+
+
+def get_outbound_cube(outbound_frame) -> pd.DataFrame:
+    """build_outbound_cube of a shared frame, once per dataset version"""
+    return _memo(("cube", outbound_frame.digest), lambda: build_outbound_cube(outbound_frame.df))
+
+
+def get_monthly_usage(inventory_frame, outbound_frame) -> pd.DataFrame:
+    if inventory_frame.df.empty or outbound_frame.df.empty:
+        return pd.DataFrame()
+    key = ("monthly", inventory_frame.digest, outbound_frame.digest)
+
+    def compute():
+        months = pd.concat([inventory_frame.df["month"], outbound_frame.df["month"]])
+        return monthly_usage(get_outbound_cube(outbound_frame), months)
+
+    return _memo(key, compute)
+
+
+def get_commodity_breakdown(outbound_frame, month=None) -> pd.DataFrame:
+    if outbound_frame.df.empty:
+        return pd.DataFrame()
+    key = ("commodities", outbound_frame.digest, month)
+    return _memo(key, lambda: commodity_breakdown(get_outbound_cube(outbound_frame), month))
+
+
+def get_top_items(outbound_frame, limit: int = 10, month=None) -> pd.DataFrame:
+    if outbound_frame.df.empty:
+        return pd.DataFrame()
+    key = ("top_items", outbound_frame.digest, limit, month)
+    return _memo(key, lambda: top_items(get_outbound_cube(outbound_frame), limit, month))
@@ -0,0 +1,126 @@
+import pandas as pd
+
+KEYS = ["itemNumber", "month"]
+INFO_COLUMNS = ["item", "uom", "commodity"]
+RESULT_COLUMNS = [
+    "itemNumber", "item", "month", "inStock", "outbound",
+    "balance", "uom", "commodity", "averagePrice",
+]
+
+
+def apply_filters(inventory_df: pd.DataFrame, outbound_df: pd.DataFrame, filters=None,
+                  inventory_columns: list = None, outbound_columns: list = None):
+    """Apply the sidebar filters of the inventory page to both frames
+
+    Without filters the (shared) frames are returned as they are. With
+    filters only the requested columns of the matching rows are copied.
+
+    Args:
+        inventory_df (pd.DataFrame): stock rows
+        outbound_df (pd.DataFrame): outbound rows
+        filters (dict, optional): month / commodity / phongBan / account
+        inventory_columns (list, optional): columns to keep from inventory_df
+        outbound_columns (list, optional): columns to keep from outbound_df
+
+    Returns:
+        tuple: (filtered inventory, filtered outbound)
+    """
+    if not filters:
+        return inventory_df, outbound_df
+
+    inventory_mask = pd.Series(True, index=inventory_df.index)
+    outbound_mask = pd.Series(True, index=outbound_df.index)
+
+    if filters.get("month"):
+        inventory_mask &= inventory_df["month"] == filters["month"]
+        outbound_mask &= outbound_df["month"] == filters["month"]
+    if filters.get("commodity"):
+        inventory_mask &= inventory_df["commodity"] == filters["commodity"]
+        outbound_mask &= outbound_df["commodity"] == filters["commodity"]
+    if filters.get("phongBan"):
+        inventory_mask &= inventory_df["phongBan"] == filters["phongBan"]
+    if filters.get("account"):
+        outbound_mask &= outbound_df["account"] == filters["account"]
+
+    return (
+        inventory_df.loc[inventory_mask, inventory_columns or slice(None)],
+        outbound_df.loc[outbound_mask, outbound_columns or slice(None)],
+    )
+
+
+def _drop_missing_keys(df: pd.DataFrame) -> pd.DataFrame:
+    return df.dropna(subset=KEYS) if df[KEYS].isna().any(axis=None) else df
+
+
+def _first_rows(df: pd.DataFrame, columns: list) -> pd.DataFrame:
+    # drop_duplicates keeps the literal first row (NaN included), like iloc[0]
+    return df.drop_duplicates(subset=KEYS)[KEYS + columns].set_index(KEYS)
+
+
+def combine_inventory(inventory_df: pd.DataFrame, outbound_df: pd.DataFrame, filters=None) -> pd.DataFrame:
+    """Combine stock and outbound rows into one row per (itemNumber, month)
+
+    One groupby per side and a single outer merge. Rows come out in the
+    order the item (then the month) is first seen in stock, then outbound.
+
+    Args:
+        inventory_df (pd.DataFrame): stock rows
+        outbound_df (pd.DataFrame): outbound rows
+        filters (dict, optional): see apply_filters
+
+    Returns:
+        pd.DataFrame: itemNumber, item, month, inStock, outbound, balance,
+            uom, commodity, averagePrice
+    """
+    if inventory_df.empty or outbound_df.empty:
+        return pd.DataFrame()
+
+    inventory, outbound = apply_filters(
+        inventory_df, outbound_df, filters,
+        inventory_columns=KEYS + ["quantity", "total"] + INFO_COLUMNS,
+        outbound_columns=KEYS + ["quantity", "price"] + INFO_COLUMNS,
+    )
+    inventory = _drop_missing_keys(inventory)
+    outbound = _drop_missing_keys(outbound)
+
+    keys = pd.concat([inventory[KEYS], outbound[KEYS]], ignore_index=True)
+    if keys.empty:
+        return pd.DataFrame()
+
+    # Thứ tự xuất hiện: theo sản phẩm trước, rồi theo tháng trong từng sản phẩm
+    order = keys.drop_duplicates().reset_index(drop=True)
+    item_rank = order["itemNumber"].drop_duplicates()
+    order["_item_rank"] = order["itemNumber"].map(pd.Series(range(len(item_rank)), index=item_rank.values))
+    order = order.sort_values("_item_rank", kind="stable").drop(columns="_item_rank")
+
+    inventory_sums = inventory.groupby(KEYS, sort=False).agg(
+        inStock=("quantity", "sum"),
+        inventoryTotal=("total", "sum"),
+    )
+    outbound_sums = outbound.groupby(KEYS, sort=False).agg(outbound=("quantity", "sum"))
+    inventory_info = _first_rows(inventory, INFO_COLUMNS)
+    outbound_info = _first_rows(outbound, INFO_COLUMNS + ["price"])
+
+    combined = order.set_index(KEYS)
+    combined = combined.join(inventory_sums).join(outbound_sums)
+
+    has_inventory = combined["inStock"].notna()
+    combined["inStock"] = combined["inStock"].fillna(0)
+    combined["outbound"] = combined["outbound"].fillna(0)
+    for column, source in (("inStock", inventory), ("outbound", outbound)):
+        if pd.api.types.is_integer_dtype(source["quantity"]):
+            combined[column] = combined[column].astype("int64")
+    combined["balance"] = combined["inStock"] - combined["outbound"]
+
+    # Thông tin sản phẩm lấy từ tồn kho, nếu không có thì lấy từ xuất kho
+    info = inventory_info.reindex(combined.index)
+    fallback = outbound_info.reindex(combined.index)
+    for column in INFO_COLUMNS:
+        combined[column] = info[column].where(has_inventory, fallback[column])
+
+    # Giá trung bình: tổng giá trị / tổng số lượng tồn, nếu không có thì giá xuất đầu tiên
+    quantity = combined["inStock"].where(combined["inStock"] > 0)
+    weighted = (combined["inventoryTotal"] / quantity).fillna(0)
+    combined["averagePrice"] = weighted.where(has_inventory, fallback["price"])
+
+    return combined.reset_index()[RESULT_COLUMNS].reset_index(drop=True)
@@ -0,0 +1,223 @@
+"""Per-item demand forecast, reorder points and days of cover
+
+Monthly outbound quantities are laid out as one (items x months) matrix
+from the outbound cube (see src.warehouse.aggregations), and every model
+runs on the whole matrix at once: a moving average is a slice mean, simple
+exponential smoothing is one pass over the months for every item and every
+candidate alpha together, and each item keeps the alpha with the lowest
+one-step-ahead error. Nothing loops over items.
+
+The current balance of an item is its stock minus its outbound in the latest
+month of the data (the "Còn lại" column of the stock page); items without
+stock that month have 0. Without any stock data the balance is unknown (NaN)
+and the item is reported as such, not as out of stock.
+
+An item is at risk when it is out of stock, below its reorder point, or
+when its stock will not last until the delivery of the order placed at the
+next review (days of cover < review period + lead time).
+"""
+from statistics import NormalDist
+
+import numpy as np
+import pandas as pd
+
+from src.data.cache import SizedLRUCache
+from src.warehouse.aggregations import get_outbound_cube
+
+METHODS = ["ses", "ma"]
+ALPHAS = np.array([0.1, 0.2, 0.3, 0.5, 0.7, 0.9])
+DAYS_PER_MONTH = 30
+REVIEW_DAYS = 30  # chu kỳ xem lại và đặt hàng
+FORECAST_COLUMNS = [
+    "itemNumber", "item", "commodity", "uom", "balance", "forecast", "daily_demand", "sigma",
+    "alpha", "reorder_point", "days_of_cover", "status", "at_risk",
+]
+
+# Trạng thái theo thứ tự mức độ nghiêm trọng
+OUT_OF_STOCK = "Hết hàng"
+BELOW_REORDER = "Dưới điểm đặt hàng"
+LOW_COVER = "Không đủ đến lô tiếp theo"
+OK = "Đủ hàng"
+UNKNOWN = "Chưa có dữ liệu tồn"
+
+
+def demand_matrix(cube: pd.DataFrame, months) -> tuple:
+    """Outbound quantity per (item, month), 0 for months without outbound
+
+    Args:
+        cube (pd.DataFrame): see build_outbound_cube
+        months: ordered months of the columns
+
+    Returns:
+        tuple: (item numbers, demand array of shape (items, months))
+    """
+    months = pd.Index(months)
+    cells = cube.dropna(subset=["itemNumber", "month"])
+    item_codes, items = pd.factorize(cells["itemNumber"])
+    month_codes = months.get_indexer(cells["month"])
+    inside = month_codes >= 0
+
+    flat = item_codes[inside] * len(months) + month_codes[inside]
+    quantities = pd.to_numeric(cells["quantity"], errors="coerce").fillna(0).to_numpy(dtype=float)[inside]
+    demand = np.bincount(flat, weights=quantities, minlength=len(items) * len(months))
+    return pd.Index(items), demand.reshape(len(items), len(months))
+
+
+def moving_average(demand: np.ndarray, window: int = 3) -> tuple:
+    """Mean of the last window months, and the RMSE of the same model one month ahead
+
+    Returns:
+        tuple: (forecast, sigma) arrays, one value per item
+    """
+    months = demand.shape[1]
+    window = max(1, min(window, months))
+    forecast = demand[:, -window:].mean(axis=1)
+
+    # Dự báo trượt: trung bình window tháng trước cho mỗi tháng sau đó
+    cumulative = np.concatenate([np.zeros((len(demand), 1)), demand.cumsum(axis=1)], axis=1)
+    if months > window:
+        fitted = (cumulative[:, window:months] - cumulative[:, :months - window]) / window
+        errors = demand[:, window:] - fitted
+        sigma = np.sqrt((errors ** 2).mean(axis=1))
+    else:
+        sigma = demand.std(axis=1)
+    return forecast, sigma
+
+
+def exponential_smoothing(demand: np.ndarray, alphas: np.ndarray = ALPHAS) -> tuple:
+    """Simple exponential smoothing with the best alpha of each item
+
+    Every item is smoothed with every alpha in one pass over the months
+    (arrays of shape (items, alphas)); the alpha with the lowest one-step-ahead
+    squared error is kept per item.
+
+    Returns:
+        tuple: (forecast, sigma, alpha) arrays, one value per item
+    """
+    items, months = demand.shape
+    alphas = np.asarray(alphas, dtype=float)
+    if months == 0:
+        zeros = np.zeros(items)
+        return zeros, zeros, np.full(items, alphas[0])
+
+    level = np.repeat(demand[:, :1], len(alphas), axis=1)
+    squared_errors = np.zeros((items, len(alphas)))
+    for month in range(1, months):
+        actual = demand[:, month:month + 1]
+        squared_errors += (actual - level) ** 2
+        level += alphas * (actual - level)
+
+    best = squared_errors.argmin(axis=1)
+    rows = np.arange(items)
+    sigma = np.sqrt(squared_errors[rows, best] / max(months - 1, 1))
+    return level[rows, best], sigma, alphas[best]
+
+
+def reorder_points(daily_demand: np.ndarray, sigma_month: np.ndarray, lead_time_days: float,
+                   service_level: float) -> np.ndarray:
+    """Demand over the lead time plus safety stock z * sigma * sqrt(lead time)"""
+    z = NormalDist().inv_cdf(service_level)
+    sigma_daily = sigma_month / np.sqrt(DAYS_PER_MONTH)
+    return daily_demand * lead_time_days + z * sigma_daily * np.sqrt(lead_time_days)
+
+
+def current_balance(inventory_df: pd.DataFrame, cube: pd.DataFrame, items: pd.Index, month) -> np.ndarray:
+    """Stock minus outbound of each item in the given month, 0 without stock"""
+    stock = inventory_df.loc[inventory_df["month"] == month].groupby("itemNumber")["quantity"].sum()
+    outbound = cube.loc[cube["month"] == month].groupby("itemNumber")["quantity"].sum()
+    return (stock.reindex(items, fill_value=0) - outbound.reindex(items, fill_value=0)).to_numpy(dtype=float)
+
+
+def forecast_items(inventory_df: pd.DataFrame, cube: pd.DataFrame, method: str = "ses", window: int = 3,
+                   lead_time_days: float = 30, service_level: float = 0.95,
+                   review_days: float = REVIEW_DAYS) -> pd.DataFrame:
+    """Forecast next month's demand of every item and compare it with its balance
+
+    Args:
+        inventory_df (pd.DataFrame): stock rows
+        cube (pd.DataFrame): outbound cube, see build_outbound_cube
+        method (str): "ses" (exponential smoothing) or "ma" (moving average)
+        window (int): months averaged by the moving average
+        lead_time_days (float): days between ordering and receiving
+        service_level (float): probability of not running out during the lead time
+        review_days (float): days between two order reviews
+
+    Returns:
+        pd.DataFrame: FORECAST_COLUMNS, items at risk first, then by days of cover
+    """
+    if method not in METHODS:
+        raise ValueError(f"Unknown method {method!r}, expected one of {METHODS}")
+    if cube.empty:
+        return pd.DataFrame(columns=FORECAST_COLUMNS)
+
+    months = pd.to_numeric(pd.concat([inventory_df.get("month", pd.Series(dtype=float)), cube["month"]]),
+                           errors="coerce").dropna().astype(int)
+    # Chuỗi liên tục từ tháng đầu đến tháng cuối: tháng không xuất kho là 0
+    months = np.arange(months.min(), months.max() + 1)
+    items, demand = demand_matrix(cube.assign(month=pd.to_numeric(cube["month"], errors="coerce")), months)
+
+    if method == "ses":
+        forecast, sigma, alpha = exponential_smoothing(demand)
+    else:
+        forecast, sigma = moving_average(demand, window)
+        alpha = np.full(len(items), np.nan)
+
+    # Không có dữ liệu tồn kho: số dư chưa biết (NaN), không phải 0
+    balance = current_balance(inventory_df, cube, items, months[-1]) if not inventory_df.empty \
+        else np.full(len(items), np.nan)
+    daily_demand = forecast / DAYS_PER_MONTH
+    reorder_point = reorder_points(daily_demand, sigma, lead_time_days, service_level)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        days_of_cover = np.where(daily_demand > 0, np.maximum(balance, 0) / daily_demand, np.inf)
+    days_of_cover[np.isnan(balance)] = np.nan
+
+    status = np.select(
+        [
+            np.isnan(balance),
+            (balance <= 0) & (daily_demand > 0),
+            balance < reorder_point,
+            days_of_cover < lead_time_days + review_days,
+        ],
+        [UNKNOWN, OUT_OF_STOCK, BELOW_REORDER, LOW_COVER],
+        default=OK,
+    )
+    info = cube.drop_duplicates(subset=["itemNumber"]).set_index("itemNumber")[["item", "commodity", "uom"]]
+    result = pd.DataFrame({
+        "itemNumber": items,
+        "balance": balance,
+        "forecast": forecast,
+        "daily_demand": daily_demand,
+        "sigma": sigma,
+        "alpha": alpha,
+        "reorder_point": reorder_point,
+        "days_of_cover": days_of_cover,
+        "status": status,
+        "at_risk": ~np.isin(status, [OK, UNKNOWN]),
+    }).join(info, on="itemNumber")
+    return result.sort_values(["at_risk", "days_of_cover"], ascending=[False, True], ignore_index=True)[FORECAST_COLUMNS]
+
+
+_forecasts = SizedLRUCache(64 * 1024 * 1024)
+
+
+def get_forecast(inventory_frame, outbound_frame, method: str = "ses", window: int = 3,
+                 lead_time_days: float = 30, service_level: float = 0.95,
+                 review_days: float = REVIEW_DAYS) -> pd.DataFrame:
+    """forecast_items over shared frames, computed once per dataset version and parameters
+
+    Args:
+        inventory_frame (FrameHandle): stock frame handle
+        outbound_frame (FrameHandle): outbound frame handle
+
+    Returns:
+        pd.DataFrame: see forecast_items
+    """
+    if outbound_frame.df.empty:
+        return pd.DataFrame(columns=FORECAST_COLUMNS)
+    key = (inventory_frame.digest, outbound_frame.digest, method, window, lead_time_days, service_level, review_days)
+    result = _forecasts.get(key)
+    if result is None:
+        result = forecast_items(inventory_frame.df, get_outbound_cube(outbound_frame), method, window,
+                                lead_time_days, service_level, review_days)
+        _forecasts.put(key, result)
+    return result
@@ -0,0 +1,87 @@
+import pandas as pd
+
+from src.data.cache import SizedLRUCache
+
+KEYS = ["itemNumber", "month"]
+MONTHS = range(1, 13)
+HISTORY_COLUMNS = ["itemNumber", "item", "commodity", "month", "inStock", "outbound", "balance"]
+
+
+def _item_rows(df: pd.DataFrame, items: pd.Index, columns: list) -> pd.DataFrame:
+    if df.empty:
+        return pd.DataFrame(columns=columns)
+    return df.loc[df["itemNumber"].isin(items), columns]
+
+
+def _first_info(df: pd.DataFrame) -> pd.DataFrame:
+    return df.drop_duplicates(subset=["itemNumber"]).set_index("itemNumber")[["item", "commodity"]]
+
+
+def item_history(inventory_df: pd.DataFrame, outbound_df: pd.DataFrame, item_numbers) -> pd.DataFrame:
+    """12-month inStock/outbound/balance series for one or many items
+
+    One isin filter, one groupby per side and a reindex on (item, 1..12):
+    months without movement get 0.
+
+    Args:
+        inventory_df (pd.DataFrame): stock rows
+        outbound_df (pd.DataFrame): outbound rows
+        item_numbers: item numbers, in the order they should come out
+
+    Returns:
+        pd.DataFrame: itemNumber, item, commodity, month, inStock, outbound, balance
+    """
+    items = pd.Index(pd.unique(pd.Series(list(item_numbers), dtype=object)))
+    columns = KEYS + ["quantity", "item", "commodity"]
+    inventory = _item_rows(inventory_df, items, columns)
+    outbound = _item_rows(outbound_df, items, columns)
+
+    full_index = pd.MultiIndex.from_product([items, MONTHS], names=KEYS)
+    history = pd.DataFrame({
+        "inStock": inventory.groupby(KEYS)["quantity"].sum().reindex(full_index, fill_value=0),
+        "outbound": outbound.groupby(KEYS)["quantity"].sum().reindex(full_index, fill_value=0),
+    }, index=full_index).infer_objects()
+    history["balance"] = history["inStock"] - history["outbound"]
+
+    # Tên và danh mục lấy từ tồn kho, nếu không có thì lấy từ xuất kho
+    info = _first_info(inventory).reindex(items)
+    from_outbound = ~items.isin(inventory["itemNumber"])
+    info.loc[from_outbound] = _first_info(outbound).reindex(items[from_outbound]).to_numpy()
+    info = info.fillna("")
+
+    history = history.reset_index().join(info, on="itemNumber")
+    return history[HISTORY_COLUMNS]
+
+
+_histories = SizedLRUCache(64 * 1024 * 1024)
+
+
+def get_item_history(inventory_frame, outbound_frame, item_numbers) -> pd.DataFrame:
+    """item_history over shared frames, cached per item and dataset version
+
+    Items already cached are served as is; the others are computed together
+    in a single item_history call.
+
+    Args:
+        inventory_frame (FrameHandle): stock frame handle
+        outbound_frame (FrameHandle): outbound frame handle
+        item_numbers: item numbers to return
+
+    Returns:
+        pd.DataFrame: see item_history
+    """
+    version = (inventory_frame.digest, outbound_frame.digest)
+    items = list(dict.fromkeys(item_numbers))
+    cached = {item: _histories.get(version + (item,)) for item in items}
+
+    missing = [item for item, history in cached.items() if history is None]
+    if missing:
+        computed = item_history(inventory_frame.df, outbound_frame.df, missing)
+        for item, history in computed.groupby("itemNumber", sort=False):
+            history = history.reset_index(drop=True)
+            _histories.put(version + (item,), history)
+            cached[item] = history
+
+    if not items:
+        return pd.DataFrame(columns=HISTORY_COLUMNS)
+    return pd.concat([cached[item] for item in items], ignore_index=True)
@@ -0,0 +1,126 @@
+"""Chunked CSV ingestion for the stock/outbound uploads of the Test page
+
+The header is checked before any row is parsed. Rows are then read in
+chunks: each chunk gets its types coerced and its months validated, and the
+first bad chunk stops the ingestion with a row-level error report.
+
+The date format of the month column is guessed once, from the first value of
+the first chunk, and used for every chunk: guessing per chunk could read
+later chunks with another day/month order.
+"""
+import os
+
+import pandas as pd
+
+try:
+    from pandas.tseries.api import guess_datetime_format
+except ImportError:  # pandas < 2.2
+    from pandas._libs.tslibs.parsing import guess_datetime_format
+
+INVENTORY_COLUMNS = ['month', 'itemNumber', 'item', 'phongBan', 'quantity', 'uom', 'price', 'total', 'commodity']
+OUTBOUND_COLUMNS = ['month', 'account', 'itemNumber', 'item', 'quantity', 'uom', 'price', 'total', 'currency', 'receiver', 'commodity']
+TEXT_COLUMNS = ['itemNumber', 'item', 'phongBan', 'account', 'uom', 'currency', 'receiver', 'commodity']
+NUMERIC_COLUMNS = ['quantity', 'price', 'total']
+ERROR_COLUMNS = ['row', 'column', 'value', 'error']
+
+CHUNK_SIZE = 50_000
+
+
+def _open(source):
+    """Binary handle, total size in bytes and whether we own the handle"""
+    if isinstance(source, (str, os.PathLike)):
+        return open(source, "rb"), os.path.getsize(source), True
+    source.seek(0, os.SEEK_END)
+    size = source.tell()
+    source.seek(0)
+    return source, size, False
+
+
+def _errors(rows: pd.Series, column: str, values: pd.Series, message: str) -> pd.DataFrame:
+    return pd.DataFrame({
+        'row': rows.index + 2,  # số dòng trong file, dòng 1 là tiêu đề
+        'column': column,
+        'value': values.astype(str),
+        'error': message,
+    }, columns=ERROR_COLUMNS)
+
+
+def _date_format(values: pd.Series):
+    """Date format of the first non-empty value, None if it cannot be guessed"""
+    values = values.dropna()
+    if values.empty:
+        return None
+    return guess_datetime_format(str(values.iloc[0]))
+
+
+def _coerce_chunk(chunk: pd.DataFrame, date_format: str):
+    """Coerce one chunk in place; returns an error report (empty if the chunk is valid)"""
+    # Parse as date with the format of the whole file, extract month, and convert to int
+    dates = pd.to_datetime(chunk['month'], format=date_format, errors='coerce')
+    invalid = dates.isna()
+    if invalid.any():
+        bad = chunk.loc[invalid, 'month']
+        return _errors(bad, 'month', bad, "Không đọc được giá trị tháng")
+
+    chunk['month'] = dates.dt.month.astype(int)
+    out_of_range = ~chunk['month'].between(1, 12)
+    if out_of_range.any():
+        bad = chunk.loc[out_of_range, 'month']
+        return _errors(bad, 'month', bad, "Giá trị tháng phải nằm trong khoảng từ 1 đến 12")
+
+    for column in NUMERIC_COLUMNS:
+        chunk[column] = pd.to_numeric(chunk[column], errors='coerce').fillna(0)
+    return pd.DataFrame(columns=ERROR_COLUMNS)
+
+
+def ingest_csv(source, required_columns: list, chunksize: int = CHUNK_SIZE, progress=None):
+    """Validate and parse a CSV upload chunk by chunk
+
+    Args:
+        source: path or binary file-like object (e.g. a Streamlit UploadedFile)
+        required_columns (list): columns the header must contain
+        chunksize (int): rows per chunk
+        progress (callable, optional): called with the fraction of bytes read
+
+    Returns:
+        tuple: (success, DataFrame or None, message, error report DataFrame)
+    """
+    no_errors = pd.DataFrame(columns=ERROR_COLUMNS)
+    handle, size, owned = _open(source)
+    try:
+        header = pd.read_csv(handle, nrows=0).columns
+        missing_columns = [col for col in required_columns if col not in header]
+        if missing_columns:
+            return False, None, f"Thiếu các cột: {', '.join(missing_columns)}", no_errors
+        handle.seek(0)
+
+        text_columns = {col: str for col in TEXT_COLUMNS if col in header}
+        chunks = []
+        date_format = None
+        with pd.read_csv(handle, chunksize=chunksize, dtype=text_columns) as reader:
+            for number, chunk in enumerate(reader, start=1):
+                if number == 1:
+                    # Một định dạng ngày cho cả file, đoán từ giá trị đầu tiên
+                    date_format = _date_format(chunk['month'])
+                    if date_format is None:
+                        bad = chunk['month'].dropna().head(1)
+                        return False, None, "Không xác định được định dạng ngày của cột month", \
+                            _errors(bad, 'month', bad, "Không đọc được giá trị tháng")
+                errors = _coerce_chunk(chunk, date_format)
+                if not errors.empty:
+                    first, last = chunk.index[0] + 2, chunk.index[-1] + 2
+                    message = f"Khối {number} (dòng {first}-{last}) có {len(errors)} dòng lỗi"
+                    return False, None, message, errors
+                chunks.append(chunk)
+                if progress is not None and size:
+                    progress(min(handle.tell() / size, 1.0))
+
+        df = pd.concat(chunks, ignore_index=True) if chunks else pd.DataFrame(columns=header)
+        if progress is not None:
+            progress(1.0)
+        return True, df, "Phân tích thành công", no_errors
+    except Exception as e:
+        return False, None, f"Lỗi khi phân tích: {str(e)}", no_errors
+    finally:
+        if owned:
+            handle.close()
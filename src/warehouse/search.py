@@ -0,0 +1,132 @@
+"""Accent-insensitive n-gram index over item numbers and item names
+
+The index is built once per dataset version over the distinct items of the
+stock and outbound frames, so a keystroke in the search box costs a few
+posting-list intersections instead of a scan of every row.
+"""
+import heapq
+import unicodedata
+
+import numpy as np
+import pandas as pd
+
+from src.data.cache import SizedLRUCache
+
+NGRAM = 3
+SEPARATOR = "\x1f"  # không xuất hiện trong truy vấn nên n-gram qua ranh giới không bao giờ khớp
+
+# Xếp hạng: khớp mã chính xác, đầu mã, đầu tên, đầu một từ trong tên, còn lại
+EXACT_NUMBER, NUMBER_PREFIX, NAME_PREFIX, WORD_PREFIX, SUBSTRING = range(5)
+
+
+def normalize(text) -> str:
+    """Lowercase and strip Vietnamese accents ("Khí Argon" -> "khi argon")"""
+    text = str(text).lower().replace("đ", "d")
+    decomposed = unicodedata.normalize("NFD", text)
+    return "".join(char for char in decomposed if not unicodedata.combining(char))
+
+
+class ItemIndex:
+    """n-gram (n = 1..NGRAM) postings over "itemNumber SEPARATOR item" texts"""
+
+    def __init__(self, items: pd.DataFrame) -> None:
+        items = items.dropna(subset=["itemNumber"]).drop_duplicates(subset=["itemNumber"])
+        self.item_numbers = items["itemNumber"].astype(str).to_numpy()
+        self.names = items["item"].fillna("").astype(str).to_numpy()
+        self.numbers_norm = [normalize(number) for number in self.item_numbers]
+        self.names_norm = [normalize(name) for name in self.names]
+        self.texts = [f"{number}{SEPARATOR}{name}" for number, name in zip(self.numbers_norm, self.names_norm)]
+
+        postings = {}
+        for doc, text in enumerate(self.texts):
+            grams = {text[i:i + n] for n in range(1, NGRAM + 1) for i in range(len(text) - n + 1)}
+            for gram in grams:
+                postings.setdefault(gram, []).append(doc)
+        self.postings = {gram: np.array(docs, dtype=np.int32) for gram, docs in postings.items()}
+
+    @property
+    def nbytes(self) -> int:
+        text_bytes = sum(len(text) for text in self.texts) * 3
+        return text_bytes + sum(docs.nbytes + 64 for docs in self.postings.values())
+
+    def __len__(self) -> int:
+        return len(self.texts)
+
+    def _candidates(self, query: str) -> np.ndarray:
+        if len(query) <= NGRAM:
+            # Truy vấn ngắn chính là một n-gram: danh sách posting là kết quả đầy đủ
+            return self.postings.get(query, np.empty(0, dtype=np.int32))
+
+        grams = sorted({query[i:i + NGRAM] for i in range(len(query) - NGRAM + 1)},
+                       key=lambda gram: len(self.postings.get(gram, ())))
+        docs = self.postings.get(grams[0], np.empty(0, dtype=np.int32))
+        for gram in grams[1:]:
+            if docs.size == 0:
+                break
+            docs = np.intersect1d(docs, self.postings.get(gram, ()), assume_unique=True)
+        # Các n-gram khớp nhưng chưa chắc liền nhau: kiểm tra lại chuỗi con
+        return np.array([doc for doc in docs if query in self.texts[doc]], dtype=np.int32)
+
+    def _rank(self, doc: int, query: str) -> tuple:
+        number, name = self.numbers_norm[doc], self.names_norm[doc]
+        if number == query:
+            kind = EXACT_NUMBER
+        elif number.startswith(query):
+            kind = NUMBER_PREFIX
+        elif name.startswith(query):
+            kind = NAME_PREFIX
+        elif f" {query}" in name:
+            kind = WORD_PREFIX
+        else:
+            kind = SUBSTRING
+        position = name.find(query)
+        return kind, position if position >= 0 else len(name), len(name), number
+
+    def search(self, query: str, limit: int = 50) -> pd.DataFrame:
+        """Items whose number or name contains query (accent/case-insensitive), best first
+
+        Args:
+            query (str): text typed by the user
+            limit (int): maximum number of results
+
+        Returns:
+            pd.DataFrame: itemNumber, item
+        """
+        query = normalize(query).strip()
+        if not query:
+            return pd.DataFrame(columns=["itemNumber", "item"])
+
+        docs = self._candidates(query)
+        ranked = heapq.nsmallest(limit, docs.tolist(), key=lambda doc: self._rank(doc, query))
+        return pd.DataFrame({
+            "itemNumber": self.item_numbers[ranked],
+            "item": self.names[ranked],
+        })
+
+
+def build_item_index(inventory_df: pd.DataFrame, outbound_df: pd.DataFrame) -> ItemIndex:
+    frames = [df[["itemNumber", "item"]] for df in (inventory_df, outbound_df) if not df.empty]
+    if not frames:
+        return ItemIndex(pd.DataFrame(columns=["itemNumber", "item"]))
+    return ItemIndex(pd.concat(frames, ignore_index=True))
+
+
+_indexes = SizedLRUCache(128 * 1024 * 1024, sizeof=lambda index: index.nbytes)
+
+
+def get_item_index(inventory_frame, outbound_frame) -> ItemIndex:
+    """Index of the items in two shared frames, built once per dataset version
+
+    Args:
+        inventory_frame (FrameHandle): stock frame handle
+        outbound_frame (FrameHandle): outbound frame handle
+
+    Returns:
+        ItemIndex: cached index
+    """
+    key = (inventory_frame.digest, outbound_frame.digest)
+    index = _indexes.get(key)
+    if index is None:
+        index = build_item_index(inventory_frame.df, outbound_frame.df)
+        _indexes.put(key, index)
+    return index
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# Chạy pytest từ thư mục gốc: import được src/ và benchmarks/ như các script
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
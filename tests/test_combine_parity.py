@@ -0,0 +1,100 @@
+"""combine_inventory must return exactly what the original per-item loop returned"""
+import numpy as np
+import pandas as pd
+import pytest
+
+from benchmarks.combine_data import legacy_combine_data
+from src.warehouse.combine import combine_inventory
+
+
+def make_inventory(rows):
+    return pd.DataFrame(rows, columns=['month', 'itemNumber', 'item', 'phongBan', 'quantity', 'uom', 'price',
+                                       'total', 'commodity'])
+
+
+def make_outbound(rows):
+    return pd.DataFrame(rows, columns=['month', 'account', 'itemNumber', 'item', 'quantity', 'uom', 'price',
+                                       'total', 'commodity'])
+
+
+@pytest.fixture
+def inventory():
+    return make_inventory([
+        (1, 'A', 'Item A', 'HCMCHEM', 10, 'each', 100, 1000, 'Chemicals'),
+        (1, 'A', 'Item A', 'HCMPEST', 5, 'each', 120, 600, 'Chemicals'),
+        (2, 'A', 'Item A', 'HCMCHEM', 0, 'each', 100, 0, 'Chemicals'),       # số lượng 0: giá trung bình 0
+        (1, 'B', 'Item B', 'HCMMICR', 3, 'box', 50, 150, 'Glassware'),      # chỉ có tồn kho
+        (np.nan, 'B', 'Item B', 'HCMMICR', 7, 'box', 50, 350, 'Glassware'),  # thiếu tháng
+        (3, 'D', 'Item D', 'HCMPEST', 4, 'kg', 30, 120, 'Chemicals'),
+    ])
+
+
+@pytest.fixture
+def outbound():
+    return make_outbound([
+        (1, 'ACC1', 'A', 'Item A', 4, 'each', 110, 440, 'Chemicals'),
+        (2, 'ACC2', 'A', 'Item A', 2, 'each', 105, 210, 'Chemicals'),
+        (2, 'ACC1', 'C', 'Item C', 6, 'set', 75, 450, 'Services'),         # chỉ có xuất kho
+        (np.nan, 'ACC1', 'C', 'Item C', 1, 'set', 75, 75, 'Services'),       # thiếu tháng
+        (3, 'ACC2', 'D', 'Item D', 1, 'kg', 35, 35, 'Chemicals'),
+        (4, 'ACC2', 'D', 'Item D', 2, 'kg', 35, 70, 'Chemicals'),            # tháng chỉ có xuất kho
+    ])
+
+
+def assert_same(inventory_df, outbound_df, filters=None):
+    result = combine_inventory(inventory_df, outbound_df, filters)
+    expected = legacy_combine_data(inventory_df, outbound_df, filters)
+    if expected.empty:
+        assert result.empty
+    else:
+        pd.testing.assert_frame_equal(result, expected, check_dtype=False)
+    return result
+
+
+def test_no_filters(inventory, outbound):
+    result = assert_same(inventory, outbound)
+    assert set(result['itemNumber']) == {'A', 'B', 'C', 'D'}
+    assert result['month'].notna().all()
+
+
+def test_items_on_one_side_only(inventory, outbound):
+    result = assert_same(inventory, outbound).set_index(['itemNumber', 'month'])
+    assert result.loc[('B', 1), 'outbound'] == 0
+    assert result.loc[('C', 2), 'inStock'] == 0
+    assert result.loc[('C', 2), 'averagePrice'] == 75
+
+
+def test_zero_quantity_average_price(inventory, outbound):
+    result = assert_same(inventory, outbound).set_index(['itemNumber', 'month'])
+    assert result.loc[('A', 2), 'averagePrice'] == 0
+
+
+@pytest.mark.parametrize("filters", [
+    {'month': 1},
+    {'month': 4},
+    {'commodity': 'Chemicals'},
+    {'phongBan': 'HCMPEST'},
+    {'account': 'ACC2'},
+    {'month': 2, 'commodity': 'Chemicals', 'phongBan': 'HCMCHEM', 'account': 'ACC2'},
+    {'commodity': 'Không có'},
+])
+def test_filters(inventory, outbound, filters):
+    assert_same(inventory, outbound, filters)
+
+
+@pytest.mark.parametrize("side", ["inventory", "outbound", "both"])
+def test_empty_frames(inventory, outbound, side):
+    if side in ("inventory", "both"):
+        inventory = inventory.iloc[0:0]
+    if side in ("outbound", "both"):
+        outbound = outbound.iloc[0:0]
+    assert combine_inventory(inventory, outbound).empty
+    assert legacy_combine_data(inventory, outbound).empty
+
+
+def test_random_frames():
+    from benchmarks.combine_data import make_frames
+
+    inventory_df, outbound_df = make_frames(2_000, 50, seed=1)
+    for filters in (None, {'month': 3}, {'commodity': "Chemicals", 'phongBan': "HCMPEST"}):
+        assert_same(inventory_df, outbound_df, filters)
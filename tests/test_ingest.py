@@ -0,0 +1,43 @@
+"""Chunked ingestion must parse months exactly like a whole-file parse"""
+import io
+
+import pandas as pd
+import pytest
+
+from src.warehouse.ingest import INVENTORY_COLUMNS, ingest_csv
+
+
+def make_csv(months):
+    rows = [f"{month},A{number},Item {number},HCMCHEM,1,each,10,10,Chemicals" for number, month in enumerate(months)]
+    return io.BytesIO(("\n".join([",".join(INVENTORY_COLUMNS)] + rows) + "\n").encode())
+
+
+@pytest.mark.parametrize("months", [
+    ["13/01/2024", "14/01/2024", "05/02/2024", "06/03/2024"],  # ngày trước tháng
+    ["01/13/2024", "01/14/2024", "02/05/2024", "03/06/2024"],  # tháng trước ngày
+    ["2024-01-13", "2024-01-14", "2024-02-05", "2024-03-06"],
+])
+def test_chunked_months_match_whole_file(months):
+    whole = pd.to_datetime(pd.read_csv(make_csv(months))['month']).dt.month.tolist()
+
+    success, df, message, errors = ingest_csv(make_csv(months), INVENTORY_COLUMNS, chunksize=2)
+
+    assert success, message
+    assert errors.empty
+    assert df['month'].tolist() == whole
+
+
+def test_rows_in_another_format_are_reported():
+    success, df, message, errors = ingest_csv(make_csv(["13/01/2024", "2024-02-05"]), INVENTORY_COLUMNS,
+                                              chunksize=1)
+
+    assert not success
+    assert errors['row'].tolist() == [3]
+
+
+def test_unknown_date_format_is_rejected():
+    success, df, message, errors = ingest_csv(make_csv(["1", "2"]), INVENTORY_COLUMNS, chunksize=1)
+
+    assert not success
+    assert df is None
+    assert errors['row'].tolist() == [2]